@@ -0,0 +1,75 @@
+"""
+Microbenchmark of the batch builder.
+Measure requests per second against the number of concurrent stateful streams.
+
+Run from the benchmarks directory:
+    python builder_benchmark.py --streams 1 10 100 1000
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import sys
+import time
+import argparse
+
+sys.path.append("..")
+
+import numpy as np  # type: ignore
+
+import src.data_models as dm
+from src.builder import build_batches
+from shared_modules.utils import uuid4_string_generator
+
+
+stub_stateful_model = dm.ModelObject(
+    "stub",
+    "registry.visionhub.ru/models/stub-stateful:v3",
+    stateless=False,
+    batch_size=8,
+)
+
+
+def make_request_objects(number_of_requests, number_of_streams):
+    request_info = dm.RequestInfo(input=np.zeros((1,)), parameters={})
+    return [
+        dm.RequestObject(
+            uid=str(i),
+            source_id=f"source_{i % number_of_streams}",
+            request_info=request_info,
+            model=stub_stateful_model,
+        )
+        for i in range(number_of_requests)
+    ]
+
+
+def measure(number_of_requests, number_of_streams):
+    request_objects = make_request_objects(number_of_requests, number_of_streams)
+    batches = dm.Batches()
+    uid_generator = uuid4_string_generator()
+
+    start = time.perf_counter()
+    for request_object in request_objects:
+        build_batches(
+            [request_object], existing_batches=batches, uid_generator=uid_generator
+        )
+        batches.pop_completed()
+    return number_of_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument(
+        "--streams", type=int, nargs="+", default=[1, 10, 100, 1000, 10000]
+    )
+    args = parser.parse_args()
+
+    print(f"{'streams':>10} {'requests/sec':>15}")
+    for number_of_streams in args.streams:
+        rps = measure(args.requests, number_of_streams)
+        print(f"{number_of_streams:>10} {rps:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
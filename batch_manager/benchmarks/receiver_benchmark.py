@@ -0,0 +1,97 @@
+"""
+Benchmark of the receive loop.
+Measure requests per second against the burst size,
+for receiving one request object at a time and for draining bursts.
+
+Run from the benchmarks directory:
+    python receiver_benchmark.py --bursts 8 64 512 4096
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.append("..")
+
+import zmq  # type: ignore
+import zmq.asyncio  # type: ignore
+import numpy as np  # type: ignore
+
+import src.receiver as rc
+import src.data_models as dm
+from src.builder import yield_completed_batches
+
+
+stub_model = dm.ModelObject(
+    "stub",
+    "registry.visionhub.ru/models/stub:v3",
+    stateless=True,
+    batch_size=8,
+)
+
+
+def make_request_object(i):
+    return dm.RequestObject(
+        uid=str(i),
+        source_id=f"source_{i}",
+        request_info=dm.RequestInfo(input=np.zeros((1,)), parameters={}),
+        model=stub_model,
+    )
+
+
+async def send_burst(sock, request_objects):
+    for request_object in request_objects:
+        await sock.send_pyobj(request_object)
+
+
+async def measure(number_of_requests, burst_size, drain):
+    ctx = zmq.asyncio.Context()
+    address = f"inproc://receiver_benchmark_{burst_size}_{drain}"
+    receiver = ctx.socket(zmq.PULL)
+    receiver.bind(address)
+    sender = ctx.socket(zmq.PUSH)
+    sender.connect(address)
+    request_objects = [make_request_object(i) for i in range(burst_size)]
+
+    if drain:
+        request_stream = rc.receive_bursts(receiver, max_burst=burst_size)
+    else:
+        request_stream = rc.receive(receiver)
+    batches = yield_completed_batches(request_stream, dm.Batches())
+
+    number_of_bursts = number_of_requests // burst_size
+    expected_batches = burst_size // stub_model.batch_size
+    start = time.perf_counter()
+    for _ in range(number_of_bursts):
+        # Bursts may be larger than the high water mark of the socket,
+        # so requests are sent concurrently with receiving
+        sending = asyncio.create_task(send_burst(sender, request_objects))
+        for _ in range(expected_batches):
+            await batches.__anext__()
+        await sending
+    elapsed = time.perf_counter() - start
+
+    sender.close(linger=0)
+    receiver.close(linger=0)
+    return number_of_bursts * burst_size / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--bursts", type=int, nargs="+", default=[8, 64, 512, 4096])
+    args = parser.parse_args()
+
+    print(f"{'burst':>8} {'one by one, rps':>16} {'drain, rps':>12}")
+    for burst_size in args.bursts:
+        one_by_one = await measure(args.requests, burst_size, drain=False)
+        drain = await measure(args.requests, burst_size, drain=True)
+        print(f"{burst_size:>8} {one_by_one:>16.0f} {drain:>12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -9,6 +9,7 @@ import os
 import sys
 import asyncio
 import argparse
+import multiprocessing
 from pathlib import Path
 from datetime import datetime
 
@@ -18,7 +19,12 @@ import src.sender as snd
 import src.receiver as rc
 import src.data_models as dm
 from src.builder import builder
-from src.saver import save_mapping
+from src.adaptive_batching import (
+    AdaptiveBatchingController,
+    log_decisions_periodically,
+)
+import src.saver as sv
+import src.router as rt
 from shared_modules.parse_config import read_config_with_env
 from shared_modules.utils import recreate_logger
 
@@ -34,20 +40,72 @@ async def pipeline(config: dm.Config):
     """
     input_socket = rc.create_socket(config=config)
     output_socket = snd.create_socket(config=config)
-    request_object_iterator = rc.receive(input_socket)
-    mapping_batch_generator = builder(request_object_iterator, config=config)
+    mapping_socket = sv.create_socket(config=config)
+    request_object_iterator = rc.receive_bursts(
+        input_socket, max_burst=config.max_burst
+    )
+    controller = None
+    statistics_socket = rc.create_statistics_socket(config=config)
+    if config.adaptive_batching.enabled and statistics_socket is not None:
+        controller = AdaptiveBatchingController(config)
+        statistics_task = asyncio.create_task(  # pylint: disable=W0612
+            rc.receive_statistics(statistics_socket, controller)
+        )
+        log_task = asyncio.create_task(  # pylint: disable=W0612
+            log_decisions_periodically(
+                controller, config.adaptive_batching.log_interval
+            )
+        )
+    mapping_batch_generator = builder(
+        request_object_iterator, config=config, controller=controller
+    )
     logger.info("Start batch manager")
     async for (batch, mapping) in mapping_batch_generator:
         batch.status = dm.Status.CREATED
         batch.created_at = datetime.now()
         logger.debug(f"Batch completed {batch=}, {mapping=}")
-        await snd.send(output_socket, batch)
-        save_mapping(config=config, mapping=mapping)
+        packed_mapping = None
+        if config.inline_mapping:
+            packed_mapping = mapping.pack(journaled=config.mapping_journal)
+        if not config.inline_mapping or config.mapping_journal:
+            await sv.save_mapping(mapping_socket, mapping)
+        await snd.send(
+            output_socket,
+            batch,
+            stack_inputs=config.stack_inputs,
+            mapping=packed_mapping,
+        )
+
+
+async def router_pipeline(config: dm.Config):
+    """
+    Pipeline of router, that passes request objects to builder workers
+
+    Parameters
+    ----------
+    config
+        Config object
+    """
+    input_socket = rc.create_socket(config=config)
+    worker_sockets = rt.create_worker_sockets(config=config)
+    logger.info(f"Start router of batch manager with {config.workers} workers")
+    await rt.route(input_socket, worker_sockets, max_burst=config.max_burst)
+
+
+def run_worker(config: dm.Config, index: int):
+    """
+    Entry point of builder worker process
+    """
+    log_level = os.getenv("LOGGING_LEVEL")
+    recreate_logger(log_level, f"BATCH_MANAGER_WORKER_{index}")
+    asyncio.run(pipeline(config))
 
 
 def main():
     """
-    Entry point run asyncio pipeline
+    Entry point run asyncio pipeline.
+    If there are several workers, start them in separate processes
+    and route request objects in the main process
     """
     # Set up log level of logger
     log_level = os.getenv("LOGGING_LEVEL")
@@ -63,8 +121,25 @@ def main():
     args = parser.parse_args()
 
     config = read_config_with_env(dm.Config, args.config, "batch_manager")
-    Path(config.db_file).mkdir(parents=True, exist_ok=True)
-    asyncio.run(pipeline(config))
+    Path(config.zmq_input_address.replace("ipc://", "")).parent.mkdir(
+        parents=True, exist_ok=True
+    )
+    if config.workers <= 1:
+        asyncio.run(pipeline(config))
+        return
+
+    mp_context = multiprocessing.get_context("spawn")
+    workers = [
+        mp_context.Process(
+            target=run_worker,
+            args=(rt.get_worker_config(config, index), index),
+            daemon=True,
+        )
+        for index in range(config.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    asyncio.run(router_pipeline(config))
 
 
 if __name__ == "__main__":
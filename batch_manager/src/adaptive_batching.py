@@ -0,0 +1,234 @@
+"""
+This module is responsible for adaptive batching.
+Controller chooses batch size and max wait time for each model
+from the arrival rate of requests and statistics of processed batches,
+which are published by task_manager.
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import time
+import math
+import asyncio
+import collections
+from dataclasses import dataclass
+from typing import Dict, Deque, Tuple, Optional, Callable
+
+import numpy as np  # type: ignore
+from loguru import logger
+
+import src.data_models as dm
+
+
+@dataclass
+class BatchingDecision:
+    """
+    Current batching parameters of the model
+
+    Parameters
+    ----------
+    batch_size:
+        Target batch size, batch is sent when it has batch_size requests
+    max_wait:
+        Max time (in seconds) that not full batch waits for new requests
+    arrival_rate:
+        Observed number of requests per second
+    latency_bound:
+        Heuristic upper estimation of latency of the request with these parameters:
+        the first request of the batch waits until the batch is filled,
+        then the batch waits p95 of queue time and is processed in mean processing time.
+        It is not a quantile of latency
+    """
+
+    batch_size: int
+    max_wait: float
+    arrival_rate: float
+    latency_bound: float
+
+    def same_parameters(self, other: Optional["BatchingDecision"]) -> bool:
+        "Batch size and max wait are the same as in other decision"
+        return (
+            other is not None
+            and self.batch_size == other.batch_size
+            and self.max_wait == other.max_wait
+        )
+
+
+class ModelStatistics:
+    """
+    Observations of one model: arrival times of requests,
+    processing and queue times of batches
+
+    Parameters
+    ----------
+    window_size:
+        Number of last observations, that are used for estimations
+    """
+
+    def __init__(self, window_size: int):
+        self.arrivals: Deque[float] = collections.deque(maxlen=window_size)
+        self.batches: Deque[Tuple[int, float]] = collections.deque(maxlen=window_size)
+        self.queue_times: Deque[float] = collections.deque(maxlen=window_size)
+
+    def arrival_rate(self, now: float) -> float:
+        """
+        Number of requests per second over the window
+        """
+        if not self.arrivals or now <= self.arrivals[0]:
+            return 0.0
+        return len(self.arrivals) / (now - self.arrivals[0])
+
+    def service_time_function(self) -> Callable[[int], float]:
+        """
+        Linear estimation of batch processing time by batch size:
+        processing_time = overhead + per_request_time * size
+        """
+        sizes = np.array([size for size, _ in self.batches], dtype=np.float64)
+        times = np.array([time_ for _, time_ in self.batches], dtype=np.float64)
+        if np.ptp(sizes) > 0:
+            per_request_time, overhead = np.polyfit(sizes, times, 1)
+            per_request_time = max(per_request_time, 0.0)
+            overhead = max(overhead, 0.0)
+        else:
+            per_request_time, overhead = times.mean() / sizes.mean(), 0.0
+        return lambda size: overhead + per_request_time * size
+
+    def queue_time_p95(self) -> float:
+        """
+        95th percentile of the time, that batches wait in the task_manager queue
+        """
+        return float(np.percentile(self.queue_times, 95))
+
+
+class AdaptiveBatchingController:
+    """
+    Tune batch size and max wait time per model.
+    The largest batch size is selected,
+    for which heuristic latency bound of the request
+    (time to fill the batch + mean processing time + p95 of queue time)
+    is less than latency target.
+    Until statistics of the model are received,
+    default batch size and max wait time are used.
+
+    Parameters
+    ----------
+    config:
+        Config of batch manager, required fields are adaptive_batching,
+        send_batch_timeout and max_wait
+    """
+
+    def __init__(self, config: dm.Config):
+        self.config = config
+        self.adaptive_config = config.adaptive_batching
+        self.statistics: Dict[dm.ModelObject, ModelStatistics] = {}
+        self.decisions: Dict[dm.ModelObject, BatchingDecision] = {}
+
+    @property
+    def enabled(self) -> bool:
+        "Adaptive batching is enabled in config"
+        return self.adaptive_config.enabled
+
+    def get_batch_size(self, model: dm.ModelObject) -> int:
+        """
+        Target batch size of the model
+        """
+        decision = self.decisions.get(model)
+        return model.batch_size if decision is None else decision.batch_size
+
+    def get_max_wait(self, model: dm.ModelObject) -> float:
+        """
+        Max wait time of not full batch of the model
+        """
+        decision = self.decisions.get(model)
+        if decision is None:
+            return self.config.get_max_wait(model)
+        return decision.max_wait
+
+    def get_decisions(self) -> Dict[str, BatchingDecision]:
+        """
+        Current decisions by model name
+        """
+        return {model.name: decision for model, decision in self.decisions.items()}
+
+    def observe_request(self, model: dm.ModelObject, now: Optional[float] = None):
+        """
+        Register arrival of the request
+        """
+        if not self.enabled:
+            return
+        if now is None:
+            now = time.monotonic()
+        self.__get_statistics(model).arrivals.append(now)
+
+    def update(self, batch_statistics: dm.BatchStatistics, now: Optional[float] = None):
+        """
+        Register statistics of processed batch and make new decision for the model
+        """
+        if not self.enabled or batch_statistics.size <= 0:
+            return
+        if now is None:
+            now = time.monotonic()
+        model = batch_statistics.model
+        statistics = self.__get_statistics(model)
+        statistics.batches.append(
+            (batch_statistics.size, batch_statistics.processing_time)
+        )
+        statistics.queue_times.append(batch_statistics.queue_time)
+        arrival_rate = statistics.arrival_rate(now)
+        if arrival_rate <= 0:
+            return
+        decision = self.__make_decision(model, statistics, arrival_rate)
+        if not decision.same_parameters(self.decisions.get(model)):
+            logger.info(f"New batching decision for {model.name}: {decision}")
+        self.decisions[model] = decision
+
+    def log_decisions(self):
+        """
+        Log current decisions of all models
+        """
+        for model_name, decision in self.get_decisions().items():
+            logger.info(f"Batching decision for {model_name}: {decision}")
+
+    def __get_statistics(self, model: dm.ModelObject) -> ModelStatistics:
+        if model not in self.statistics:
+            self.statistics[model] = ModelStatistics(self.adaptive_config.window_size)
+        return self.statistics[model]
+
+    def __make_decision(
+        self,
+        model: dm.ModelObject,
+        statistics: ModelStatistics,
+        arrival_rate: float,
+    ) -> BatchingDecision:
+        service_time = statistics.service_time_function()
+        queue_time = statistics.queue_time_p95()
+        latency_target = self.adaptive_config.latency_target
+
+        latency = math.inf
+        for batch_size in range(model.batch_size, 0, -1):
+            fill_time = (batch_size - 1) / arrival_rate
+            latency = fill_time + service_time(batch_size) + queue_time
+            if latency <= latency_target:
+                break
+        max_wait = min(
+            max(fill_time, self.adaptive_config.min_wait),
+            self.adaptive_config.max_wait_limit,
+        )
+        return BatchingDecision(
+            batch_size=batch_size,
+            max_wait=max_wait,
+            arrival_rate=arrival_rate,
+            latency_bound=latency,
+        )
+
+
+async def log_decisions_periodically(
+    controller: AdaptiveBatchingController, interval: float
+):
+    """
+    Log decisions of the controller every interval seconds
+    """
+    while True:
+        await asyncio.sleep(interval)
+        controller.log_decisions()
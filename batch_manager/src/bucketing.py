@@ -0,0 +1,95 @@
+"""
+This module is responsible for batching requests by shapes of their inputs.
+Requests with different shapes (or dtypes) are not mixed in one batch,
+so the batch can be processed by model as one array.
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+from typing import Tuple, Optional, List
+
+import numpy as np  # type: ignore
+
+import src.data_models as dm
+
+# Shape and dtype string of inputs in the bucket
+Bucket = Tuple[Tuple[int, ...], str]
+
+
+class ShapeBucketingPolicy:
+    """
+    Select shape bucket for each request object and pad its input to the bucket.
+    Input can be numpy array or `shared_modules.tensor_store.TensorHandle`,
+    handles are bucketed but never padded.
+
+    Parameters
+    ----------
+    config:
+        Config of shape bucketing
+    """
+
+    def __init__(self, config: dm.ShapeBucketingConfig):
+        self.exact_shape_models = set(config.exact_shape_models)
+        self.buckets = {
+            name: sorted(map(tuple, buckets), key=np.prod)
+            for name, buckets in config.buckets.items()
+        }
+        self.pad_to_bucket = config.pad_to_bucket
+
+    def get_bucket(self, request_object: dm.RequestObject) -> Optional[Bucket]:
+        """
+        Return bucket of the request object, None if model is not bucketed.
+        Stateful models are not bucketed, frames of one source are kept
+        in one batch in order of arrival
+
+        Parameters
+        ----------
+        request_object:
+            Request object with input, that has shape and dtype
+        """
+        name = request_object.model.name
+        if not request_object.model.stateless:
+            return None
+        if name not in self.buckets and name not in self.exact_shape_models:
+            return None
+        input_ = request_object.request_info.input
+        if not hasattr(input_, "shape") or not hasattr(input_, "dtype"):
+            return None
+        shape = tuple(input_.shape)
+        dtype = np.dtype(input_.dtype).str
+        for bucket in self.buckets.get(name, []):
+            if len(bucket) <= len(shape) and all(
+                size <= bucket_size for size, bucket_size in zip(shape, bucket)
+            ):
+                return (bucket + shape[len(bucket) :], dtype)
+        return (shape, dtype)
+
+    def pad(
+        self, request_object: dm.RequestObject, bucket: Optional[Bucket]
+    ) -> Optional[List[int]]:
+        """
+        Pad input of the request object with zeros to the shape of the bucket.
+        Input is padded at the end of each dimension.
+
+        Parameters
+        ----------
+        request_object:
+            Request object, input of which will be replaced with padded one
+        bucket:
+            Bucket of the request object
+
+        Returns
+        -------
+            Original shape of the input if it was padded, else None
+        """
+        if bucket is None or not self.pad_to_bucket:
+            return None
+        input_ = request_object.request_info.input
+        bucket_shape, _ = bucket
+        if not isinstance(input_, np.ndarray) or input_.shape == bucket_shape:
+            return None
+        padded = np.zeros(bucket_shape, dtype=input_.dtype)
+        padded[tuple(slice(0, size) for size in input_.shape)] = input_
+        request_object.request_info.input = padded
+        return list(input_.shape)
@@ -6,44 +6,58 @@ Main bussines logic of BatchManager
 __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
+import time
 import asyncio
-from functools import reduce
-from typing import List, Tuple, Generator, AsyncIterator, Union
+from typing import List, Tuple, Generator, AsyncIterator, Optional, Iterator, Union
 
 import src.data_models as dm
+from src.adaptive_batching import AdaptiveBatchingController
+from src.bucketing import ShapeBucketingPolicy
 from shared_modules.utils import uuid4_string_generator
 from shared_modules.data_objects import (
     BatchMapping,
     RequestObject,
-    Status,
 )
 
 
 async def yield_timeout_batches(
-    batches: dm.Batches, timeout: Union[float, str] = 0.01
+    batches: dm.Batches, batch_opened: asyncio.Event
 ) -> AsyncIterator[Tuple[dm.BatchObject, BatchMapping]]:
     """
-    Yield each @timeout@ seconds batches. Batches may be not complete.
+    Yield batches, when their flush deadline is expired. Batches may be not complete.
+    Sleep until the earliest deadline, or until new batch is opened.
 
     Parameters
     ----------
     batches:
         Link to Batches object, that is auto expandable
-    timeout:
-        Batches will be sent each second
+    batch_opened:
+        Event, that is set when new batch is opened
     """
     while True:
-        await asyncio.sleep(float(timeout))
-        _batches, batches.batches = batches[:], []
-        mappings = map(build_mapping_batch, _batches)
-        batches_and_mappings = list(zip(_batches, mappings))
-        for batch, mapping in batches_and_mappings:
-            yield (batch, mapping)
+        deadline = batches.next_deadline()
+        if deadline is None:
+            await batch_opened.wait()
+            batch_opened.clear()
+            continue
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            batch_opened.clear()
+            try:
+                await asyncio.wait_for(batch_opened.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        for batch in batches.pop_expired():
+            yield (batch, build_mapping_batch(batch))
 
 
 async def yield_completed_batches(
-    request_stream: AsyncIterator[RequestObject],
+    request_stream: AsyncIterator[Union[RequestObject, List[RequestObject]]],
     batches: dm.Batches,
+    batch_opened: Optional[asyncio.Event] = None,
+    controller: Optional[AdaptiveBatchingController] = None,
+    bucketing: Optional[ShapeBucketingPolicy] = None,
 ) -> AsyncIterator[Tuple[dm.BatchObject, BatchMapping]]:
     """
     Make batches. Yield batch, if it completed.
@@ -51,20 +65,41 @@ async def yield_completed_batches(
     Parameters
     ----------
     request_stream:
-        Infinite async iterator over request objects
+        Infinite async iterator over request objects or lists of request objects,
+        completed batches are checked once per list
     batches:
         Batches object, in which make batch will be write results.
+    batch_opened:
+        Event, that will be set when new batch is opened
+    controller:
+        Adaptive batching controller, that observes arrivals of requests
+    bucketing:
+        Shape bucketing policy
     """
-    async for request_object in request_stream:
-        batches.set(build_batches([request_object], existing_batches=batches).batches)
-        completed_batch, batches = split_on_complete_and_uncomplete_batches(batches)
-        for batch in completed_batch:
-            mapping = build_mapping_batch(batch)
-            yield (batch, mapping)
+    uid_generator = uuid4_string_generator()
+    async for request_objects in request_stream:
+        if not isinstance(request_objects, list):
+            request_objects = [request_objects]
+        if controller is not None:
+            for request_object in request_objects:
+                controller.observe_request(request_object.model)
+        number_of_batches = len(batches)
+        build_batches(
+            request_objects,
+            existing_batches=batches,
+            uid_generator=uid_generator,
+            bucketing=bucketing,
+        )
+        if len(batches) > number_of_batches and batch_opened is not None:
+            batch_opened.set()
+        for batch in batches.pop_completed():
+            yield (batch, build_mapping_batch(batch))
 
 
 async def builder(
-    request_stream: AsyncIterator[RequestObject], config: dm.Config = None
+    request_stream: AsyncIterator[Union[RequestObject, List[RequestObject]]],
+    config: dm.Config = None,
+    controller: Optional[AdaptiveBatchingController] = None,
 ) -> AsyncIterator[Tuple[dm.BatchObject, BatchMapping]]:
     """
     From async generator of request build two genrators:
@@ -74,17 +109,37 @@ async def builder(
     Parameters
     ----------
     request_stream
-        Infinite stream of request objects
+        Infinite stream of request objects or lists of request objects
     config
-        Config object, required field send_batch_timeout
+        Config object, required fields send_batch_timeout and max_wait
+    controller
+        Adaptive batching controller, if it is set,
+        batch size and max wait time are taken from it
     """
-    batches = dm.Batches(batches=[])
-
-    sleep_time = 0.01 if config is None else config.send_batch_timeout
+    bucketing = None
+    if config is not None:
+        bucketing = ShapeBucketingPolicy(config.shape_bucketing)
+    split_by_source = config is not None and config.fair_queuing
+    if controller is not None:
+        batches = dm.Batches(
+            batches=[],
+            max_wait=controller.get_max_wait,
+            batch_size=controller.get_batch_size,
+            split_by_source=split_by_source,
+        )
+    else:
+        batches = dm.Batches(
+            batches=[],
+            max_wait=None if config is None else config.get_max_wait,
+            split_by_source=split_by_source,
+        )
+    batch_opened = asyncio.Event()
 
     async def combiner() -> AsyncIterator[Tuple[dm.BatchObject, BatchMapping]]:
-        timeout_iterator = yield_timeout_batches(batches, sleep_time)
-        completed_iterator = yield_completed_batches(request_stream, batches)
+        timeout_iterator = yield_timeout_batches(batches, batch_opened)
+        completed_iterator = yield_completed_batches(
+            request_stream, batches, batch_opened, controller, bucketing
+        )
         task1 = asyncio.create_task(timeout_iterator.__anext__())
         task2 = asyncio.create_task(completed_iterator.__anext__())
 
@@ -120,26 +175,56 @@ def split_on_complete_and_uncomplete_batches(
             and second is uncompleted batches
     """
 
-    def filter_func(batch):
-        return batch.model.batch_size == batch.size
-
-    completed_batches = dm.Batches(list(filter(filter_func, batches)))
-
-    batches.batches = list(filter(lambda x: not filter_func(x), batches))
-
+    completed_batches = dm.Batches(batches.pop_completed())
     return (
         completed_batches,
         batches,
     )
 
 
+def append_request_object(
+    batches: dm.Batches,
+    request_object: RequestObject,
+    uid_generator: Iterator[str],
+    bucketing: Optional[ShapeBucketingPolicy] = None,
+) -> dm.BatchObject:
+    """
+    Append request object to batches, pad its input if bucketing requires it
+
+    Parameters
+    ----------
+    batches:
+        Batches object, that is being built
+    request_object:
+        Request object, that will be appended
+    uid_generator:
+        Uniq identifier generator
+    bucketing:
+        Shape bucketing policy
+
+    Returns
+    -------
+        Batch, that contains request object
+    """
+    if bucketing is None:
+        return batches.append(request_object, uid_generator)
+    bucket = bucketing.get_bucket(request_object)
+    crop = bucketing.pad(request_object, bucket)
+    batch = batches.append(request_object, uid_generator, bucket=bucket)
+    if crop is not None:
+        batch.crops[request_object.uid] = crop
+    return batch
+
+
 def build_batches(
     request_objects: List[RequestObject],
     existing_batches: dm.Batches = None,
     uid_generator: Generator[str, None, None] = None,
+    bucketing: Optional[ShapeBucketingPolicy] = None,
 ) -> dm.Batches:
     """
     Aggregate request_objects by model. If model is statefull aggregate by source_id also.
+    Request objects are appended to existing_batches in place.
 
     Parameters
     ----------
@@ -149,6 +234,8 @@ def build_batches(
         Already aggregated batches
     uid_generator:
         Uniq identifier generator
+    bucketing:
+        Shape bucketing policy, if it is set, requests are aggregated by bucket also
 
     Returns
     -------
@@ -163,43 +250,9 @@ def build_batches(
     if existing_batches is None:
         existing_batches = dm.Batches([])
 
-    def aggregate_function(batches, request_object):
-        for batch in batches:
-            if (
-                batch.model == request_object.model
-                and batch.size < batch.model.batch_size
-            ):
-                if (
-                    not batch.model.stateless
-                    and batch.source_id != request_object.source_id
-                ):
-                    continue
-                batch.requests_info.append(request_object.request_info)
-                batch.request_objects.append(request_object)
-                break
-        else:
-            new_batch = dm.BatchObject(
-                uid=next(uid_generator),
-                requests_info=[request_object.request_info],
-                model=request_object.model,
-                request_objects=[request_object],
-                source_id=None
-                if request_object.model.stateless
-                else request_object.source_id,
-                status=Status.CREATING,
-            )
-            batches.add(new_batch)
-        return batches
-
-    return dm.Batches(
-        batches=list(
-            reduce(
-                aggregate_function,
-                request_objects,
-                existing_batches,
-            )
-        )
-    )
+    for request_object in request_objects:
+        append_request_object(existing_batches, request_object, uid_generator, bucketing)
+    return existing_batches
 
 
 def build_mapping_batch(
@@ -229,8 +282,13 @@ def build_mapping_batch(
     if not isinstance(request_objects, list) and len(request_objects) == 0:
         raise ValueError("request_object must be of non empty list")
 
+    crops = None
+    if batch.crops:
+        crops = [batch.crops.get(request_object.uid) for request_object in request_objects]
+
     return BatchMapping(
         batch_uid=batch.uid,
         request_object_uids=list(map(lambda lo: lo.uid, request_objects)),
         source_ids=list(map(lambda lo: lo.source_id, request_objects)),
+        crops=crops,
     )
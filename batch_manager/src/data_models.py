@@ -4,7 +4,9 @@ Data object definitions
 __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
-from typing import List
+import time
+import heapq
+from typing import List, Dict, Tuple, Optional, Iterator, Callable, Hashable
 from dataclasses import dataclass, field
 
 from pydantic import BaseModel
@@ -14,11 +16,64 @@ from shared_modules.data_objects import (
     ModelObject,
     RequestObject,
     MinimalBatchObject,
+    BatchStatistics,
     BatchMapping,
+    PackedBatchMapping,
     RequestInfo,
 )
 
 
+class AdaptiveBatchingConfig(BaseModel):
+    """
+    Configuration of `src.adaptive_batching.AdaptiveBatchingController`
+
+    Parameters
+    ----------
+    enabled:
+        If false, static batch size of model and max wait from config are used
+    latency_target:
+        Target (in seconds) of heuristic latency bound of the request,
+        see `src.adaptive_batching.BatchingDecision`
+    min_wait:
+        Lower bound of max wait time of the batch
+    max_wait_limit:
+        Upper bound of max wait time of the batch
+    window_size:
+        Number of last observations, that are used for estimations
+    log_interval:
+        Period (in seconds) of logging of current decisions,
+        decisions are also logged when batch size or max wait is changed
+    """
+
+    enabled: bool = False
+    latency_target: float = 1.0
+    min_wait: float = 0.001
+    max_wait_limit: float = 1.0
+    window_size: int = 100
+    log_interval: float = 60
+
+
+class ShapeBucketingConfig(BaseModel):
+    """
+    Configuration of `src.bucketing.ShapeBucketingPolicy`
+
+    Parameters
+    ----------
+    exact_shape_models:
+        Names of models, requests of which are batched by exact shape and dtype of input
+    buckets:
+        Size buckets by model name, for example [[256, 256], [512, 512]],
+        request is batched with the smallest bucket, that fits leading dims of input
+    pad_to_bucket:
+        Pad inputs with zeros to the size of the bucket,
+        output pictures are cropped back by debatch_manager
+    """
+
+    exact_shape_models: List[str] = []
+    buckets: Dict[str, List[List[int]]] = {}
+    pad_to_bucket: bool = False
+
+
 class Config(BaseModel):
     """
     Configuration of batch_manager
@@ -29,19 +84,58 @@ class Config(BaseModel):
         Address of zreomq socket ipc for input requests
     zmq_output_address:
         Address of zreomq socket ipc for result batches
-    db_file:
-        File path to leveldb
-    create_db_file:
-        Create db file if file doesnot exists
+    zmq_mapping_address:
+        Address of zeromq socket of debatch_manager for batch mappings
     send_batch_timeout:
-        How much time builder will be sleep before sending
+        Default max time (in seconds) that not full batch waits for new requests,
+        counted from the first request of the batch
+    max_wait:
+        Max wait time per model name, overrides send_batch_timeout
+    zmq_statistics_address:
+        Address of zeromq socket of task_manager, that publishes batch statistics
+    adaptive_batching:
+        Config of adaptive batch size and max wait time
+    stack_inputs:
+        Send inputs of the batch as one contiguous array,
+        if all of them have the same shape and dtype
+    shape_bucketing:
+        Config of batching by shapes of inputs
+    inline_mapping:
+        Send mapping inside the batch, debatch_manager takes it from the response
+    mapping_journal:
+        Also send mapping to the mapping store of debatch_manager,
+        with inline_mapping it is needed only for crash recovery
+    max_burst:
+        Max number of request objects, that are received without blocking
+        and passed to the builder at once
+    workers:
+        Number of builder worker processes, if more than one,
+        main process only routes request objects to workers, see `src.router`
+    fair_queuing:
+        Build batches of stateless models per source,
+        so task_manager can share models between sources fairly
     """
 
     zmq_input_address: str
     zmq_output_address: str
-    db_file: str
-    create_db_file: bool
+    zmq_mapping_address: str
     send_batch_timeout: float
+    max_wait: Dict[str, float] = {}
+    zmq_statistics_address: Optional[str] = None
+    adaptive_batching: AdaptiveBatchingConfig = AdaptiveBatchingConfig()
+    stack_inputs: bool = False
+    shape_bucketing: ShapeBucketingConfig = ShapeBucketingConfig()
+    inline_mapping: bool = False
+    mapping_journal: bool = True
+    max_burst: int = 1000
+    workers: int = 1
+    fair_queuing: bool = False
+
+    def get_max_wait(self, model: ModelObject) -> float:
+        """
+        Max wait time of not full batch for the model
+        """
+        return self.max_wait.get(model.name, self.send_batch_timeout)
 
 
 @dataclass(eq=False)
@@ -63,34 +157,105 @@ class BatchObject(MinimalBatchObject):
         Source id if model is stateful, if stateless source_id=""
     request_objects:
         List of RequestObject
+    flush_deadline:
+        Monotonic time, when batch will be sent even if it is not full
+    bucket:
+        Shape bucket of the inputs, see `src.bucketing`
+    crops:
+        Original shapes of padded inputs by uid of request object
     """
 
     request_objects: List[RequestObject] = field(default_factory=list)
+    flush_deadline: Optional[float] = None
+    bucket: Optional[Hashable] = None
+    crops: Dict[str, List[int]] = field(default_factory=dict)
 
-    def serialize(self) -> MinimalBatchObject:
+    def serialize(
+        self,
+        stack_inputs: bool = False,
+        mapping: Optional[PackedBatchMapping] = None,
+    ) -> MinimalBatchObject:
         """
         Serialize BatchObject to MinimalBatchObject, that will sent over zeromq
+
+        Parameters
+        ----------
+        stack_inputs:
+            Stack inputs of the same shape and dtype into one contiguous array
+        mapping:
+            Mapping, that will be sent inside the batch
         """
-        return MinimalBatchObject(
+        batch = MinimalBatchObject(
             uid=self.uid,
             requests_info=self.requests_info,
             model=self.model,
             source_id=self.source_id,
             status=self.status,
             created_at=self.created_at,
+            mapping=mapping,
+            priority=self.priority,
+            deadline=self.deadline,
         )
+        if stack_inputs:
+            return batch.stack_inputs()
+        return batch
 
     def __eq__(self, other):
         return super().__eq__(other) and self.request_objects == other.request_objects
 
 
-@dataclass
+BatchKey = Tuple[ModelObject, Optional[str], Optional[Hashable], int]
+
+DEFAULT_MAX_WAIT = 0.01
+
+
 class Batches:
     """
-    This dataclass is needed for store list of batches
+    This class is needed for store batches, that are being built.
+    Not completed batches are indexed by (model, source_id, bucket, priority),
+    source_id is None for stateless models, unless they are split by source,
+    priority is 0 for stateful models (requests of one source keep their order),
+    so request object is appended to a batch in O(1).
+    Each batch has flush deadline (time of the first request + max wait),
+    deadlines are stored in a heap.
+
+    Parameters
+    ----------
+    batches:
+        Initial batches
+    max_wait:
+        Function that returns max wait time in seconds for the model
+    batch_size:
+        Function that returns target batch size for the model,
+        batch_size of the model by default
+    split_by_source:
+        Build batches of stateless models per source
     """
 
-    batches: List[BatchObject]
+    def __init__(
+        self,
+        batches: Optional[List[BatchObject]] = None,
+        max_wait: Optional[Callable[[ModelObject], float]] = None,
+        batch_size: Optional[Callable[[ModelObject], int]] = None,
+        split_by_source: bool = False,
+    ):
+        self.__batches: Dict[str, BatchObject] = {}
+        self.__open_batches: Dict[BatchKey, BatchObject] = {}
+        self.__completed_batches: Dict[str, BatchObject] = {}
+        self.__deadlines: List[Tuple[float, str]] = []
+        self.max_wait = max_wait or (lambda model: DEFAULT_MAX_WAIT)
+        self.batch_size = batch_size or (lambda model: model.batch_size)
+        self.split_by_source = split_by_source
+        self.set(batches or [])
+
+    @property
+    def batches(self) -> List[BatchObject]:
+        "All batches in order of creation"
+        return list(self.__batches.values())
+
+    @batches.setter
+    def batches(self, batches: List[BatchObject]):
+        self.set(batches)
 
     def __iter__(self):
         return iter(self.batches)
@@ -98,16 +263,183 @@ class Batches:
     def __getitem__(self, i):
         return self.batches[i]
 
+    def __len__(self) -> int:
+        return len(self.__batches)
+
+    def __eq__(self, other):
+        if not isinstance(other, type(self)):
+            return False
+        return self.batches == other.batches
+
+    def __repr__(self) -> str:
+        return f"Batches(batches={self.batches})"
+
+    @staticmethod
+    def get_key(
+        model: ModelObject,
+        source_id: Optional[str],
+        bucket: Optional[Hashable] = None,
+        priority: int = 0,
+        split_by_source: bool = False,
+    ) -> BatchKey:
+        """
+        Key of the batch, stateless batches are not separated by source_id,
+        unless split_by_source is set, stateful batches are not separated
+        by bucket and priority
+        """
+        if model.stateless:
+            return (model, source_id if split_by_source else None, bucket, priority)
+        return (model, source_id, None, 0)
+
     def add(self, batch: BatchObject):
         """
-        Add element to batches list
+        Add element to batches
         """
         if not isinstance(batch, BatchObject):
             raise ValueError("Batch must be BatchObject")
-        self.batches += [batch]
+        self.__batches[batch.uid] = batch
+        self.__push_deadline(batch)
+        self.__update_index(batch)
 
     def set(self, batches: List[BatchObject]):
         """
         Set to internal batches
         """
-        self.batches = batches
+        self.__batches.clear()
+        self.__open_batches.clear()
+        self.__completed_batches.clear()
+        self.__deadlines.clear()
+        for batch in batches:
+            self.add(batch)
+
+    def append(
+        self,
+        request_object: RequestObject,
+        uid_generator: Iterator[str],
+        bucket: Optional[Hashable] = None,
+    ) -> BatchObject:
+        """
+        Append request object to the open batch with the same key,
+        or create a new batch
+
+        Parameters
+        ----------
+        request_object:
+            Request object, that will be appended
+        uid_generator:
+            Generator of uids for new batches
+        bucket:
+            Shape bucket of the request object input
+
+        Returns
+        -------
+            Batch, that contains request object
+        """
+        model = request_object.model
+        key = self.get_key(
+            model,
+            request_object.source_id,
+            bucket,
+            request_object.priority,
+            self.split_by_source,
+        )
+        batch = self.__open_batches.get(key)
+        if batch is None:
+            batch = BatchObject(
+                uid=next(uid_generator),
+                requests_info=[request_object.request_info],
+                model=model,
+                request_objects=[request_object],
+                source_id=key[1],
+                status=Status.CREATING,
+                bucket=key[2],
+                priority=key[3],
+                deadline=request_object.deadline,
+            )
+            self.__batches[batch.uid] = batch
+            self.__push_deadline(batch)
+        else:
+            batch.requests_info.append(request_object.request_info)
+            batch.request_objects.append(request_object)
+            if request_object.deadline is not None and (
+                batch.deadline is None or request_object.deadline < batch.deadline
+            ):
+                batch.deadline = request_object.deadline
+        self.__update_index(batch)
+        return batch
+
+    def pop_completed(self) -> List[BatchObject]:
+        """
+        Remove completed batches and return them
+        """
+        completed = list(self.__completed_batches.values())
+        self.__completed_batches.clear()
+        for batch in completed:
+            del self.__batches[batch.uid]
+        return completed
+
+    def next_deadline(self) -> Optional[float]:
+        """
+        The earliest flush deadline, None if there are no batches
+        """
+        while self.__deadlines and self.__deadlines[0][1] not in self.__batches:
+            heapq.heappop(self.__deadlines)
+        return self.__deadlines[0][0] if self.__deadlines else None
+
+    def pop_expired(self, now: Optional[float] = None) -> List[BatchObject]:
+        """
+        Remove batches with flush deadline before `now` and return them
+
+        Parameters
+        ----------
+        now:
+            Monotonic time, current time by default
+        """
+        if now is None:
+            now = time.monotonic()
+        expired = []
+        while self.__deadlines and self.__deadlines[0][0] <= now:
+            _, uid = heapq.heappop(self.__deadlines)
+            batch = self.__batches.pop(uid, None)
+            if batch is None:
+                continue
+            self.__completed_batches.pop(uid, None)
+            key = self.get_key(
+                batch.model,
+                batch.source_id,
+                batch.bucket,
+                batch.priority,
+                self.split_by_source,
+            )
+            if self.__open_batches.get(key) is batch:
+                del self.__open_batches[key]
+            expired.append(batch)
+        return expired
+
+    def pop_all(self) -> List[BatchObject]:
+        """
+        Remove all batches and return them
+        """
+        batches = self.batches
+        self.set([])
+        return batches
+
+    def __push_deadline(self, batch: BatchObject):
+        if batch.flush_deadline is None:
+            batch.flush_deadline = time.monotonic() + self.max_wait(batch.model)
+        heapq.heappush(self.__deadlines, (batch.flush_deadline, batch.uid))
+
+    def __update_index(self, batch: BatchObject):
+        key = self.get_key(
+            batch.model,
+            batch.source_id,
+            batch.bucket,
+            batch.priority,
+            self.split_by_source,
+        )
+        if batch.size < self.batch_size(batch.model):
+            self.__open_batches.setdefault(key, batch)
+            return
+        if self.__open_batches.get(key) is batch:
+            del self.__open_batches[key]
+        self.__completed_batches[batch.uid] = batch
@@ -4,12 +4,13 @@ __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
 
-from typing import AsyncIterator
+from typing import AsyncIterator, Optional, List
 
 import zmq  # type: ignore
 import zmq.asyncio  # type: ignore
 
 import src.data_models as dm
+from src.adaptive_batching import AdaptiveBatchingController
 
 ctx = zmq.asyncio.Context()
 
@@ -40,3 +41,65 @@ async def receive(sock: zmq.asyncio.Socket) -> AsyncIterator[dm.RequestObject]:
     while True:
         request_object = await sock.recv_pyobj()
         yield request_object
+
+
+async def receive_bursts(
+    sock: zmq.asyncio.Socket, max_burst: int = 1000
+) -> AsyncIterator[List[dm.RequestObject]]:
+    """
+    Build an async iterable object. Infinite stream of lists of RequestObject.
+    Wait for the first request object, then take all request objects,
+    that are already received, without blocking
+
+    Parameters
+    ----------
+    sock:
+        Socket is source of request_objects
+    max_burst:
+        Max number of request objects in one list
+    """
+    while True:
+        request_objects = [await sock.recv_pyobj()]
+        while len(request_objects) < max_burst:
+            try:
+                request_objects.append(await sock.recv_pyobj(zmq.NOBLOCK))
+            except zmq.Again:
+                break
+        yield request_objects
+
+
+def create_statistics_socket(config: dm.Config) -> Optional[zmq.asyncio.Socket]:
+    """
+    Create async zeromq SUB socket for batch statistics,
+    None if zmq_statistics_address is not set
+
+    Parameters
+    ----------
+    config
+        Config object, required field is a zmq_statistics_address
+    """
+    if config.zmq_statistics_address is None:
+        return None
+    sock = ctx.socket(zmq.SUB)
+    sock.connect(config.zmq_statistics_address)
+    sock.setsockopt(zmq.SUBSCRIBE, b"")
+    return sock
+
+
+async def receive_statistics(
+    sock: zmq.asyncio.Socket, controller: AdaptiveBatchingController
+):
+    """
+    Pass statistics of processed batches into controller
+
+    Parameters
+    ----------
+    sock:
+        Socket is source of batch statistics
+    controller:
+        Adaptive batching controller
+    """
+    while True:
+        batch_statistics = await sock.recv_pyobj()
+        if isinstance(batch_statistics, dm.BatchStatistics):
+            controller.update(batch_statistics)
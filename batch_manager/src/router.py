@@ -0,0 +1,96 @@
+"""
+This module is responsible for sharding of batch manager.
+Router receives request objects and passes each of them to one of builder workers.
+Worker is selected by hash of the model name (and source_id for stateful models),
+so all requests, that can be in one batch, come to the same worker,
+and requests of one stateful source keep their order.
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import zlib
+from typing import List
+
+import zmq  # type: ignore
+import zmq.asyncio  # type: ignore
+
+import src.receiver as rc
+import src.data_models as dm
+
+
+ctx = zmq.asyncio.Context()
+
+
+def get_shard(request_object: dm.RequestObject, number_of_workers: int) -> int:
+    """
+    Index of worker for the request object.
+    Hash is stable between processes and restarts
+
+    Parameters
+    ----------
+    request_object:
+        Request object, that will be routed
+    number_of_workers:
+        Number of builder workers
+    """
+    key = request_object.model.name
+    if not request_object.model.stateless:
+        key += "\0" + request_object.source_id
+    return zlib.crc32(key.encode("utf-8")) % number_of_workers
+
+
+def get_worker_address(config: dm.Config, index: int) -> str:
+    """
+    Input address of the worker with index
+    """
+    return f"{config.zmq_input_address}_worker_{index}"
+
+
+def get_worker_config(config: dm.Config, index: int) -> dm.Config:
+    """
+    Config of the worker with index, worker receives request objects from router
+    """
+    return config.copy(
+        update={"zmq_input_address": get_worker_address(config, index), "workers": 1}
+    )
+
+
+def create_worker_sockets(config: dm.Config) -> List[zmq.asyncio.Socket]:
+    """
+    Connect to all workers
+
+    Parameters
+    ----------
+    config:
+        Config object, required fields are zmq_input_address and workers
+    """
+    sockets = []
+    for index in range(config.workers):
+        sock = ctx.socket(zmq.PUSH)
+        sock.connect(get_worker_address(config, index))
+        sockets.append(sock)
+    return sockets
+
+
+async def route(
+    sock: zmq.asyncio.Socket,
+    worker_sockets: List[zmq.asyncio.Socket],
+    max_burst: int = 1000,
+):
+    """
+    Pass request objects from the input socket to workers
+
+    Parameters
+    ----------
+    sock:
+        Socket is source of request objects
+    worker_sockets:
+        Sockets of workers, request object is sent to one of them
+    max_burst:
+        Max number of request objects, that are received without blocking
+    """
+    async for request_objects in rc.receive_bursts(sock, max_burst=max_burst):
+        for request_object in request_objects:
+            shard = get_shard(request_object, len(worker_sockets))
+            await worker_sockets[shard].send_pyobj(request_object)
@@ -1,37 +1,43 @@
 """
-This module is responsible for save mappings into LevelDB
+This module is responsible for sending mappings to debatch_manager,
+debatch_manager stores them into LevelDB
 """
 
 __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
-import time
-
-import plyvel  # type: ignore
+import zmq  # type: ignore
+import zmq.asyncio  # type: ignore
 
 import src.data_models as dm
 
 
-def save_mapping(config: dm.Config, mapping: dm.BatchMapping):
+ctx = zmq.asyncio.Context()
+
+
+def create_socket(config: dm.Config) -> zmq.asyncio.Socket:
     """
-    Save mapping in LevelDB
+    Connect to debatch_manager
 
     Parameters
     ----------
     config:
-        Config object, required field is db_address
+        Config object, required field is a zmq_mapping_address
+    """
+    sock = ctx.socket(zmq.PUSH)
+    sock.connect(config.zmq_mapping_address)
+    return sock
+
+
+async def save_mapping(sock: zmq.asyncio.Socket, mapping: dm.BatchMapping):
+    """
+    Send mapping to debatch_manager
+
+    Parameters
+    ----------
+    sock:
+        Socket is destination of mappings
     mapping:
         BatchMapping object, that will be saved
     """
-    while True:
-        try:
-            database = plyvel.DB(
-                config.db_file, create_if_missing=config.create_db_file
-            )
-            break
-        except plyvel._plyvel.IOError:
-            time.sleep(float(config.send_batch_timeout))
-            continue
-    database.put(*mapping.to_key_value())
-
-    database.close()
+    await sock.send_pyobj(mapping)
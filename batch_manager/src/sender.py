@@ -5,6 +5,7 @@ This module is needed for send batch to TaskManager
 __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
+from typing import Optional
 
 import zmq  # type: ignore
 import zmq.asyncio  # type: ignore
@@ -29,7 +30,12 @@ def create_socket(config: dm.Config) -> zmq.asyncio.Socket:
     return sock
 
 
-async def send(sock: zmq.asyncio.Socket, batch: dm.BatchObject):
+async def send(
+    sock: zmq.asyncio.Socket,
+    batch: dm.BatchObject,
+    stack_inputs: bool = False,
+    mapping: Optional[dm.PackedBatchMapping] = None,
+):
     """
     Sending to TaskManager batch
 
@@ -37,5 +43,9 @@ async def send(sock: zmq.asyncio.Socket, batch: dm.BatchObject):
     ----------
     sock:
         Socket is destination of batches
+    stack_inputs:
+        Send inputs of the batch as one contiguous array
+    mapping:
+        Mapping, that will be sent inside the batch
     """
-    await sock.send_pyobj(batch.serialize())
+    await sock.send_pyobj(batch.serialize(stack_inputs=stack_inputs, mapping=mapping))
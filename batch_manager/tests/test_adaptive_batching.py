@@ -0,0 +1,110 @@
+"""Tests for src.adaptive_batching module"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+from loguru import logger
+
+import src.data_models as dm
+from src.adaptive_batching import AdaptiveBatchingController
+
+
+stub_model = dm.ModelObject(
+    "stub", "registry.visionhub.ru/models/stub:v3", stateless=True, batch_size=32
+)
+
+
+def make_controller(enabled=True) -> AdaptiveBatchingController:
+    return AdaptiveBatchingController(
+        dm.Config(
+            zmq_input_address="",
+            zmq_output_address="",
+            zmq_mapping_address="",
+            send_batch_timeout=0.1,
+            adaptive_batching=dm.AdaptiveBatchingConfig(
+                enabled=enabled, latency_target=0.5, max_wait_limit=0.3
+            ),
+        )
+    )
+
+
+def feed(controller, requests_per_second, processing_time_per_request):
+    for i in range(100):
+        controller.observe_request(stub_model, now=i / requests_per_second)
+    for size in (4, 8, 16):
+        controller.update(
+            dm.BatchStatistics(
+                model=stub_model,
+                size=size,
+                processing_time=0.01 + processing_time_per_request * size,
+                queue_time=0.05,
+            ),
+            now=100 / requests_per_second,
+        )
+
+
+def test_defaults_without_statistics():
+    """
+    Test that default batch size and max wait are used before statistics are received
+    """
+    controller = make_controller()
+    assert controller.get_batch_size(stub_model) == 32
+    assert controller.get_max_wait(stub_model) == 0.1
+    assert controller.get_decisions() == {}
+
+
+def test_high_load_full_batches():
+    """
+    Test that batch is full if requests come fast enough
+    """
+    controller = make_controller()
+    feed(controller, requests_per_second=1000, processing_time_per_request=0.001)
+
+    decision = controller.get_decisions()["stub"]
+    assert decision.batch_size == 32
+    assert controller.get_batch_size(stub_model) == 32
+    assert abs(decision.max_wait - 0.031) < 1e-6
+    assert decision.latency_bound <= 0.5
+
+
+def test_low_load_small_batches():
+    """
+    Test that batch size is decreased to keep latency target if requests are rare
+    """
+    controller = make_controller()
+    feed(controller, requests_per_second=20, processing_time_per_request=0.001)
+
+    decision = controller.get_decisions()["stub"]
+    # (batch_size - 1) / 20 + 0.01 + 0.001 * batch_size + 0.05 <= 0.5
+    assert decision.batch_size == 9
+    assert controller.get_max_wait(stub_model) == 0.3
+    assert decision.latency_bound <= 0.5
+
+
+def test_disabled():
+    """
+    Test that disabled controller does not change parameters
+    """
+    controller = make_controller(enabled=False)
+    feed(controller, requests_per_second=20, processing_time_per_request=0.001)
+
+    assert controller.get_decisions() == {}
+    assert controller.get_batch_size(stub_model) == 32
+
+
+def test_decisions_are_logged():
+    """
+    Test that changed and current decisions are logged
+    """
+    messages = []
+    sink_id = logger.add(messages.append, level="INFO", format="{message}")
+    try:
+        controller = make_controller()
+        feed(controller, requests_per_second=20, processing_time_per_request=0.001)
+        changes = [message for message in messages if "New batching decision" in message]
+        controller.log_decisions()
+    finally:
+        logger.remove(sink_id)
+    assert changes
+    assert len(changes) <= 3
+    assert "Batching decision for stub" in messages[-1]
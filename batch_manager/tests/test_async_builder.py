@@ -7,7 +7,7 @@ __email__ = "a.chertkov@eora.ru"
 
 import time
 import asyncio
-from typing import AsyncIterable
+from typing import AsyncIterable, List
 
 import pytest
 import numpy as np  # type: ignore
@@ -102,3 +102,63 @@ async def test_by_full_interrupt():
         break
     else:
         assert False
+
+
+async def test_by_model_max_wait():
+    """
+    Test that not full batch is sent when max wait of its model is expired
+    """
+    config = dm.Config(
+        zmq_input_address="",
+        zmq_output_address="",
+        zmq_mapping_address="",
+        send_batch_timeout=10,
+        max_wait={"stub": 0.2},
+    )
+
+    async def async_request_generator() -> AsyncIterable[dm.RequestObject]:
+        await asyncio.sleep(0.1)
+        yield dm.RequestObject(
+            uid=next(uuid4_string_generator()),
+            request_info=dm.RequestInfo(input=np.array(range(10)), parameters={}),
+            source_id="internal_sportrecs_1",
+            model=stateless_model,
+        )
+        await asyncio.sleep(100)
+
+    before = time.time()
+    async for (batch, _) in builder(async_request_generator(), config=config):
+        assert 0.3 <= time.time() - before < 1
+        assert batch.size == 1
+        break
+    else:
+        assert False
+
+
+async def test_bursts():
+    """
+    Test that lists of request objects are batched as one stream
+    """
+
+    async def async_request_generator() -> AsyncIterable[List[dm.RequestObject]]:
+        for burst_size in (2, 4):
+            yield [
+                dm.RequestObject(
+                    uid=next(uuid4_string_generator()),
+                    request_info=dm.RequestInfo(
+                        input=np.array(range(10)), parameters={}
+                    ),
+                    source_id="internal_sportrecs_1",
+                    model=stateless_model,
+                )
+                for _ in range(burst_size)
+            ]
+        await asyncio.sleep(100)
+
+    sizes = []
+    async for (batch, mapping) in builder(async_request_generator()):
+        sizes.append(batch.size)
+        assert len(mapping.request_object_uids) == batch.size
+        if len(sizes) == 2:
+            break
+    assert sizes == [3, 3]
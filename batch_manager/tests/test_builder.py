@@ -5,10 +5,12 @@ __email__ = "a.chertkov@eora.ru"
 
 
 from typing import Iterator
+from datetime import datetime, timedelta
 
 import numpy as np  # type: ignore
 
 import src.data_models as dm
+from src.bucketing import ShapeBucketingPolicy
 from src.builder import (
     build_batches,
     build_mapping_batch,
@@ -463,3 +465,249 @@ def test_split_batches():
     )
     assert completed.batches[0] == batch1
     assert uncompleted.batches[0] == batch2
+
+
+def test_batches_open_index():
+    """
+    Test that completed batches are popped and new batch is opened for the same key
+    """
+    stateful_model = dm.ModelObject(
+        "stub",
+        "registry.visionhub.ru/models/stub-stateful:v3",
+        stateless=False,
+        batch_size=2,
+    )
+    request_objects = [
+        dm.RequestObject(
+            f"{i}",
+            f"source_{i % 3}",
+            request_info=dm.RequestInfo(input=np.array(range(10)), parameters={}),
+            model=stateful_model,
+        )
+        for i in range(8)
+    ]
+    batches = dm.Batches()
+
+    build_batches(
+        request_objects, existing_batches=batches, uid_generator=string_generator()
+    )
+
+    completed = batches.pop_completed()
+    assert [batch.source_id for batch in completed] == [
+        "source_0",
+        "source_1",
+        "source_2",
+    ]
+    assert [(batch.source_id, batch.size) for batch in batches] == [
+        ("source_0", 1),
+        ("source_1", 1),
+    ]
+
+    build_batches(
+        [request_objects[0]], existing_batches=batches, uid_generator=string_generator()
+    )
+    assert batches.pop_completed()[0].source_id == "source_0"
+    assert [batch.source_id for batch in batches.pop_all()] == ["source_1"]
+    assert len(batches) == 0
+
+
+def test_batches_pop_expired():
+    """
+    Test that batches are flushed in order of their deadlines
+    """
+    max_wait = {"stub": 10.0, "blur": 1.0}
+    batches = dm.Batches(max_wait=lambda model: max_wait[model.name])
+    for i, model in enumerate([stub_model, blur_model]):
+        build_batches(
+            [
+                dm.RequestObject(
+                    f"{i}",
+                    "internal_123123",
+                    request_info=dm.RequestInfo(input=np.array([i]), parameters={}),
+                    model=model,
+                )
+            ],
+            existing_batches=batches,
+        )
+    stub_batch, blur_batch = batches
+
+    assert batches.next_deadline() == blur_batch.flush_deadline
+    assert batches.pop_expired(blur_batch.flush_deadline - 0.5) == []
+    assert batches.pop_expired(blur_batch.flush_deadline) == [blur_batch]
+    assert batches.next_deadline() == stub_batch.flush_deadline
+    assert batches.pop_expired(stub_batch.flush_deadline + 1) == [stub_batch]
+    assert batches.next_deadline() is None
+
+
+def test_build_batches_by_shape_buckets():
+    """
+    Test that inputs are batched by buckets and padded to the bucket shape
+    """
+    bucketing = ShapeBucketingPolicy(
+        dm.ShapeBucketingConfig(
+            buckets={"stub": [[512, 512], [256, 256]]}, pad_to_bucket=True
+        )
+    )
+    shapes = [(200, 100, 3), (256, 256, 3), (300, 200, 3), (1000, 10, 3)]
+    request_objects = [
+        dm.RequestObject(
+            f"{i}",
+            "internal_123123",
+            request_info=dm.RequestInfo(
+                input=np.ones(shape, dtype=np.uint8), parameters={}
+            ),
+            model=stub_model,
+        )
+        for i, shape in enumerate(shapes)
+    ]
+
+    batches = build_batches(
+        request_objects, uid_generator=string_generator(), bucketing=bucketing
+    )
+
+    assert [batch.size for batch in batches] == [2, 1, 1]
+    assert [info.input.shape for info in batches[0].requests_info] == [
+        (256, 256, 3),
+        (256, 256, 3),
+    ]
+    assert batches[1].requests_info[0].input.shape == (512, 512, 3)
+    assert batches[2].requests_info[0].input.shape == (1000, 10, 3)
+    assert batches[0].requests_info[0].input[:200, :100].sum() == 200 * 100 * 3
+    assert batches[0].requests_info[0].input.sum() == 200 * 100 * 3
+
+    assert build_mapping_batch(batches[0]).crops == [[200, 100, 3], None]
+    assert build_mapping_batch(batches[2]).crops is None
+
+
+def test_stateful_models_are_not_bucketed():
+    """
+    Test that frames of different shapes of one stateful source are kept in one batch
+    """
+    bucketing = ShapeBucketingPolicy(
+        dm.ShapeBucketingConfig(
+            exact_shape_models=[stub_stateful_model.name],
+            buckets={stub_stateful_model.name: [[256, 256]]},
+            pad_to_bucket=True,
+        )
+    )
+    shapes = [(200, 100, 3), (1000, 10, 3), (200, 100, 3)]
+    request_objects = [
+        dm.RequestObject(
+            f"{i}",
+            "internal_123123",
+            request_info=dm.RequestInfo(
+                input=np.ones(shape, dtype=np.uint8), parameters={}
+            ),
+            model=stub_stateful_model,
+        )
+        for i, shape in enumerate(shapes)
+    ]
+    assert bucketing.get_bucket(request_objects[0]) is None
+
+    batches = build_batches(
+        request_objects, uid_generator=string_generator(), bucketing=bucketing
+    )
+
+    assert len(batches) == 1
+    assert [info.input.shape for info in batches[0].requests_info] == shapes
+    assert build_mapping_batch(batches[0]).crops is None
+
+
+def test_build_batches_by_priority():
+    """
+    Test that stateless requests with different priorities are not mixed,
+    but requests of one stateful source are kept in one batch
+    """
+    request_objects = [
+        dm.RequestObject(
+            f"{i}",
+            "internal_123123",
+            request_info=dm.RequestInfo(input=np.array([i]), parameters={}),
+            model=model,
+            priority=i % 2,
+        )
+        for model in [stub_model, stub_stateful_model]
+        for i in range(4)
+    ]
+
+    batches = build_batches(request_objects, uid_generator=string_generator())
+
+    assert [(batch.model, batch.priority, batch.size) for batch in batches] == [
+        (stub_model, 0, 2),
+        (stub_model, 1, 2),
+        (stub_stateful_model, 0, 4),
+    ]
+    assert batches[1].serialize().priority == 1
+
+
+def test_stateful_batches_ignore_priority():
+    """
+    Test that stateful batch has priority 0, so its source is processed in order
+    """
+    request_objects = [
+        dm.RequestObject(
+            f"{i}",
+            "internal_123123",
+            request_info=dm.RequestInfo(input=np.array([i]), parameters={}),
+            model=stub_stateful_model,
+            priority=5 - i,
+        )
+        for i in range(3)
+    ]
+
+    batches = build_batches(request_objects, uid_generator=string_generator())
+
+    assert [(batch.priority, batch.size) for batch in batches] == [(0, 3)]
+    assert batches[0].serialize().priority == 0
+
+
+def test_build_batches_with_deadlines():
+    """
+    Test that batch inherits the earliest deadline of its requests
+    """
+    now = datetime.now()
+    deadlines = [None, now + timedelta(seconds=2), now + timedelta(seconds=1), None]
+    request_objects = [
+        dm.RequestObject(
+            f"{i}",
+            "internal_123123",
+            request_info=dm.RequestInfo(input=np.array([i]), parameters={}),
+            model=stub_model,
+            deadline=deadline,
+        )
+        for i, deadline in enumerate(deadlines)
+    ]
+
+    batches = build_batches(request_objects, uid_generator=string_generator())
+
+    assert len(batches) == 1
+    assert batches[0].deadline == now + timedelta(seconds=1)
+    assert batches[0].serialize().deadline == now + timedelta(seconds=1)
+
+
+def test_build_batches_split_by_source():
+    """
+    Test that stateless requests of different sources are not mixed,
+    if batches are split by source
+    """
+    request_objects = [
+        dm.RequestObject(
+            f"{i}",
+            f"internal_{i % 2}",
+            request_info=dm.RequestInfo(input=np.array([i]), parameters={}),
+            model=stub_model,
+        )
+        for i in range(4)
+    ]
+
+    batches = build_batches(
+        request_objects,
+        existing_batches=dm.Batches(split_by_source=True),
+        uid_generator=string_generator(),
+    )
+
+    assert [(batch.source_id, batch.size) for batch in batches] == [
+        ("internal_0", 2),
+        ("internal_1", 2),
+    ]
+
@@ -0,0 +1,36 @@
+"""
+Tests for src.receiver module
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import pytest
+import zmq  # type: ignore
+import zmq.asyncio  # type: ignore
+
+import src.receiver as rc
+
+
+# All test coroutines will be treated as marked.
+pytestmark = pytest.mark.asyncio
+
+
+async def test_receive_bursts():
+    """
+    Test that all received messages are drained at once, but not more than max_burst
+    """
+    ctx = zmq.asyncio.Context()
+    receiver = ctx.socket(zmq.PULL)
+    receiver.bind("inproc://test_receive_bursts")
+    sender = ctx.socket(zmq.PUSH)
+    sender.connect("inproc://test_receive_bursts")
+    for i in range(5):
+        await sender.send_pyobj(i)
+
+    bursts = rc.receive_bursts(receiver, max_burst=3)
+
+    assert await bursts.__anext__() == [0, 1, 2]
+    assert await bursts.__anext__() == [3, 4]
+    sender.close()
+    receiver.close()
@@ -0,0 +1,110 @@
+"""
+Tests for src.router module
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import asyncio
+
+import pytest
+import zmq  # type: ignore
+import zmq.asyncio  # type: ignore
+import numpy as np  # type: ignore
+
+import src.router as rt
+import src.data_models as dm
+
+
+# All test coroutines will be treated as marked.
+pytestmark = pytest.mark.asyncio
+
+stateless_model = dm.ModelObject(
+    "stateless", "registry.visionhub.ru/models/stub:v3", stateless=True, batch_size=4
+)
+stateful_model = dm.ModelObject(
+    "stateful", "registry.visionhub.ru/models/stub:v3", stateless=False, batch_size=4
+)
+
+
+def make_request_object(uid, model, source_id):
+    return dm.RequestObject(
+        uid=uid,
+        source_id=source_id,
+        request_info=dm.RequestInfo(input=np.zeros((1,)), parameters={}),
+        model=model,
+    )
+
+
+async def test_get_shard():
+    """
+    Test that stateless model goes to one worker and stateful sources are spread
+    """
+    stateless_shards = {
+        rt.get_shard(make_request_object("1", stateless_model, f"source{i}"), 4)
+        for i in range(100)
+    }
+    stateful_shards = {
+        rt.get_shard(make_request_object("1", stateful_model, f"source{i}"), 4)
+        for i in range(100)
+    }
+
+    assert len(stateless_shards) == 1
+    assert stateful_shards == {0, 1, 2, 3}
+
+
+async def test_route_keeps_order():
+    """
+    Test that request objects of one source come to one worker in order
+    """
+    ctx = zmq.asyncio.Context()
+    config = dm.Config(
+        zmq_input_address="inproc://test_route",
+        zmq_output_address="inproc://test_route_output",
+        zmq_mapping_address="inproc://test_route_mapping",
+        send_batch_timeout=0.1,
+        workers=3,
+    )
+    input_socket = ctx.socket(zmq.PULL)
+    input_socket.bind(config.zmq_input_address)
+    worker_receivers = []
+    for index in range(config.workers):
+        sock = ctx.socket(zmq.PULL)
+        sock.bind(rt.get_worker_address(config, index))
+        worker_receivers.append(sock)
+    worker_sockets = []
+    for index in range(config.workers):
+        sock = ctx.socket(zmq.PUSH)
+        sock.connect(rt.get_worker_address(config, index))
+        worker_sockets.append(sock)
+    sender = ctx.socket(zmq.PUSH)
+    sender.connect(config.zmq_input_address)
+    request_objects = [
+        make_request_object(str(i), stateful_model, f"source{i % 5}")
+        for i in range(50)
+    ]
+    for request_object in request_objects:
+        await sender.send_pyobj(request_object)
+
+    route_task = asyncio.create_task(rt.route(input_socket, worker_sockets))
+    poller = zmq.asyncio.Poller()
+    for sock in worker_receivers:
+        poller.register(sock, zmq.POLLIN)
+    received = {}
+    while sum(map(len, received.values())) < len(request_objects):
+        events = dict(await poller.poll(timeout=5000))
+        assert events, "Not all request objects are routed"
+        for index, sock in enumerate(worker_receivers):
+            if sock in events:
+                request_object = await sock.recv_pyobj()
+                received.setdefault(request_object.source_id, []).append(
+                    (index, request_object.uid)
+                )
+    route_task.cancel()
+
+    for source_id, shards_and_uids in received.items():
+        expected_uids = [ro.uid for ro in request_objects if ro.source_id == source_id]
+        assert [uid for _, uid in shards_and_uids] == expected_uids
+        assert len({shard for shard, _ in shards_and_uids}) == 1
+    for sock in worker_receivers + worker_sockets + [sender, input_socket]:
+        sock.close(linger=0)
@@ -10,14 +10,18 @@ import sys
 import asyncio
 import argparse
 from pathlib import Path
+from typing import Optional, Set
 
+import zmq.asyncio  # type: ignore
 from loguru import logger
 
 import src.sender as snd
 import src.receiver as rc
 import src.data_models as dm
-from src.debatcher import debatch, pull_batch_mapping
+from src.debatcher import debatch
+from shared_modules.mapping_store import MappingStore
 from shared_modules.parse_config import read_config_with_env
+from shared_modules.tensor_store import TensorStore
 from shared_modules.utils import recreate_logger
 
 
@@ -48,6 +52,10 @@ def main():
     Path(config.zmq_output_address.replace("ipc://", "")).parent.mkdir(
         exist_ok=True, parents=True
     )
+    Path(config.zmq_mapping_address.replace("ipc://", "")).parent.mkdir(
+        exist_ok=True, parents=True
+    )
+    Path(config.db_file).parent.mkdir(exist_ok=True, parents=True)
 
     logger.info("Configs loaded")
     logger.info("Run pipeline")
@@ -59,7 +67,8 @@ async def pipeline(config: dm.Config):
     """
     Pipeline of debatcher manager
     1) Receive reponse batches
-    2) Pull from database batch mapping
+    2) Take batch mapping from the batch or pull it from the store,
+       mappings are received from batch_manager
     3) Generate from batch and mapping batch response object
     4) Send response object
     """
@@ -68,39 +77,109 @@ async def pipeline(config: dm.Config):
     logger.info("Create socket")
     input_socket = rc.create_socket(config=config)
     output_socket = snd.create_socket(config=config)
+    mapping_socket = rc.create_mapping_socket(config=config)
     logger.info("done")
 
+    mapping_store = MappingStore(
+        config.db_file, create_if_missing=config.create_db_file
+    )
+    mapping_tasks = [  # pylint: disable=W0612
+        asyncio.create_task(rc.receive_mappings(mapping_socket, mapping_store)),
+        asyncio.create_task(mapping_store.committer(config.mapping_commit_interval)),
+    ]
+
+    tensor_store = None
+    if config.tensor_store_path:
+        tensor_store = TensorStore(config.tensor_store_path)
+        asyncio.create_task(collect_tensors(tensor_store, config.tensor_store_ttl))
+
     # Recieve iterable response batches
     logger.info("Recieving response batches...")
     response_batch_iterable = rc.receive(sock=input_socket)
 
     # Pulling batch mapping, build response object
+    # If mapping has not come yet, wait it in separate task
+    waiting_tasks: Set[asyncio.Task] = set()
     async for response_batch in response_batch_iterable:
         logger.info(f"Pull batch mapping for batch {response_batch.uid}")
+        batch_mapping = take_batch_mapping(response_batch, mapping_store)
+        if batch_mapping is None:
+            task = asyncio.create_task(
+                wait_mapping_and_send(
+                    output_socket, response_batch, mapping_store, tensor_store, config
+                )
+            )
+            waiting_tasks.add(task)
+            task.add_done_callback(waiting_tasks.discard)
+            continue
+        await send_response_objects(
+            output_socket, response_batch, batch_mapping, tensor_store
+        )
 
-        sleep_time = config.send_batch_mapping_timeout
-        batch_mapping = None
 
-        while True:
-            try:
-                batch_mapping = pull_batch_mapping(config=config, batch=response_batch)
-                break
-            except IOError as exc:
-                logger.debug(f"Database locked try in {sleep_time}")
-                await asyncio.sleep(float(sleep_time))
-            except TypeError as exc:
-                logger.exception(f"Mapping doesnot exists for {response_batch=}")
-                break
+def take_batch_mapping(
+    response_batch: dm.ResponseBatch, mapping_store: MappingStore
+) -> Optional[dm.BatchMapping]:
+    """
+    Take mapping from the response batch if it was sent inline,
+    else pop it from the mapping store
+    """
+    if response_batch.mapping is None:
+        return mapping_store.pop(response_batch.uid)
+    if response_batch.mapping.journaled:
+        mapping_store.discard(response_batch.uid)
+    return response_batch.mapping.unpack(response_batch.uid)
+
+
+async def send_response_objects(
+    output_socket: zmq.asyncio.Socket,
+    response_batch: dm.ResponseBatch,
+    batch_mapping: dm.BatchMapping,
+    tensor_store: Optional[TensorStore],
+):
+    """
+    Debatch response batch and send response objects
+    """
+    # Create response objects -> apply main function
+    response_objects = debatch(response_batch, batch_mapping)
+    for response_object in response_objects:
+        logger.debug(f"Try to send {response_object}")
+        await snd.send(output_socket, response_object)
+        logger.debug(f"{response_object} was sent")
+
+    if tensor_store is not None:
+        for request_object_uid in batch_mapping.request_object_uids:
+            tensor_store.release(request_object_uid)
+
+
+async def wait_mapping_and_send(
+    output_socket: zmq.asyncio.Socket,
+    response_batch: dm.ResponseBatch,
+    mapping_store: MappingStore,
+    tensor_store: Optional[TensorStore],
+    config: dm.Config,
+):
+    """
+    Wait for the mapping, that comes later than response batch, and send response objects
+    """
+    batch_mapping = await mapping_store.wait_pop(
+        response_batch.uid, timeout=config.mapping_wait_timeout
+    )
+    if batch_mapping is None:
+        logger.error(f"Mapping doesnot exists for {response_batch=}")
+        return
+    await send_response_objects(
+        output_socket, response_batch, batch_mapping, tensor_store
+    )
 
-        if batch_mapping is None:
-            continue
 
-        # Create response objects -> apply main function
-        response_objects = debatch(response_batch, batch_mapping)
-        for response_object in response_objects:
-            logger.debug(f"Try to send {response_object}")
-            await snd.send(output_socket, response_object)
-            logger.debug(f"{response_object} was sent")
+async def collect_tensors(tensor_store: TensorStore, ttl: float):
+    """
+    Remove abandoned tensors from shared memory each ttl seconds
+    """
+    while True:
+        await asyncio.sleep(ttl)
+        tensor_store.collect_garbage(max_age=ttl)
 
 
 if __name__ == "__main__":
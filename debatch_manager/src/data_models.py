@@ -2,6 +2,8 @@
 Data object definitions
 """
 
+from typing import Optional
+
 from pydantic import BaseModel
 
 from shared_modules.data_objects import (
@@ -15,6 +17,7 @@ from shared_modules.data_objects import (
     ResponseBatch,
     RequestInfo,
     ResponseInfo,
+    Rejection,
 )
 
 
@@ -28,12 +31,29 @@ class Config(BaseModel):
         Address of zreomq socket ipc for input requests
     zmq_output_address:
         Address of zreomq socket ipc for result batches
+    zmq_mapping_address:
+        Address of zeromq socket ipc for batch mappings from batch_manager
     db_file:
-        File path to leveldb
+        File path to leveldb, debatch_manager is the only owner of the database
+    create_db_file:
+        Create db file if file doesnot exists
+    mapping_commit_interval:
+        Period (in seconds) of writing new mappings into database
+    mapping_wait_timeout:
+        How long (in seconds) to wait for the mapping of received response batch
+    tensor_store_path:
+        Directory in shared memory for input tensors, same as in bridges.
+        Tensors of requests are released when responses are sent
+    tensor_store_ttl:
+        Tensors older than ttl seconds are removed as abandoned
     """
 
     zmq_input_address: str
     zmq_output_address: str
+    zmq_mapping_address: str
     db_file: str
     create_db_file: bool
-    send_batch_mapping_timeout: float
+    mapping_commit_interval: float = 0.01
+    mapping_wait_timeout: float = 10
+    tensor_store_path: Optional[str] = None
+    tensor_store_ttl: float = 3600
@@ -8,7 +8,6 @@ __email__ = "m.gafarova@eora.ru"
 from typing import List, Iterator, Optional, Iterable
 from itertools import repeat
 
-import plyvel  # type: ignore
 from loguru import logger
 
 from shared_modules.utils import uuid4_string_generator
@@ -38,47 +37,40 @@ def debatch(
         if error or batch.mini_batches is None
         else iter(batch.mini_batches)
     )
-    for (request_object_uid, source_id) in iter(batch_mapping):
+    for index, (request_object_uid, source_id) in enumerate(batch_mapping):
         mini_batch = next(mini_batches)
+        crop = batch_mapping.get_crop(index)
         for response_info in mini_batch:
+            if crop is not None and response_info is not None:
+                crop_picture(response_info, crop)
             new_response_object = dm.ResponseObject(
                 uid=request_object_uid,
                 model=batch.model,
                 source_id=source_id,
                 response_info=response_info,
                 error=error,
+                rejection=batch.rejection,
             )
             response_objects.append(new_response_object)
 
     return response_objects
 
 
-def pull_batch_mapping(config: dm.Config, batch: dm.ResponseBatch) -> dm.BatchMapping:
+def crop_picture(response_info: dm.ResponseInfo, crop: List[int]):
     """
-    Retrieve dm.BatchMapping from database
+    Crop picture of the response to the original shape of the input,
+    input was padded to the shape bucket by batch_manager. Note: In place
 
     Parameters
-    ---------
-    config:
-        Config of database
-    batch:
-        Response Batch object
+    ----------
+    response_info:
+        Response with picture
+    crop:
+        Original shape of the input
     """
-    # Open conndection
-    try:
-        database = plyvel.DB(
-            config.db_file,
-        )
-    except plyvel._plyvel.IOError as exc:
-        raise IOError() from exc
-    # Pull batch mapping from database
-    batch_mapping_bytes = database.get(bytes(batch.uid, "utf-8"))
-    batch_mapping = dm.BatchMapping.from_key_value(
-        (bytes(batch.uid, "utf-8"), batch_mapping_bytes)
-    )
-
-    # Delete mapping
-    database.delete(bytes(batch.uid, "utf-8"))
-    database.close()
-
-    return batch_mapping
+    picture = response_info.picture
+    if picture is None or not hasattr(picture, "shape"):
+        return
+    response_info.picture = picture[
+        tuple(slice(0, size) for size in crop[: picture.ndim])
+    ]
@@ -10,6 +10,7 @@ import zmq  # type: ignore
 import zmq.asyncio  # type: ignore
 
 import src.data_models as dm
+from shared_modules.mapping_store import MappingStore
 
 ctx = zmq.asyncio.Context()
 
@@ -40,3 +41,34 @@ async def receive(sock: zmq.asyncio.Socket) -> AsyncIterable[dm.ResponseBatch]:
     while True:
         response_batch = await sock.recv_pyobj()
         yield response_batch
+
+
+def create_mapping_socket(config: dm.Config) -> zmq.asyncio.Socket:
+    """
+    Create async zeromq socket for batch mappings
+
+    Parameters
+    ----------
+    config
+        Config object, required field is a zmq_mapping_address
+    """
+    sock = ctx.socket(zmq.PULL)
+    sock.bind(config.zmq_mapping_address)
+    return sock
+
+
+async def receive_mappings(sock: zmq.asyncio.Socket, mapping_store: MappingStore):
+    """
+    Put received batch mappings into the mapping store
+
+    Parameters
+    ----------
+    sock:
+        Socket is source of batch mappings
+    mapping_store:
+        Store of batch mappings
+    """
+    while True:
+        mapping = await sock.recv_pyobj()
+        if isinstance(mapping, dm.BatchMapping):
+            mapping_store.put(mapping)
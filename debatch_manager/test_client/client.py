@@ -9,7 +9,6 @@ import sys
 
 import zmq  # type: ignore
 import yaml
-import plyvel  # type: ignore
 import numpy as np  # type: ignore
 
 sys.path.append("..")
@@ -46,10 +45,8 @@ def main():
     sock_receiver = ctx.socket(zmq.PULL)
     sock_receiver.connect(config.zmq_output_address)
 
-    try:
-        db = plyvel.DB(config.db_file, create_if_missing=True)
-    except IOError:
-        raise RuntimeError("Failed to open database")
+    sock_mapping = ctx.socket(zmq.PUSH)
+    sock_mapping.connect(config.zmq_mapping_address)
 
     uid_generator = uuid4_string_generator()
 
@@ -67,14 +64,6 @@ def main():
         )
 
         # Create response batch and add to list of response batches
-        request_info1 = dm.RequestInfo(
-            input=np.array([1, 2, 3, 4]),
-            parameters={},
-        )
-        request_info2 = dm.RequestInfo(
-            input=np.array([5, 6, 7, 8]),
-            parameters={},
-        )
         response_info1 = dm.ResponseInfo(
             output=np.array([1, 2, 3, 4]),
             picture=np.array([5, 6, 7, 8]),
@@ -94,18 +83,16 @@ def main():
         responses += [
             ResponseBatch(
                 uid=uid,
-                requests_info=[request_info1, request_info2],
+                size=2,
                 model=stateful_model,
                 status=Status.CREATED,
                 mini_batches=[mini_batch1, mini_batch2],
             )
         ]
 
-        # Put in database
-        db.put(*batch_mapping.to_key_value())
+        # Send mapping to the mapping store
+        sock_mapping.send_pyobj(batch_mapping)
 
-    # Close connection
-    db.close()
     print(responses)
 
     # Send response batches to debatch manager
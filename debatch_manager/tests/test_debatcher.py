@@ -16,14 +16,6 @@ from src.debatcher import (
 stub_model = dm.ModelObject(
     "stub", "registry.visionhub.ru/models/stub:v3", stateless=True, batch_size=128
 )
-request_info1 = dm.RequestInfo(
-    input=np.array([1, 2, 3, 4]),
-    parameters={"sest": "test"},
-)
-request_info2 = dm.RequestInfo(
-    input=np.array([1, 2, 3, 4]),
-    parameters={"sest": "test"},
-)
 response_info1 = dm.ResponseInfo(
     output=np.array([1, 2, 3, 4]),
     picture=np.array([1, 2, 3, 4]),
@@ -37,7 +29,7 @@ response_info2 = dm.ResponseInfo(
 response_batch = dm.ResponseBatch(
     uid="test",
     model=stub_model,
-    requests_info=[request_info1, request_info2],
+    size=2,
     status=dm.Status.CREATED,
     mini_batches=[
         dm.MiniResponseBatch([response_info1]),
@@ -65,10 +57,6 @@ def test_debatch_many():
     assert result[1].response_info == response_info2
 
 
-request_info3 = dm.RequestInfo(
-    input=np.array([1, 2, 3, 4]),
-    parameters={"sest": "test"},
-)
 response_info3 = dm.ResponseInfo(
     output=np.array([1, 2, 3, 4]),
     picture=np.array([1, 2, 3, 4]),
@@ -77,7 +65,7 @@ response_info3 = dm.ResponseInfo(
 response_batch_one = dm.ResponseBatch(
     uid="test",
     model=stub_model,
-    requests_info=[request_info3],
+    size=1,
     status=dm.Status.CREATED,
     mini_batches=[dm.MiniResponseBatch([response_info3])],
 )
@@ -95,10 +83,6 @@ def test_debatch_one():
     assert result[0].response_info == response_info3
 
 
-request_info4 = dm.RequestInfo(
-    input=np.zeros((1,)),
-    parameters={},
-)
 response_info4 = dm.ResponseInfo(
     output={},
     picture=np.zeros((1,)),
@@ -107,7 +91,7 @@ response_info4 = dm.ResponseInfo(
 response_batch_empty = dm.ResponseBatch(
     uid="test",
     model=stub_model,
-    requests_info=[request_info4],
+    size=1,
     status=dm.Status.CREATED,
     mini_batches=[dm.MiniResponseBatch([response_info4])],
 )
@@ -122,3 +106,59 @@ batch_mapping_empty = dm.BatchMapping(
 def test_debatch_empty():
     result = debatch(response_batch_empty, batch_mapping_empty)
     len(result) == 0
+
+
+def test_debatch_crop():
+    padded_response_info = dm.ResponseInfo(
+        output={},
+        picture=np.ones((256, 256, 3)),
+        parameters={},
+    )
+    not_padded_response_info = dm.ResponseInfo(
+        output={},
+        picture=np.ones((256, 256, 3)),
+        parameters={},
+    )
+    response_batch_padded = dm.ResponseBatch(
+        uid="test",
+        model=stub_model,
+        size=2,
+        status=dm.Status.CREATED,
+        mini_batches=[
+            dm.MiniResponseBatch([padded_response_info]),
+            dm.MiniResponseBatch([not_padded_response_info]),
+        ],
+    )
+    batch_mapping_padded = dm.BatchMapping(
+        batch_uid="test",
+        request_object_uids=["robj1", "robj2"],
+        source_ids=["robjsource1", "robjsource2"],
+        crops=[[200, 100, 3], None],
+    )
+
+    result = debatch(response_batch_padded, batch_mapping_padded)
+
+    assert result[0].response_info.picture.shape == (200, 100, 3)
+    assert result[1].response_info.picture.shape == (256, 256, 3)
+
+
+def test_debatch_rejected():
+    """
+    Test that rejection of the batch is propagated to response objects
+    """
+    rejected_batch = dm.ResponseBatch(
+        uid="test",
+        model=stub_model,
+        size=2,
+        status=dm.Status.FAILED,
+        error="Queue is full",
+        rejection=dm.Rejection.QUEUE_FULL,
+    )
+
+    result = debatch(rejected_batch, batch_mapping)
+
+    assert [response_object.rejection for response_object in result] == [
+        dm.Rejection.QUEUE_FULL,
+        dm.Rejection.QUEUE_FULL,
+    ]
+    assert result[0].error == "Queue is full"
@@ -36,6 +36,9 @@ class Config(BaseModel):
     batch_manager_address: str
     debatch_manager_address: str
     model_storage_address: str
+    tensor_store_path: Optional[str] = None
+    min_priority: int = 0
+    max_priority: int = 10
 
 
 class ParameterMessage(Message):
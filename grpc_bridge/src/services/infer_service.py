@@ -11,6 +11,7 @@ import asyncio
 
 from grpcalchemy import Server, Context, grpcmethod
 from grpcalchemy.config import DefaultConfig
+import grpc  # type: ignore
 import zmq
 
 import pydantic
@@ -18,6 +19,7 @@ from loguru import logger
 
 import src.data_models as dm
 from src.utils import grpc_model_into_pydantic_model, response_model_to_infer_result
+from shared_modules.tensor_store import TensorStore
 from shared_modules.bridge_utils import (
     input_to_requests_object,
     get_batch_manager_socket,
@@ -29,6 +31,10 @@ ctx = zmq.Context()
 
 
 def get_inference_service(config: dm.Config) -> Type:
+    tensor_store = (
+        TensorStore(config.tensor_store_path) if config.tensor_store_path else None
+    )
+
     class InferenceService(Server):
         @grpcmethod
         def Infer(self, request: dm.InferRequest, context: Context) -> dm.InferResult:
@@ -38,11 +44,19 @@ def get_inference_service(config: dm.Config) -> Type:
             pydantic_model = grpc_model_into_pydantic_model(request)
             topic = f"grpc_{uuid4()}"
             request_object_aw = input_to_requests_object(
-                pydantic_model, config.model_storage_address, topic=topic
+                pydantic_model,
+                config.model_storage_address,
+                topic=topic,
+                tensor_store=tensor_store,
+                min_priority=config.min_priority,
+                max_priority=config.max_priority,
             )
-            request_object = asyncio.new_event_loop().run_until_complete(
-                request_object_aw
-            )[0]
+            try:
+                request_object = asyncio.new_event_loop().run_until_complete(
+                    request_object_aw
+                )[0]
+            except ValueError as exc:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(exc))
             logger.debug(f"Built request object: {request_object}")
 
             # Send request object into batch manager
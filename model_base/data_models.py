@@ -25,3 +25,4 @@ class ZMQConfig(BaseModel):
     zmq_rcvhwm: int
     zmq_sndtimeo: int
     zmq_rcvtimeo: int
+    zmq_zero_copy: bool = False
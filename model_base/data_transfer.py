@@ -1,5 +1,7 @@
 import zmq  # type: ignore
 
+from shared_modules import tensor_codec
+
 context = zmq.Context()
 
 
@@ -13,16 +15,20 @@ class Sender:
         self.zmq_socket.setsockopt(zmq.SNDHWM, config.zmq_sndhwm)
         self.zmq_socket.setsockopt(zmq.SNDTIMEO, config.zmq_sndtimeo)
         self.zmq_socket.bind(open_address)
+        self.zero_copy = config.zmq_zero_copy
 
     def send(self, data):
-        self.zmq_socket.send_pyobj(data)
+        if self.zero_copy:
+            self.zmq_socket.send_multipart(tensor_codec.encode(data), copy=False)
+        else:
+            self.zmq_socket.send_pyobj(data)
 
     def close(self):
         self.zmq_socket.close()
 
 
 class Receiver:
-    """Opens zmq PULL socket and receives python obj."""
+    """Opens zmq PULL socket and receives python obj, sent as one or several frames."""
 
     def __init__(self, open_address, config):
 
@@ -33,7 +39,8 @@ class Receiver:
         self.zmq_socket.bind(open_address)
 
     def receive(self):
-        data = self.zmq_socket.recv_pyobj()
+        frames = self.zmq_socket.recv_multipart(copy=False)
+        data = tensor_codec.decode(frames)
         return data
 
     def close(self):
@@ -9,6 +9,7 @@ from data_transfer import Sender, Receiver  # type: ignore
 
 class Runner:
     predict_batch = None
+    predict_stacked_batch = None
     init = None
 
     def __init__(
@@ -45,6 +46,8 @@ class Runner:
         sys.path.append("/app")
         model = importlib.import_module("model")
         self.predict_batch = model.predict_batch
+        if "predict_stacked_batch" in dir(model):
+            self.predict_stacked_batch = model.predict_stacked_batch
         if "init" in dir(model):
             self.init = model.init
 
@@ -82,14 +85,15 @@ class Runner:
         if minimal_batch is None:
             logger.warning("Batch object is None\n")
 
-        for request_info in minimal_batch.requests_info:
+        inputs = minimal_batch.get_inputs()
+        for request_info, input_ in zip(minimal_batch.requests_info, inputs):
             sample = dict()
             if "sound" in request_info.parameters:
                 sample["sound"] = request_info.parameters.get("sound")
             if "init" in request_info.parameters:
                 sample["init"] = request_info.parameters.get("init")
                 self.init(**sample["init"])
-            sample["image"] = request_info.input
+            sample["image"] = input_
             samples.append(sample)
 
             # samples is a list of dict of dicts having structure:
@@ -100,7 +104,14 @@ class Runner:
             # - meta: serializable dict with keys required by model
 
         # List of dictionaries prediciton and image
-        results = self.predict_batch(samples, draw=True)
+        # If batch is stacked, model can take images as one array
+        # of shape (N, H, W, 3), samples contain views of this array
+        if minimal_batch.inputs is not None and self.predict_stacked_batch is not None:
+            results = self.predict_stacked_batch(
+                minimal_batch.inputs, samples, draw=True
+            )
+        else:
+            results = self.predict_batch(samples, draw=True)
         logger.info(results)
 
         response_batch = self.build_response_batch(minimal_batch, results)
@@ -88,5 +88,6 @@ class Connector:
             batch_size=model_params["batch_size"],
             run_on_gpu=model_params["run_on_gpu"],
             stateless=model_params["stateless"],
+            latency_budget=model_params.get("latency_budget"),
         )
         return model
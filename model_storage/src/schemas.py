@@ -5,6 +5,8 @@ Pydantic models for admin API
 __author__ = "Madina Gafarova"
 __email__ = "m.gafarova@eora.ru"
 
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -14,3 +16,4 @@ class Model(BaseModel):
     stateless: bool
     batch_size: int
     run_on_gpu: bool
+    latency_budget: Optional[float] = None
@@ -1,8 +1,9 @@
 import os
+from typing import List
 from uuid import uuid4
 
 from loguru import logger
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, HTTPException
 import zmq.asyncio  # type: ignore
 
 from shared_modules.bridge_utils import (
@@ -12,6 +13,7 @@ from shared_modules.bridge_utils import (
     response_objects_to_output,
 )
 from shared_modules.parse_config import read_config_with_env
+from shared_modules.tensor_store import TensorStore
 from shared_modules.utils import recreate_logger
 
 import src.data_models as dm
@@ -26,6 +28,17 @@ config = read_config_with_env(
     config_path="/etc/inferoxy/restapi_bridge.yaml",
     env_prefix="restapi",
 )
+tensor_store = (
+    TensorStore(config.tensor_store_path) if config.tensor_store_path else None
+)
+
+
+# Queue of the model is full - client should slow down,
+# queued request is shed - service is overloaded
+REJECTION_STATUS_CODES = {
+    dm.Rejection.QUEUE_FULL: 429,
+    dm.Rejection.SHED: 503,
+}
 
 
 async def get_context():
@@ -39,9 +52,18 @@ async def infer(
     ctx: zmq.asyncio.Context = Depends(get_context),
 ):
     topic_uid = f"restapi-{uuid4()}"
-    request_objects = await input_to_requests_object(
-        request, config.model_storage_address, topic_uid, ctx
-    )
+    try:
+        request_objects = await input_to_requests_object(
+            request,
+            config.model_storage_address,
+            topic_uid,
+            ctx,
+            tensor_store,
+            min_priority=config.min_priority,
+            max_priority=config.max_priority,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
 
     results_len = len(request_objects)
     batch_socket: zmq.Socket = get_batch_manager_socket(
@@ -56,7 +78,26 @@ async def infer(
 
     response_objects = []
     for _ in range(results_len):
-        response_object = await output_socket.recv_pyobj()
-        response_objects.append(response_object)
+        response_objects.append(await output_socket.recv_pyobj())
+    rejected = [
+        response_object
+        for response_object in response_objects
+        if response_object.rejection is not None
+    ]
+    if rejected and len(rejected) == len(response_objects):
+        raise HTTPException(
+            status_code=get_rejection_status_code(rejected),
+            detail=rejected[0].error,
+        )
     response_model = response_objects_to_output(response_objects)
     return response_model
+
+
+def get_rejection_status_code(rejected: List[dm.ResponseObject]) -> int:
+    """
+    Status code of the request, all inputs of which are rejected,
+    503 if any of them is dropped, otherwise 429
+    """
+    return max(
+        REJECTION_STATUS_CODES[response_object.rejection] for response_object in rejected
+    )
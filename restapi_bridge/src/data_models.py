@@ -15,14 +15,28 @@ from shared_modules.data_objects import (
     RequestModel,
     OutputModel,
     ResponseModel,
+    Rejection,
 )
 
 
 class Config(BaseModel):
     """
     Config object
+
+    Parameters
+    ----------
+    tensor_store_path:
+        Directory in shared memory for input tensors, if not set
+        tensors are sent inside request objects
+    min_priority:
+        Lower bound of priority of requests
+    max_priority:
+        Upper bound of priority of requests
     """
 
     batch_manager_address: str
     debatch_manager_address: str
     model_storage_address: str
+    tensor_store_path: Optional[str] = None
+    min_priority: int = 0
+    max_priority: int = 10
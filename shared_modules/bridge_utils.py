@@ -1,17 +1,23 @@
 __author__ = "Madina Gafarova"
 __email__ = "m.gafarova@eora.ru"
 
-from typing import List
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any
 
 import numpy as np  # type: ignore
 import zmq  # type: ignore
 import zmq.asyncio  # type: ignore
 
 from shared_modules.utils import uuid4_string_generator
+from shared_modules.tensor_store import TensorStore
 import shared_modules.data_objects as dm
 
 generator = uuid4_string_generator()
 
+# Default range of `priority` parameter of requests, priorities out of range are clamped
+MIN_PRIORITY = 0
+MAX_PRIORITY = 10
+
 
 async def get_model(
     slug: str, model_storage_address: str, ctx: zmq.asyncio.Context
@@ -42,6 +48,9 @@ async def input_to_requests_object(
     model_storage_address: str,
     topic: str = "",
     ctx: zmq.asyncio.Context = None,
+    tensor_store: Optional[TensorStore] = None,
+    min_priority: int = MIN_PRIORITY,
+    max_priority: int = MAX_PRIORITY,
 ) -> List[dm.RequestObject]:
     """
     Transform request model into list of request objects
@@ -57,27 +66,103 @@ async def input_to_requests_object(
         will know where is a distenation of response batches.
     ctx:
         ZMQ context that will be used to create ZMQ socket for connecting to model_storage_address
+    tensor_store:
+        If provided, inputs will be written into shared memory,
+        and request objects will contain only handles
+    min_priority:
+        Lower bound of priority of requests
+    max_priority:
+        Upper bound of priority of requests
+
+    Raises
+    ------
+    ValueError
+        If parameters of the request are not valid, for example priority is not integer
     """
     if ctx is None:
         ctx = zmq.asyncio.Context.instance()
     inputs = request_model.inputs
     request_objects = []
 
+    # All inputs are validated before their tensors are written into the store
     for input_model in inputs:
         request_info = convert_input_model(input_model)
+        priority = get_priority(request_info.parameters, min_priority, max_priority)
         model_obj = await get_model(request_model.model, model_storage_address, ctx)
         model_obj.stateless = request_info.parameters.get("stateless", False)
+        deadline = get_deadline(request_info.parameters, model_obj)
         request_object = dm.RequestObject(
             uid=next(generator),
             source_id=topic + ":" + request_model.source_id,
             request_info=request_info,
             model=model_obj,
+            priority=priority,
+            deadline=deadline,
         )
         request_objects.append(request_object)
 
+    if tensor_store is not None:
+        for request_object in request_objects:
+            request_info = request_object.request_info
+            if not request_info.input.dtype.hasobject:
+                request_info.input = tensor_store.put(
+                    request_object.uid, request_info.input
+                )
+
     return request_objects
 
 
+def get_priority(
+    parameters: Dict[str, Any],
+    min_priority: int = MIN_PRIORITY,
+    max_priority: int = MAX_PRIORITY,
+) -> int:
+    """
+    Priority of the request from `priority` parameter (0 by default),
+    clamped to [min_priority, max_priority]
+
+    Raises
+    ------
+    ValueError
+        If priority is not an integer
+    """
+    value = parameters.get("priority", 0)
+    if isinstance(value, bool):
+        raise ValueError(f"Priority must be an integer, got {value!r}")
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            pass
+    if not isinstance(value, int):
+        raise ValueError(f"Priority must be an integer, got {value!r}")
+    return min(max(value, min_priority), max_priority)
+
+
+def get_deadline(
+    parameters: Dict[str, Any], model: dm.ModelObject
+) -> Optional[datetime]:
+    """
+    Deadline of the request from `timeout` parameter (in seconds) of the client,
+    or from latency budget of the model, the earliest of them if both are set
+
+    Raises
+    ------
+    ValueError
+        If timeout is not a number
+    """
+    budgets = [
+        float(budget)
+        for budget in (parameters.get("timeout"), model.latency_budget)
+        if budget is not None
+    ]
+    if not budgets:
+        return None
+    return datetime.now() + timedelta(seconds=min(budgets))
+
+
 def convert_input_model(input_model: dm.InputModel) -> dm.RequestInfo:
     """
     Convert InputModel into RequestInfo
@@ -6,6 +6,7 @@ __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
 import json
+import dataclasses
 from enum import Enum
 from datetime import datetime
 from dataclasses import dataclass, asdict
@@ -32,6 +33,9 @@ class ModelObject:
         Flag, if true then model stateless, else statefull
     batch_size:
         Default batch size
+    latency_budget:
+        Default latency budget (in seconds) of requests of the model,
+        it is used for deadline of the request, if client does not set timeout
     """
 
     name: str
@@ -39,6 +43,7 @@ class ModelObject:
     stateless: bool
     batch_size: int
     run_on_gpu: bool = False
+    latency_budget: Optional[float] = None
 
     def __hash__(self):
         return hash((self.name, self.address))
@@ -58,7 +63,8 @@ class RequestInfo:
         parameters_string = {
             k: str(v)[:7] + "..." for (k, v) in self.parameters.items()
         }
-        return f"RequestInfo(input={self.input.shape}, parameters={parameters_string})"
+        input_string = getattr(self.input, "shape", None)
+        return f"RequestInfo(input={input_string}, parameters={parameters_string})"
 
 
 @dataclass
@@ -115,12 +121,30 @@ class RequestObject:
         Information about model
     request_info:
         RequestInfo is a payload of the request
+    priority:
+        Priority class of the request, requests with higher priority
+        are batched separately and served first
+    deadline:
+        Time, when response is not needed anymore, None if there is no deadline
     """
 
     uid: str
     source_id: str
     request_info: RequestInfo
     model: ModelObject
+    priority: int = 0
+    deadline: Optional[datetime] = None
+
+
+class Rejection(Enum):
+    """
+    Enum that represents why requests are rejected by admission control
+    """
+
+    # Queue of the model is full, new requests are not accepted
+    QUEUE_FULL = "QUEUE_FULL"
+    # Queued requests are dropped to accept newer or more important ones
+    SHED = "SHED"
 
 
 @dataclass
@@ -138,6 +162,8 @@ class ResponseObject:
         ResponseInfo is a payload of the response
     error:
         String error, that will be displayed to user
+    rejection:
+        Reason, if the request is rejected by admission control without processing
     """
 
     uid: str
@@ -145,6 +171,7 @@ class ResponseObject:
     response_info: Optional[ResponseInfo]
     error: Optional[str]
     source_id: str
+    rejection: Optional[Rejection] = None
 
     def to_dict(self):
         return asdict(self)
@@ -165,6 +192,45 @@ class Status(Enum):
     DONE = "DONE"
 
 
+
+@dataclass(eq=False)
+class PackedBatchMapping:
+    """
+    Compact form of `BatchMapping`, that travels inside the batch
+    from batch_manager to debatch_manager. Source ids are dictionary encoded.
+
+    Parameters
+    ----------
+    request_object_uids:
+        Uniq identifiers of RequestObjects
+    source_ids:
+        Unique source ids of the batch
+    source_indices:
+        Index in source_ids of source id of each request
+    crops:
+        Original shapes of padded inputs, see `BatchMapping`
+    journaled:
+        Mapping is also saved into the mapping store of debatch_manager
+    """
+
+    request_object_uids: List[str]
+    source_ids: List[str]
+    source_indices: np.ndarray
+    crops: Optional[List[Optional[List[int]]]] = None
+    journaled: bool = False
+
+    def unpack(self, batch_uid: str) -> "BatchMapping":
+        """
+        Restore BatchMapping of the batch
+        """
+        return BatchMapping(
+            batch_uid=batch_uid,
+            request_object_uids=self.request_object_uids,
+            source_ids=[self.source_ids[index] for index in self.source_indices],
+            crops=self.crops,
+        )
+
+
 @dataclass(eq=False)
 class MinimalBatchObject:
     """
@@ -175,12 +241,20 @@ class MinimalBatchObject:
     ----------
     uid:
         Uniq identifier of the batch
-    inputs:
-        List of tensors, that will be processed.
-    parameters:
-        List of meta information for processing. Order is equal to order of inputs
+    requests_info:
+        List of tensors and meta information for processing
     model:
         Information about model
+    inputs:
+        Stacked tensors of the requests with shape (size, *input_shape),
+        if it is set, input of each RequestInfo is None
+    mapping:
+        Mapping of the batch, if it is sent inside the batch
+    priority:
+        Priority class of the requests of the batch
+    deadline:
+        The earliest deadline of the requests of the batch,
+        expired batches are not sent to the model
     """
 
     uid: str
@@ -196,12 +270,60 @@ class MinimalBatchObject:
     done_at: Optional[datetime] = None
     sent_at: Optional[datetime] = None
     debached_at: Optional[datetime] = None
+    inputs: Optional[np.ndarray] = None
+    mapping: Optional[PackedBatchMapping] = None
+    priority: int = 0
+    deadline: Optional[datetime] = None
+
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        "Deadline of the batch is passed"
+        return self.deadline is not None and self.deadline < (now or datetime.now())
 
     @property
     def size(self) -> int:
         "Actual batch size"
         return len(self.requests_info)
 
+    def get_inputs(self) -> List[Any]:
+        """
+        Inputs of the requests, views of stacked inputs if batch is stacked
+        """
+        if self.inputs is not None:
+            return list(self.inputs)
+        return [request_info.input for request_info in self.requests_info]
+
+    def stack_inputs(self) -> "MinimalBatchObject":
+        """
+        Copy inputs of the requests into one preallocated contiguous array.
+        Inputs can be stacked only if all of them are numpy arrays
+        with the same shape and dtype.
+
+        Returns
+        -------
+            Copy of the batch with stacked inputs, or the same batch
+            if inputs can not be stacked
+        """
+        if self.inputs is not None or not self.requests_info:
+            return self
+        first = self.requests_info[0].input
+        if not isinstance(first, np.ndarray) or first.dtype.hasobject:
+            return self
+        for request_info in self.requests_info:
+            if (
+                not isinstance(request_info.input, np.ndarray)
+                or request_info.input.shape != first.shape
+                or request_info.input.dtype != first.dtype
+            ):
+                return self
+        inputs = np.empty((self.size,) + first.shape, dtype=first.dtype)
+        for i, request_info in enumerate(self.requests_info):
+            inputs[i] = request_info.input
+        requests_info = [
+            RequestInfo(input=None, parameters=request_info.parameters)
+            for request_info in self.requests_info
+        ]
+        return dataclasses.replace(self, requests_info=requests_info, inputs=inputs)
+
     def __eq__(self, other):
         if not isinstance(other, type(self)):
             return False
@@ -230,22 +352,27 @@ class BatchMapping:
         Uniq identifiers of RequestObjects
     source_ids:
         Ids of sourec
+    crops:
+        Original shapes of inputs, that were padded by batch_manager,
+        None for not padded inputs
     """
 
     batch_uid: str
     request_object_uids: List[str]
     source_ids: List[str]
+    crops: Optional[List[Optional[List[int]]]] = None
 
     def to_key_value(self) -> Tuple[bytes, bytes]:
         """
         Make key value tuple, that will be stored in LevelDB
         """
         key = self.batch_uid.encode("utf-8")
-        value = json.dumps(
-            dict(
-                request_object_uids=self.request_object_uids, source_ids=self.source_ids
-            )
-        ).encode("utf-8")
+        value_dict = dict(
+            request_object_uids=self.request_object_uids, source_ids=self.source_ids
+        )
+        if self.crops is not None:
+            value_dict["crops"] = self.crops
+        value = json.dumps(value_dict).encode("utf-8")
         return key, value
 
     @classmethod
@@ -259,20 +386,90 @@ class BatchMapping:
             batch_uid=key,
             request_object_uids=request_object_uids,
             source_ids=source_ids,
+            crops=value.get("crops"),
+        )
+
+    def pack(self, journaled: bool = False) -> PackedBatchMapping:
+        """
+        Make compact form of the mapping, that will be sent inside the batch
+
+        Parameters
+        ----------
+        journaled:
+            Mapping is also saved into the mapping store
+        """
+        indices: dict = {}
+        source_indices = np.fromiter(
+            (indices.setdefault(source_id, len(indices)) for source_id in self.source_ids),
+            dtype=np.uint32,
+            count=len(self.source_ids),
         )
+        return PackedBatchMapping(
+            request_object_uids=self.request_object_uids,
+            source_ids=list(indices),
+            source_indices=source_indices,
+            crops=self.crops,
+            journaled=journaled,
+        )
+
+    def get_crop(self, index: int) -> Optional[List[int]]:
+        """
+        Original shape of the input of index-th request, None if it was not padded
+        """
+        if self.crops is None:
+            return None
+        return self.crops[index]
 
     def __iter__(self) -> Iterator[Tuple[str, str]]:
         return zip(self.request_object_uids, self.source_ids)
 
 
-@dataclass
-class ResponseBatch(MinimalBatchObject):
+@dataclass(eq=False)
+class ResponseBatch:
     """
-    Response batch object, add output and pictures
+    Response batch object, result of the batch processing.
+    It does not contain inputs of the requests,
+    debatch_manager restores requests using BatchMapping.
+
+    Parameters
+    ----------
+    uid:
+        Uniq identifier of the batch
+    model:
+        Information about model
+    size:
+        Number of requests in the batch
+    mini_batches:
+        Responses, one mini batch for each request of the batch
+    error:
+        String error, that will be displayed to user
+    mapping:
+        Mapping of the batch, if it was sent inside the batch
+    rejection:
+        Reason, if requests of the batch are rejected by admission control
+    processing_started_at:
+        Time when the model started processing of the batch,
+        the batch waits in the socket of the model after `started_at`
+        until the previous batch is processed
     """
 
+    uid: str
+    model: ModelObject
+    size: int = 0
+    status: Status = Status.CREATING
+    source_id: Optional[str] = None
     mini_batches: Optional[List[MiniResponseBatch]] = None
     error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    queued_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    processed_at: Optional[datetime] = None
+    done_at: Optional[datetime] = None
+    sent_at: Optional[datetime] = None
+    debached_at: Optional[datetime] = None
+    mapping: Optional[PackedBatchMapping] = None
+    rejection: Optional[Rejection] = None
+    processing_started_at: Optional[datetime] = None
 
     @classmethod
     def from_minimal_batch_object(
@@ -280,15 +477,17 @@ class ResponseBatch(MinimalBatchObject):
         batch: MinimalBatchObject,
         error: Optional[str] = None,
         mini_batches: Optional[List[MiniResponseBatch]] = None,
+        rejection: Optional[Rejection] = None,
     ):
         """
         Make Response Batch object from RequestBactch
         """
         return cls(
             uid=batch.uid,
-            requests_info=batch.requests_info,
             model=batch.model,
+            size=batch.size,
             status=batch.status,
+            source_id=batch.source_id,
             created_at=batch.created_at,
             started_at=batch.started_at,
             done_at=batch.done_at,
@@ -296,12 +495,77 @@ class ResponseBatch(MinimalBatchObject):
             sent_at=batch.queued_at,
             mini_batches=mini_batches,
             error=error,
+            mapping=batch.mapping,
+            rejection=rejection,
+        )
+
+    def get_processing_start(self) -> Optional[datetime]:
+        "Time when the model started processing of the batch, `started_at` if unknown"
+        if self.processing_started_at is not None:
+            return self.processing_started_at
+        return self.started_at
+
+    def __eq__(self, other):
+        if not isinstance(other, type(self)):
+            return False
+        return (
+            self.uid == other.uid
+            and self.model == other.model
+            and self.size == other.size
+            and self.status == other.status
+            and self.mini_batches == other.mini_batches
+            and self.error == other.error
         )
 
     def __hash__(self):
         return hash(self.uid)
 
 
+@dataclass
+class BatchStatistics:
+    """
+    Statistics of the processed batch, task_manager publishes it for batch_manager
+
+    Parameters
+    ----------
+    model:
+        Information about model
+    size:
+        Number of requests in the batch
+    processing_time:
+        Time (in seconds) of batch processing inside the model
+    queue_time:
+        Time (in seconds) that batch was waiting in the task_manager queue
+    """
+
+    model: ModelObject
+    size: int
+    processing_time: float
+    queue_time: float = 0.0
+
+    @classmethod
+    def from_response_batch(cls, batch: ResponseBatch) -> Optional["BatchStatistics"]:
+        """
+        Make statistics from processed batch, None if batch was not processed
+        """
+        processing_start = batch.get_processing_start()
+        if (
+            batch.status != Status.PROCESSED
+            or processing_start is None
+            or batch.processed_at is None
+        ):
+            return None
+        queue_time = 0.0
+        if batch.started_at is not None and batch.queued_at is not None:
+            queue_time = (batch.started_at - batch.queued_at).total_seconds()
+        return cls(
+            model=batch.model,
+            size=batch.size,
+            processing_time=(batch.processed_at - processing_start).total_seconds(),
+            queue_time=max(queue_time, 0.0),
+        )
+
+
 class BaseConfig(BaseModel):
     """
     Generic type of config
@@ -311,12 +575,24 @@ class BaseConfig(BaseModel):
 class ZMQConfig(BaseConfig):
     """
     Config for ZMQ senders receivers
+
+    Parameters
+    ----------
+    zero_copy:
+        Send tensors as separate frames without pickling them,
+        see `shared_modules.tensor_codec`. Models must be built with
+        `model_base` that receives multipart messages, so it is disabled by default
+    off_loop_threshold:
+        Batches with tensors of at least this size (in bytes) are encoded
+        and decoded in a thread pool instead of the event loop
     """
 
     sndhwm: int
     rcvhwm: int
     sndtimeo: int
     rcvtimeo: int
+    zero_copy: bool = False
+    off_loop_threshold: int = 1048576
 
 
 class PortConfig(BaseConfig):
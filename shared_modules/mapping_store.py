@@ -0,0 +1,139 @@
+"""
+Store of batch mappings.
+
+Only one process (debatch_manager) owns LevelDB, the handle is opened once.
+New mappings are kept in memory and written to LevelDB by group commits
+with one `WriteBatch`. If the mapping is popped before the commit,
+it never touches the database.
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import asyncio
+from pathlib import Path
+from typing import Dict, List, Set, Optional, Union
+
+import plyvel  # type: ignore
+from loguru import logger
+
+from shared_modules.data_objects import BatchMapping
+
+# How many uids of discarded mappings are remembered,
+# if the mapping comes after it was discarded, it is not stored
+MAX_DISCARDED = 10000
+
+
+class MappingStore:
+    """
+    LevelDB store of batch mappings with one long-lived handle
+
+    Parameters
+    ----------
+    db_file:
+        Path to LevelDB
+    create_if_missing:
+        Create database if it does not exist
+    """
+
+    def __init__(self, db_file: Union[str, Path], create_if_missing: bool = True):
+        self.database = plyvel.DB(str(db_file), create_if_missing=create_if_missing)
+        self.__puts: Dict[str, BatchMapping] = {}
+        self.__deletes: Set[str] = set()
+        self.__waiters: Dict[str, List[asyncio.Future]] = {}
+        self.__discarded: Dict[str, None] = {}
+
+    def put(self, mapping: BatchMapping):
+        """
+        Save mapping, it will be written with the next commit
+        """
+        if mapping.batch_uid in self.__discarded:
+            del self.__discarded[mapping.batch_uid]
+            return
+        self.__puts[mapping.batch_uid] = mapping
+        for waiter in self.__waiters.pop(mapping.batch_uid, []):
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def pop(self, batch_uid: str) -> Optional[BatchMapping]:
+        """
+        Remove mapping from the store and return it, None if it does not exist
+        """
+        mapping = self.__puts.pop(batch_uid, None)
+        if mapping is not None:
+            return mapping
+        if batch_uid in self.__deletes:
+            return None
+        key = batch_uid.encode("utf-8")
+        value = self.database.get(key)
+        if value is None:
+            return None
+        self.__deletes.add(batch_uid)
+        return BatchMapping.from_key_value((key, value))
+
+    def discard(self, batch_uid: str):
+        """
+        Remove mapping, that is not needed anymore.
+        If it is not in the store yet, it will not be stored when it comes
+        """
+        if self.pop(batch_uid) is not None:
+            return
+        self.__discarded[batch_uid] = None
+        if len(self.__discarded) > MAX_DISCARDED:
+            del self.__discarded[next(iter(self.__discarded))]
+
+    async def wait_pop(
+        self, batch_uid: str, timeout: float
+    ) -> Optional[BatchMapping]:
+        """
+        Pop mapping, if it does not exist wait `timeout` seconds until it is put.
+        Mapping may come later than the response batch
+        """
+        mapping = self.pop(batch_uid)
+        if mapping is not None or timeout <= 0:
+            return mapping
+        waiter = asyncio.get_running_loop().create_future()
+        self.__waiters.setdefault(batch_uid, []).append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            waiters = self.__waiters.get(batch_uid, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                self.__waiters.pop(batch_uid, None)
+        return self.pop(batch_uid)
+
+    def commit(self) -> int:
+        """
+        Write all new mappings and deletions with one write batch.
+        Return number of operations
+        """
+        operations = len(self.__puts) + len(self.__deletes)
+        if operations == 0:
+            return 0
+        with self.database.write_batch() as write_batch:
+            for mapping in self.__puts.values():
+                write_batch.put(*mapping.to_key_value())
+            for batch_uid in self.__deletes:
+                write_batch.delete(batch_uid.encode("utf-8"))
+        self.__puts.clear()
+        self.__deletes.clear()
+        return operations
+
+    async def committer(self, interval: float):
+        """
+        Commit changes each `interval` seconds
+        """
+        while True:
+            await asyncio.sleep(interval)
+            operations = self.commit()
+            if operations:
+                logger.debug(f"Committed {operations} mapping operations")
+
+    def close(self):
+        """
+        Commit changes and close database
+        """
+        self.commit()
+        self.database.close()
@@ -95,6 +95,9 @@ def recursive_update_all_values(
             value = get_nested_key(config_values, index_prefixes + [name], None)
             env_name = make_env_name(name_prefixes, name)
             new_value = value_storage.get(env_name, value)
+            if new_value is None and not model_field.required:
+                # Not set values are filled with defaults by pydantic
+                continue
             set_nested_key(result_dict, index_prefixes, name, new_value)
         elif is_branching:
             branch_dicts = []
@@ -0,0 +1,101 @@
+"""
+Multipart wire codec for batches with tensors.
+
+Object is sent as a header frame (pickled object, where every large ndarray
+is replaced by a reference) followed by one raw buffer frame per ndarray.
+Buffers are sent with `copy=False` and restored with `np.frombuffer`,
+so tensors are not copied by pickle neither on sending nor on receiving side.
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import io
+import pickle
+from typing import List, Any, Union, Sequence
+
+import numpy as np  # type: ignore
+
+Frame = Union[bytes, memoryview, Any]
+
+# Arrays that are smaller than this will be pickled into the header
+MIN_OUT_OF_BAND_SIZE = 1024
+
+TENSOR_TAG = "ndarray"
+
+# Models are built on python 3.7, which reads pickle protocols up to 4,
+# the same protocol is used by `send_pyobj`
+PICKLE_PROTOCOL = min(pickle.DEFAULT_PROTOCOL, 4)
+
+
+class _TensorPickler(pickle.Pickler):
+    """
+    Pickler that moves contents of the ndarrays into separate buffers
+    """
+
+    def __init__(self, file_, min_size: int):
+        super().__init__(file_, protocol=PICKLE_PROTOCOL)
+        self.min_size = min_size
+        self.buffers: List[memoryview] = []
+
+    def persistent_id(self, obj):  # pylint: disable=E0202
+        if (
+            type(obj) is not np.ndarray  # pylint: disable=C0123
+            or obj.dtype.hasobject
+            or obj.nbytes < self.min_size
+        ):
+            return None
+        array = np.ascontiguousarray(obj)
+        self.buffers.append(memoryview(array.reshape(-1).view(np.uint8)))
+        return (TENSOR_TAG, len(self.buffers), array.dtype.str, array.shape)
+
+
+class _TensorUnpickler(pickle.Unpickler):
+    """
+    Unpickler that restores ndarrays from the buffers without copying
+    """
+
+    def __init__(self, file_, frames: Sequence[Frame]):
+        super().__init__(file_)
+        self.frames = frames
+
+    def persistent_load(self, pid):  # pylint: disable=E0202
+        tag, index, dtype, shape = pid
+        if tag != TENSOR_TAG:
+            raise pickle.UnpicklingError(f"Unsupported persistent id {tag}")
+        buffer = getattr(self.frames[index], "buffer", self.frames[index])
+        return np.frombuffer(buffer, dtype=np.dtype(dtype)).reshape(shape)
+
+
+def encode(obj: Any, min_size: int = MIN_OUT_OF_BAND_SIZE) -> List[Frame]:
+    """
+    Encode object into list of frames, first one is a header
+
+    Parameters
+    ----------
+    obj:
+        Object to encode, usually MinimalBatchObject or ResponseBatch
+    min_size:
+        Arrays with nbytes less than min_size will be stored inside the header
+    """
+    header = io.BytesIO()
+    pickler = _TensorPickler(header, min_size=min_size)
+    pickler.dump(obj)
+    frames: List[Frame] = [header.getvalue()]
+    frames.extend(pickler.buffers)
+    return frames
+
+
+def decode(frames: Sequence[Frame]) -> Any:
+    """
+    Decode object from frames, made by `encode`.
+    If there is only one frame, than it is treated as plain pickle,
+    so the messages sent by `send_pyobj` are also supported.
+
+    Restored arrays are views over the received frames, they are not copied.
+    """
+    header = getattr(frames[0], "bytes", frames[0])
+    if len(frames) == 1:
+        return pickle.loads(header)
+    return _TensorUnpickler(io.BytesIO(header), frames).load()
+
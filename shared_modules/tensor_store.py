@@ -0,0 +1,196 @@
+"""
+Shared memory store for tensors.
+
+Bridge writes input tensor into a segment once, and only `TensorHandle`
+travels through batch_manager and task_manager. Tensor is read from the
+segment (without copying, using mmap) right before sending a batch to the model.
+Each segment has reference counter, when it is released by the last owner
+the segment is removed.
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import os
+import mmap
+import time
+import fcntl
+import struct
+import dataclasses
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Tuple, Union, List
+
+import numpy as np  # type: ignore
+from loguru import logger
+
+from shared_modules.data_objects import RequestInfo, MinimalBatchObject
+
+# Segment starts from the header with reference counter,
+# tensor data is aligned by HEADER_SIZE
+HEADER_FORMAT = "q"
+HEADER_SIZE = 64
+
+
+@dataclass(frozen=True)
+class TensorHandle:
+    """
+    Reference to the tensor stored in shared memory
+
+    Parameters
+    ----------
+    segment:
+        Path to the segment file
+    offset:
+        Offset of the tensor data in the segment
+    shape:
+        Shape of the tensor
+    dtype:
+        Numpy dtype string of the tensor
+    """
+
+    segment: str
+    offset: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @property
+    def nbytes(self) -> int:
+        "Size of the tensor in bytes"
+        return int(np.prod(self.shape, dtype=np.int64)) * np.dtype(self.dtype).itemsize
+
+
+class TensorStore:
+    """
+    Store of tensors in `/dev/shm` (or any other directory), one segment per tensor
+
+    Parameters
+    ----------
+    path:
+        Directory where segments will be stored
+    """
+
+    def __init__(self, path: Union[str, Path] = "/dev/shm/inferoxy"):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def segment_path(self, name: str) -> Path:
+        """
+        Return path of the segment by name, usually name is uid of the request
+        """
+        return self.path / name
+
+    def put(self, name: str, array: np.ndarray) -> TensorHandle:
+        """
+        Write array into new segment, reference counter of the segment is 1
+
+        Parameters
+        ----------
+        name:
+            Name of the segment, must be unique
+        array:
+            Tensor that will be stored
+        """
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            raise ValueError("Arrays with python objects can not be stored")
+        path = self.segment_path(name)
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o600)
+        try:
+            os.ftruncate(fd, HEADER_SIZE + array.nbytes)
+            os.pwrite(fd, struct.pack(HEADER_FORMAT, 1), 0)
+            if array.nbytes:
+                with mmap.mmap(fd, HEADER_SIZE + array.nbytes) as segment:
+                    segment[HEADER_SIZE:] = array.reshape(-1).view(np.uint8).data
+        finally:
+            os.close(fd)
+        return TensorHandle(
+            segment=str(path),
+            offset=HEADER_SIZE,
+            shape=tuple(array.shape),
+            dtype=array.dtype.str,
+        )
+
+    def release(self, name: str) -> int:
+        """
+        Decrease reference counter of the segment, and remove segment
+        if nobody refers to it. Return new value of the counter,
+        or 0 if segment does not exist.
+        """
+        path = self.segment_path(name)
+        try:
+            counter = _update_counter(path, -1)
+        except FileNotFoundError:
+            return 0
+        if counter <= 0:
+            _unlink(path)
+        return counter
+
+    def collect_garbage(self, max_age: float) -> List[str]:
+        """
+        Remove segments that were not changed for more than `max_age` seconds,
+        such segments left after lost requests. Return names of removed segments
+        """
+        removed = []
+        now = time.time()
+        for path in self.path.iterdir():
+            try:
+                if now - path.stat().st_mtime > max_age:
+                    _unlink(path)
+                    removed.append(path.name)
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.warning(f"Removed {len(removed)} abandoned tensor segments")
+        return removed
+
+
+def load(handle: TensorHandle) -> np.ndarray:
+    """
+    Map tensor from the shared memory, array is read only and is not copied
+    """
+    dtype = np.dtype(handle.dtype)
+    if handle.nbytes == 0:
+        return np.empty(handle.shape, dtype=dtype)
+    with open(handle.segment, "rb") as file_:
+        segment = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+    count = handle.nbytes // dtype.itemsize
+    array = np.frombuffer(segment, dtype=dtype, count=count, offset=handle.offset)
+    return array.reshape(handle.shape)
+
+
+def materialize(batch: MinimalBatchObject) -> MinimalBatchObject:
+    """
+    Replace tensor handles in the batch with arrays.
+    Returns copy of the batch if there is at least one handle, else the same batch
+    """
+    if not any(isinstance(info.input, TensorHandle) for info in batch.requests_info):
+        return batch
+    requests_info = [
+        RequestInfo(input=load(info.input), parameters=info.parameters)
+        if isinstance(info.input, TensorHandle)
+        else info
+        for info in batch.requests_info
+    ]
+    return dataclasses.replace(batch, requests_info=requests_info)
+
+
+def _update_counter(path: Path, delta: int) -> int:
+    fd = os.open(path, os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        (counter,) = struct.unpack(
+            HEADER_FORMAT, os.pread(fd, struct.calcsize(HEADER_FORMAT), 0)
+        )
+        counter += delta
+        os.pwrite(fd, struct.pack(HEADER_FORMAT, counter), 0)
+    finally:
+        os.close(fd)
+    return counter
+
+
+def _unlink(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
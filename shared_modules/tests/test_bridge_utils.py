@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+import numpy as np  # type: ignore
+
+from shared_modules import bridge_utils
+from shared_modules.tensor_store import TensorStore, TensorHandle
+from shared_modules.data_objects import ModelObject, RequestModel, InputModel
+
+
+def test_priority_default():
+    assert bridge_utils.get_priority({}) == 0
+
+
+@pytest.mark.parametrize(
+    "value, expected", [(3, 3), ("4", 4), (2.0, 2), (100, 10), (-5, 0)]
+)
+def test_priority_is_clamped(value, expected):
+    assert bridge_utils.get_priority({"priority": value}, 0, 10) == expected
+
+
+@pytest.mark.parametrize("value", ["high", 1.5, True, None, [1]])
+def test_invalid_priority(value):
+    with pytest.raises(ValueError):
+        bridge_utils.get_priority({"priority": value})
+
+
+def test_invalid_input_does_not_leave_tensors(tmp_path, monkeypatch):
+    async def get_model(*args):
+        return ModelObject(
+            "stub", "registry.visionhub.ru/models/stub:v3", stateless=True, batch_size=2
+        )
+
+    monkeypatch.setattr(bridge_utils, "get_model", get_model)
+    store = TensorStore(tmp_path)
+    request_model = RequestModel(
+        source_id="test",
+        model="stub",
+        inputs=[
+            InputModel(data=np.zeros((4, 4)), parameters={}),
+            InputModel(data=np.zeros((4, 4)), parameters={"priority": "high"}),
+        ],
+    )
+
+    with pytest.raises(ValueError):
+        asyncio.run(
+            bridge_utils.input_to_requests_object(
+                request_model, "", ctx=object(), tensor_store=store
+            )
+        )
+    assert list(tmp_path.iterdir()) == []
+
+    request_model.inputs.pop()
+    request_objects = asyncio.run(
+        bridge_utils.input_to_requests_object(
+            request_model, "", ctx=object(), tensor_store=store
+        )
+    )
+    assert isinstance(request_objects[0].request_info.input, TensorHandle)
+    assert len(list(tmp_path.iterdir())) == 1
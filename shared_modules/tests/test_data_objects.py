@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+
+import numpy as np  # type: ignore
+
+from shared_modules.data_objects import (
+    ModelObject,
+    RequestInfo,
+    ResponseInfo,
+    MinimalBatchObject,
+    MiniResponseBatch,
+    ResponseBatch,
+    BatchStatistics,
+    BatchMapping,
+    Status,
+)
+
+
+stub_model = ModelObject(
+    "stub", "registry.visionhub.ru/models/stub:v3", stateless=True, batch_size=2
+)
+
+
+def test_response_batch_without_inputs():
+    batch = MinimalBatchObject(
+        uid="test",
+        requests_info=[
+            RequestInfo(input=np.zeros((8, 8, 3)), parameters={}),
+            RequestInfo(input=np.zeros((8, 8, 3)), parameters={}),
+        ],
+        model=stub_model,
+        status=Status.SENT_TO_MODEL,
+    )
+    mini_batches = [
+        MiniResponseBatch([ResponseInfo(output={}, parameters={}, picture=None)]),
+        MiniResponseBatch([ResponseInfo(output={}, parameters={}, picture=None)]),
+    ]
+
+    response_batch = ResponseBatch.from_minimal_batch_object(
+        batch, mini_batches=mini_batches
+    )
+
+    assert not hasattr(response_batch, "requests_info")
+    assert response_batch.uid == batch.uid
+    assert response_batch.size == 2
+    assert response_batch.status == Status.SENT_TO_MODEL
+    assert response_batch.mini_batches == mini_batches
+
+
+def test_batch_statistics():
+    started_at = datetime(2021, 1, 1, 12, 0, 0)
+    response_batch = ResponseBatch(
+        uid="test",
+        model=stub_model,
+        size=2,
+        status=Status.PROCESSED,
+        queued_at=started_at - timedelta(seconds=0.5),
+        started_at=started_at,
+        processed_at=started_at + timedelta(seconds=0.25),
+    )
+
+    statistics = BatchStatistics.from_response_batch(response_batch)
+
+    assert statistics == BatchStatistics(
+        model=stub_model, size=2, processing_time=0.25, queue_time=0.5
+    )
+    response_batch.status = Status.FAILED
+    assert BatchStatistics.from_response_batch(response_batch) is None
+
+
+def test_stack_inputs():
+    images = [np.random.randint(0, 255, (8, 8, 3), dtype=np.uint8) for _ in range(3)]
+    batch = MinimalBatchObject(
+        uid="test",
+        requests_info=[
+            RequestInfo(input=image, parameters={"i": i})
+            for i, image in enumerate(images)
+        ],
+        model=stub_model,
+    )
+
+    stacked_batch = batch.stack_inputs()
+
+    assert stacked_batch.inputs.shape == (3, 8, 8, 3)
+    assert stacked_batch.inputs.flags["C_CONTIGUOUS"]
+    assert all(info.input is None for info in stacked_batch.requests_info)
+    assert [info.parameters for info in stacked_batch.requests_info] == [
+        {"i": 0},
+        {"i": 1},
+        {"i": 2},
+    ]
+    for stacked_input, image in zip(stacked_batch.get_inputs(), images):
+        assert np.array_equal(stacked_input, image)
+    assert batch.requests_info[0].input is images[0]
+    assert stacked_batch.stack_inputs() is stacked_batch
+
+
+def test_stack_inputs_different_shapes():
+    batch = MinimalBatchObject(
+        uid="test",
+        requests_info=[
+            RequestInfo(input=np.zeros((8, 8, 3)), parameters={}),
+            RequestInfo(input=np.zeros((4, 8, 3)), parameters={}),
+        ],
+        model=stub_model,
+    )
+
+    assert batch.stack_inputs() is batch
+    assert batch.inputs is None
+
+
+def test_pack_batch_mapping():
+    mapping = BatchMapping(
+        batch_uid="test",
+        request_object_uids=["request1", "request2", "request3"],
+        source_ids=["source1", "source2", "source1"],
+        crops=[None, [8, 8, 3], None],
+    )
+
+    packed_mapping = mapping.pack(journaled=True)
+
+    assert packed_mapping.source_ids == ["source1", "source2"]
+    assert packed_mapping.source_indices.tolist() == [0, 1, 0]
+    assert packed_mapping.journaled
+    assert packed_mapping.unpack("test") == mapping
+
+
+def test_response_batch_echoes_mapping():
+    mapping = BatchMapping(
+        batch_uid="test", request_object_uids=["request1"], source_ids=["source1"]
+    )
+    batch = MinimalBatchObject(
+        uid="test",
+        requests_info=[RequestInfo(input=np.zeros((8, 8, 3)), parameters={})],
+        model=stub_model,
+        mapping=mapping.pack(),
+    )
+
+    response_batch = ResponseBatch.from_minimal_batch_object(batch)
+
+    assert response_batch.mapping.unpack(response_batch.uid) == mapping
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from shared_modules.data_objects import BatchMapping
+from shared_modules.mapping_store import MappingStore
+
+
+def make_mapping(batch_uid: str) -> BatchMapping:
+    return BatchMapping(
+        batch_uid=batch_uid,
+        request_object_uids=[f"{batch_uid}_request"],
+        source_ids=["source"],
+    )
+
+
+def test_pop_not_committed(tmp_path):
+    store = MappingStore(tmp_path / "db")
+    store.put(make_mapping("batch"))
+
+    assert store.pop("batch") == make_mapping("batch")
+    assert store.pop("batch") is None
+    assert store.commit() == 0
+    assert list(store.database) == []
+
+
+def test_pop_committed(tmp_path):
+    store = MappingStore(tmp_path / "db")
+    store.put(make_mapping("batch1"))
+    store.put(make_mapping("batch2"))
+
+    assert store.commit() == 2
+    assert store.pop("batch1") == make_mapping("batch1")
+    assert store.pop("batch1") is None
+    assert store.commit() == 1
+    store.close()
+
+    store = MappingStore(tmp_path / "db")
+    assert store.pop("batch1") is None
+    assert store.pop("batch2") == make_mapping("batch2")
+
+
+@pytest.mark.asyncio
+async def test_wait_pop(tmp_path):
+    store = MappingStore(tmp_path / "db")
+
+    async def put_later():
+        await asyncio.sleep(0.05)
+        store.put(make_mapping("batch"))
+
+    asyncio.create_task(put_later())
+    assert await store.wait_pop("batch", timeout=1) == make_mapping("batch")
+    assert await store.wait_pop("unknown", timeout=0.05) is None
+
+
+def test_discard(tmp_path):
+    store = MappingStore(tmp_path / "db")
+    store.put(make_mapping("batch1"))
+
+    store.discard("batch1")
+    store.discard("batch2")
+    store.put(make_mapping("batch2"))
+
+    assert store.pop("batch1") is None
+    assert store.pop("batch2") is None
+    assert store.commit() == 0
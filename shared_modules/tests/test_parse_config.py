@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Union
+from typing import Union, Dict, List
 
 from shared_modules.parse_config import recursive_update_all_values, get_nested_key
 
@@ -98,3 +98,25 @@ def test_recursive_update_all_values_branching_structure():
         "timeout": 3,
         "branching": {"address": "google.com", "keep_alive": 12},
     }
+
+
+def test_recursive_update_all_values_defaults():
+    class NestedConfig(BaseModel):
+        enabled: bool = False
+        buckets: Dict[str, List[int]] = {}
+
+    class SampleConfigModel(BaseModel):
+        test: str
+        nested_config: NestedConfig = NestedConfig()
+        timeout: float = 0.1
+
+    result = recursive_update_all_values(
+        SampleConfigModel,
+        {"test": "hello"},
+        ["sample"],
+        value_storage={"SAMPLE_NESTED_CONFIG_ENABLED": True},
+    )
+    assert result == {"test": "hello", "nested_config": {"enabled": True}}
+    assert SampleConfigModel(**result) == SampleConfigModel(
+        test="hello", nested_config=NestedConfig(enabled=True)
+    )
@@ -0,0 +1,64 @@
+import numpy as np  # type: ignore
+
+from shared_modules import tensor_codec
+from shared_modules.data_objects import (
+    ModelObject,
+    RequestInfo,
+    MinimalBatchObject,
+)
+
+
+stub_model = ModelObject(
+    "stub", "registry.visionhub.ru/models/stub:v3", stateless=True, batch_size=2
+)
+
+
+def test_encode_decode_batch():
+    images = [
+        np.random.randint(0, 255, (32, 64, 3), dtype=np.uint8),
+        np.random.rand(16, 16).astype(np.float32),
+    ]
+    batch = MinimalBatchObject(
+        uid="test",
+        requests_info=[
+            RequestInfo(input=images[0], parameters={"gif_id": 12}),
+            RequestInfo(input=images[1], parameters={}),
+        ],
+        model=stub_model,
+    )
+
+    frames = tensor_codec.encode(batch)
+    assert len(frames) == 3
+
+    result = tensor_codec.decode(frames)
+    assert result.uid == batch.uid
+    assert result.model == batch.model
+    for request_info, image in zip(result.requests_info, images):
+        assert request_info.input.dtype == image.dtype
+        assert np.array_equal(request_info.input, image)
+    assert result.requests_info[0].parameters == {"gif_id": 12}
+
+
+def test_small_and_not_contiguous_arrays():
+    small = np.arange(4)
+    transposed = np.arange(2048, dtype=np.int64).reshape(32, 64).T
+
+    frames = tensor_codec.encode({"small": small, "transposed": transposed})
+    assert len(frames) == 2
+
+    result = tensor_codec.decode(frames)
+    assert np.array_equal(result["small"], small)
+    assert np.array_equal(result["transposed"], transposed)
+
+
+def test_decode_single_frame_pickle():
+    frames = tensor_codec.encode({"a": 1})
+    assert len(frames) == 1
+    assert tensor_codec.decode(frames) == {"a": 1}
+
+
+def test_header_protocol_is_readable_by_python37():
+    frames = tensor_codec.encode({"tensor": np.zeros(2048, dtype=np.uint8)})
+    header = frames[0]
+    assert header[0:1] == b"\x80"
+    assert header[1] <= 4
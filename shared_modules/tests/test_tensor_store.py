@@ -0,0 +1,64 @@
+import numpy as np  # type: ignore
+
+from shared_modules import tensor_store
+from shared_modules.tensor_store import TensorStore, TensorHandle
+from shared_modules.data_objects import (
+    ModelObject,
+    RequestInfo,
+    MinimalBatchObject,
+)
+
+
+stub_model = ModelObject(
+    "stub", "registry.visionhub.ru/models/stub:v3", stateless=True, batch_size=2
+)
+
+
+def test_put_load(tmp_path):
+    store = TensorStore(tmp_path)
+    array = np.random.randint(0, 255, (16, 8, 3), dtype=np.uint8)
+
+    handle = store.put("request", array)
+
+    assert handle.shape == (16, 8, 3)
+    assert handle.nbytes == array.nbytes
+    assert np.array_equal(tensor_store.load(handle), array)
+
+
+def test_reference_counter(tmp_path):
+    store = TensorStore(tmp_path)
+    store.put("request", np.arange(10))
+
+    assert store.segment_path("request").exists()
+    assert store.release("request") == 0
+    assert not store.segment_path("request").exists()
+    assert store.release("request") == 0
+
+
+def test_materialize(tmp_path):
+    store = TensorStore(tmp_path)
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+    inline_array = np.arange(3)
+    batch = MinimalBatchObject(
+        uid="test",
+        requests_info=[
+            RequestInfo(input=store.put("request", array), parameters={}),
+            RequestInfo(input=inline_array, parameters={}),
+        ],
+        model=stub_model,
+    )
+
+    result = tensor_store.materialize(batch)
+
+    assert isinstance(batch.requests_info[0].input, TensorHandle)
+    assert np.array_equal(result.requests_info[0].input, array)
+    assert result.requests_info[1].input is inline_array
+    assert tensor_store.materialize(result) is result
+
+
+def test_collect_garbage(tmp_path):
+    store = TensorStore(tmp_path)
+    store.put("old", np.arange(10))
+
+    assert store.collect_garbage(max_age=3600) == []
+    assert store.collect_garbage(max_age=-1) == ["old"]
@@ -25,7 +25,9 @@ from src.alert_sender import AlertManager
 from src.cloud_clients import DockerCloudClient, KubeCloudClient, BaseCloudClient
 from src.load_analyzers import RunningMeanLoadAnalyzer
 from src.batch_queue import InputBatchQueue, OutputBatchQueue
+from src.admission import AdmissionController
 from src.model_instances_storage import ModelInstancesStorage
+from src.selection_policies import make_selection_policy
 from src.batch_processing.queue_processing import send_to_model
 from src.receiver_streams_combiner import ReceiverStreamsCombiner
 from src.health_checker.health_checker_pipeline import HealthCheckerPipeline
@@ -39,10 +41,17 @@ async def pipeline(
     """
     Async pipeline of main IO process, Input is RequestBatches, Output is ResponseBatches
     """
-    input_batch_queue = InputBatchQueue()
+    input_batch_queue = InputBatchQueue(
+        starvation_limit=config.starvation_limit,
+        source_weights=config.source_weights,
+    )
     output_batch_queue = OutputBatchQueue()
     receiver_streams_combiner = ReceiverStreamsCombiner(output_batch_queue)
-    model_instances_storage = ModelInstancesStorage(receiver_streams_combiner)
+    model_instances_storage = ModelInstancesStorage(
+        receiver_streams_combiner,
+        selection_policy=make_selection_policy(config.selection_policy),
+        max_in_flight=config.max_in_flight,
+    )
 
     if isinstance(config.cloud_client, dm.DockerConfig):
         cloud_client: BaseCloudClient = DockerCloudClient(config)
@@ -68,17 +77,30 @@ async def pipeline(
         config=config,
     )
     receiver_socket = rc.create_socket(config)
-    receiver_task = asyncio.create_task(rc.receive(receiver_socket, input_batch_queue))
+    admission_controller = AdmissionController(
+        input_batch_queue,
+        output_batch_queue,
+        queue_limits=config.queue_limits,
+        default_queue_limit=config.default_queue_limit,
+        policy=config.shedding_policy,
+    )
+    receiver_task = asyncio.create_task(
+        rc.receive(receiver_socket, admission_controller)
+    )
     send_to_model_task = asyncio.create_task(
         send_to_model(
             input_batch_queue,
             output_batch_queue,
             model_instances_storage=model_instances_storage,
+            coalesce=config.coalesce_batches,
         )
     )
     receive_from_model_task = asyncio.create_task(receiver_streams_combiner.converter())
     sender_socket = snd.create_socket(config)
-    sender_task = asyncio.create_task(snd.send(sender_socket, output_batch_queue))
+    statistics_socket = snd.create_statistics_socket(config)
+    sender_task = asyncio.create_task(
+        snd.send(sender_socket, output_batch_queue, statistics_socket)
+    )
     health_checker_task = asyncio.create_task(health_checker.pipeline())
     load_analyzer_task = asyncio.create_task(load_analyzer.analyzer_pipeline())
 
@@ -0,0 +1,146 @@
+"""
+This module is responsible for admission control of batches into the input queue.
+Number of queued requests of each model is bounded, batches over the limit
+are not processed and returned with error at once, so clients get fast rejection
+instead of waiting while memory grows
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+import src.data_models as dm
+from src.batch_queue import InputBatchQueue, OutputBatchQueue
+from src.exceptions import QueueLimitExceeded
+
+SHEDDING_POLICIES = ("reject_newest", "reject_oldest", "priority")
+
+
+class AdmissionController:
+    """
+    Put batches into input queue while number of queued requests of the model
+    is not more than its limit, otherwise shed load by the policy:
+
+    - reject_newest: the new batch is rejected
+    - reject_oldest: the oldest queued batches are dropped to admit the new one
+    - priority: queued batches of lower priority than the new one are dropped
+      (the lowest priority, then the newest first), otherwise the new batch is rejected
+
+    Rejected batches are put into output queue with error and rejection reason,
+    their inputs are dropped at once
+
+    Parameters
+    ----------
+    input_batch_queue:
+        Queue of batches, that are waiting for model
+    output_batch_queue:
+        Queue of responses
+    queue_limits:
+        Max number of queued requests by model name
+    default_queue_limit:
+        Max number of queued requests of models, that are not in queue_limits,
+        not limited if it is not set
+    policy:
+        Name of shedding policy
+    """
+
+    def __init__(
+        self,
+        input_batch_queue: InputBatchQueue,
+        output_batch_queue: OutputBatchQueue,
+        queue_limits: Optional[Dict[str, int]] = None,
+        default_queue_limit: Optional[int] = None,
+        policy: str = "reject_newest",
+    ):
+        if policy not in SHEDDING_POLICIES:
+            raise ValueError(f"Unknown shedding policy {policy}")
+        self.input_batch_queue = input_batch_queue
+        self.output_batch_queue = output_batch_queue
+        self.queue_limits = queue_limits or {}
+        self.default_queue_limit = default_queue_limit
+        self.policy = policy
+
+    def get_queue_limit(self, model: dm.ModelObject) -> Optional[int]:
+        """
+        Max number of queued requests of the model, None if it is not limited
+        """
+        return self.queue_limits.get(model.name, self.default_queue_limit)
+
+    async def put(self, batch: dm.MinimalBatchObject):
+        """
+        Admit the batch into input queue or reject it,
+        queued batches may be dropped to admit the batch.
+        The batch is counted as arrived before the decision,
+        so forecasts of load include rejected requests
+        """
+        self.input_batch_queue.add_arrival(batch)
+        limit = self.get_queue_limit(batch.model)
+        queued = self.input_batch_queue.get_num_requests_of_model(batch.model)
+        if limit is None or queued + batch.size <= limit:
+            await self.input_batch_queue.put(batch)
+            return
+        victims = self.select_victims(batch, queued + batch.size - limit)
+        if victims is None:
+            await self.reject(batch, dm.Rejection.QUEUE_FULL)
+            return
+        for victim in victims:
+            if self.input_batch_queue.remove(victim):
+                await self.reject(victim, dm.Rejection.SHED)
+        await self.input_batch_queue.put(batch)
+
+    def select_victims(
+        self, batch: dm.MinimalBatchObject, excess: int
+    ) -> Optional[List[dm.MinimalBatchObject]]:
+        """
+        Queued batches, that are dropped to admit the batch,
+        None if the batch is rejected
+
+        Parameters
+        ----------
+        batch:
+            New batch
+        excess:
+            Number of requests over the limit with the new batch
+        """
+        if self.policy == "reject_newest":
+            return None
+        queued_batches = self.input_batch_queue.get_queued_batches(batch.model)
+        if self.policy == "priority":
+            queued_batches = sorted(
+                (
+                    queued_batch
+                    for queued_batch in reversed(queued_batches)
+                    if queued_batch.priority < batch.priority
+                ),
+                key=lambda queued_batch: queued_batch.priority,
+            )
+        victims = []
+        for queued_batch in queued_batches:
+            if excess <= 0:
+                break
+            victims.append(queued_batch)
+            excess -= queued_batch.size
+        if excess > 0:
+            return None
+        return victims
+
+    async def reject(self, batch: dm.MinimalBatchObject, rejection: dm.Rejection):
+        """
+        Put the batch into output queue with error, drop inputs of the batch
+        """
+        logger.warning(f"Batch {batch.uid} of {batch.model.name} is {rejection}")
+        if rejection == dm.Rejection.SHED:
+            message = f"Model {batch.model.name} is overloaded, request is dropped"
+        else:
+            message = f"Queue of model {batch.model.name} is full, request is rejected"
+        error = QueueLimitExceeded(message)
+        response_batch = dm.ResponseBatch.from_minimal_batch_object(
+            batch, error=str(error), rejection=rejection
+        )
+        batch.inputs = None
+        for request_info in batch.requests_info:
+            request_info.input = None
+        await self.output_batch_queue.put(response_batch)
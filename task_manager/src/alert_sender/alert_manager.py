@@ -12,6 +12,7 @@ from loguru import logger
 import src.data_models as dm
 from src.health_checker.errors import HealthCheckError
 from src.batch_queue import InputBatchQueue, OutputBatchQueue
+from src.batch_processing.coalescing import uncoalesce
 from .base_alert_manager import BaseAlertManager
 
 
@@ -21,20 +22,24 @@ class AlertManager(BaseAlertManager):
         self.output_queue = output_queue
 
     async def send(self, model_instance: dm.ModelInstance, error: HealthCheckError):
-        batch = model_instance.current_processing_batch
-        model_instance.current_processing_batch = None
-        if batch is None:
+        batches = [
+            original_batch
+            for batch in model_instance.finish_all_batches()
+            for original_batch in uncoalesce(batch)
+        ]
+        if not batches:
             logger.warning(f"{model_instance=} has error {repr(error)}, without task")
             return
-        logger.warning(
-            f"{model_instance=} has error {repr(error)}, send {batch.uid=} to output"
-        )
-        batch.status = dm.Status.FAILED
-        batch.done_at = datetime.now()
-        response_batch = dm.ResponseBatch.from_minimal_batch_object(
-            batch, error=str(error)
-        )
-        await self.__send_to_output_queue(response_batch)
+        for batch in batches:
+            logger.warning(
+                f"{model_instance=} has error {repr(error)}, send {batch.uid=} to output"
+            )
+            batch.status = dm.Status.FAILED
+            batch.done_at = datetime.now()
+            response_batch = dm.ResponseBatch.from_minimal_batch_object(
+                batch, error=str(error)
+            )
+            await self.__send_to_output_queue(response_batch)
 
     async def __send_to_output_queue(self, batch: dm.ResponseBatch):
         await self.output_queue.put(batch)
@@ -46,8 +51,7 @@ class AlertManager(BaseAlertManager):
         self, model_instance: dm.ModelInstance, error: HealthCheckError
     ):
         logger.warning(f"{model_instance=} has error {repr(error)} retry task")
-        batch = model_instance.current_processing_batch
-        if batch is None:
-            return
-        batch.status = dm.Status.ERROR
-        await self.__send_to_input_queue(batch)
+        for batch in model_instance.finish_all_batches():
+            for original_batch in uncoalesce(batch):
+                original_batch.status = dm.Status.ERROR
+                await self.__send_to_input_queue(original_batch)
@@ -5,13 +5,15 @@ Store connections for model instances
 __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
-
+import dataclasses
 from datetime import datetime
 
 from loguru import logger
 
 import src.data_models as dm
+from shared_modules.tensor_store import materialize
 from src.batch_queue import InputBatchQueue, OutputBatchQueue
+from src.batch_processing.coalescing import CoalescedBatch, uncoalesce
 
 
 async def adapter_send_to_model(
@@ -25,21 +27,32 @@ async def adapter_send_to_model(
     """
     if not model_instance.running:
         logger.error("{model_instance=} does not running")
-        if batch.retries < 3:
-            batch.status = dm.Status.ERROR
-            await input_queue.put(batch)
-        else:
-            logger.critical(
-                "{model_instance.model=} have problem with starting up. Send {batch.uid=} to output queue with error"
-            )
-            response_batch = dm.ResponseBatch.from_minimal_batch_object(
-                batch, error="Retried over than 3 times. ModelInstance not running"
-            )
-            await output_queue.put(response_batch)
-    model_instance.current_processing_batch = batch
+        model_instance.finish_batch(batch.uid)
+        for original_batch in uncoalesce(batch):
+            if original_batch.retries < 3:
+                original_batch.status = dm.Status.ERROR
+                await input_queue.put(original_batch)
+            else:
+                logger.critical(
+                    "{model_instance.model=} have problem with starting up. Send {batch.uid=} to output queue with error"
+                )
+                response_batch = dm.ResponseBatch.from_minimal_batch_object(
+                    original_batch,
+                    error="Retried over than 3 times. ModelInstance not running",
+                )
+                await output_queue.put(response_batch)
+        return
     batch.status = dm.Status.SENT_TO_MODEL
     batch.started_at = datetime.now()
     logger.info("Try to send batch")
-    await model_instance.sender.send(batch)
+    # Original batches of coalesced batch are not sent to the model
+    batch_for_model = batch.for_model() if isinstance(batch, CoalescedBatch) else batch
+    # Tensors from shared memory are needed only by the model
+    batch_for_model = materialize(batch_for_model)
+    # Inline mapping is not needed by the model,
+    # it is restored from in flight batches on response
+    if batch_for_model.mapping is not None:
+        batch_for_model = dataclasses.replace(batch_for_model, mapping=None)
+    await model_instance.sender.send(batch_for_model)
     del batch
     logger.info("Batch sent")
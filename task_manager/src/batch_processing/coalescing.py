@@ -0,0 +1,149 @@
+"""
+This module is responsible for coalescing of small batches of one queue
+into one batch before sending to the model, and splitting of the response
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import dataclasses
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np  # type: ignore
+
+import src.data_models as dm
+
+
+@dataclass(eq=False)
+class CoalescedBatch(dm.MinimalBatchObject):
+    """
+    Batch, that consists of several batches of one model (and one source for stateful),
+    it is processed by the model as one batch
+
+    Parameters
+    ----------
+    batches:
+        Original batches in order of requests
+    """
+
+    batches: List[dm.MinimalBatchObject] = field(default_factory=list)
+
+    @classmethod
+    def from_batches(
+        cls, uid: str, batches: List[dm.MinimalBatchObject]
+    ) -> "CoalescedBatch":
+        """
+        Merge batches into one, inputs are stacked if all batches are stacked
+        with the same shape and dtype of inputs
+
+        Parameters
+        ----------
+        uid:
+            Uid of the new batch
+        batches:
+            Batches of one queue
+        """
+        first = batches[0]
+        inputs = None
+        if all(
+            batch.inputs is not None
+            and batch.inputs.shape[1:] == first.inputs.shape[1:]
+            and batch.inputs.dtype == first.inputs.dtype
+            for batch in batches
+        ):
+            inputs = np.concatenate([batch.inputs for batch in batches])
+            requests_info = [
+                request_info for batch in batches for request_info in batch.requests_info
+            ]
+        else:
+            requests_info = [
+                dm.RequestInfo(input=input_, parameters=request_info.parameters)
+                for batch in batches
+                for input_, request_info in zip(batch.get_inputs(), batch.requests_info)
+            ]
+        return cls(
+            uid=uid,
+            requests_info=requests_info,
+            model=first.model,
+            retries=max(batch.retries for batch in batches),
+            status=first.status,
+            source_id=first.source_id,
+            created_at=min_time(batch.created_at for batch in batches),
+            queued_at=min_time(batch.queued_at for batch in batches),
+            inputs=inputs,
+            priority=max(batch.priority for batch in batches),
+            deadline=min_time(batch.deadline for batch in batches),
+            batches=batches,
+        )
+
+    def for_model(self) -> dm.MinimalBatchObject:
+        """
+        Batch, that is sent to the model, without original batches
+        """
+        return dm.MinimalBatchObject(
+            uid=self.uid,
+            requests_info=self.requests_info,
+            model=self.model,
+            retries=self.retries,
+            status=self.status,
+            source_id=self.source_id,
+            created_at=self.created_at,
+            queued_at=self.queued_at,
+            started_at=self.started_at,
+            inputs=self.inputs,
+            priority=self.priority,
+            deadline=self.deadline,
+        )
+
+    def split_response_batch(
+        self, response_batch: dm.ResponseBatch
+    ) -> List[dm.ResponseBatch]:
+        """
+        Split response of the model into responses of original batches
+        """
+        response_batches = []
+        offset = 0
+        for batch in self.batches:
+            mini_batches = None
+            if response_batch.mini_batches is not None:
+                mini_batches = response_batch.mini_batches[offset : offset + batch.size]
+            offset += batch.size
+            response_batches.append(
+                dataclasses.replace(
+                    dm.ResponseBatch.from_minimal_batch_object(
+                        batch, error=response_batch.error, mini_batches=mini_batches
+                    ),
+                    status=response_batch.status,
+                    started_at=self.started_at,
+                    processing_started_at=response_batch.processing_started_at,
+                    processed_at=response_batch.processed_at,
+                )
+            )
+        return response_batches
+
+
+def min_time(times):
+    "The earliest of not None times"
+    times = [time_ for time_ in times if time_ is not None]
+    return min(times) if times else None
+
+
+def uncoalesce(batch: dm.MinimalBatchObject) -> List[dm.MinimalBatchObject]:
+    """
+    Original batches of coalesced batch, or the batch itself
+    """
+    if isinstance(batch, CoalescedBatch):
+        return batch.batches
+    return [batch]
+
+
+def split_response_batch(
+    response_batch: dm.ResponseBatch, request_batch: dm.MinimalBatchObject
+) -> List[dm.ResponseBatch]:
+    """
+    Responses of original batches of the request batch
+    """
+    if isinstance(request_batch, CoalescedBatch):
+        return request_batch.split_response_batch(response_batch)
+    return [response_batch]
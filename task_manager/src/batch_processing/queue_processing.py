@@ -5,28 +5,33 @@ Entry point of processing input queue of batches
 __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
+import math
+import heapq
 import asyncio
 from asyncio import QueueEmpty
-from typing import List, Tuple, Optional
+from typing import Set, Optional, List, Tuple
 from datetime import timedelta
 
 from loguru import logger
 
 import src.data_models as dm
 from src.batch_queue import InputBatchQueue, OutputBatchQueue
-from src.exceptions import TagDoesNotExists
+from src.exceptions import TagDoesNotExists, DeadlineExceeded
 from src.model_instances_storage import ModelInstancesStorage
+from shared_modules.utils import uuid4_string_generator
 from src.batch_processing.adapter_model_instance import adapter_send_to_model
+from src.batch_processing.coalescing import CoalescedBatch
 from src.health_checker.errors import ContainerExited
 
 
-async def send_to_model(
-    input_batch_queue: InputBatchQueue,
-    output_batch_queue: OutputBatchQueue,
-    model_instances_storage: ModelInstancesStorage,
-):
+class Dispatcher:
     """
-    Get batch from input_batch_queue and send it to existing model_instance
+    Send batches from input_batch_queue to model instances with credit.
+    Dispatcher does not poll, it wakes up when a batch is put into the input queue,
+    model instance is released after response, or model instance is added or removed.
+    Each batch is sent in a separate task, so one slow send does not block others.
+    Queues are served earliest deadline first (then the oldest first),
+    batches with expired deadline are failed instead of sending
 
     Parameters
     ----------
@@ -34,63 +39,220 @@ async def send_to_model(
         Input batch queue, taged queue with batches
     output_batch_queue:
         Where send results
+    model_instances_storage:
+        Storage of running model instances
+    coalesce:
+        Merge queued batches of one queue up to batch size of the model,
+        see `src.batch_processing.coalescing`
     """
-    while True:
-        logger.debug(f"Queue sizes {input_batch_queue.get_sizes()}")
 
-        # get models with number of errors > 3
-        models_with_errors = model_instances_storage.get_models_with_errors(
+    def __init__(
+        self,
+        input_batch_queue: InputBatchQueue,
+        output_batch_queue: OutputBatchQueue,
+        model_instances_storage: ModelInstancesStorage,
+        coalesce: bool = False,
+    ):
+        self.input_batch_queue = input_batch_queue
+        self.output_batch_queue = output_batch_queue
+        self.model_instances_storage = model_instances_storage
+        self.coalesce = coalesce
+        self.uid_generator = uuid4_string_generator()
+        self.event = asyncio.Event()
+        self.sending_tasks: Set[asyncio.Task] = set()
+        self.expired_batches: List[dm.MinimalBatchObject] = []
+        input_batch_queue.add_observer(self.notify)
+        model_instances_storage.add_observer(self.notify)
+        model_instances_storage.receiver_streams_combiner.add_observer(self.notify)
+
+    def notify(self):
+        """
+        Wake up dispatcher
+        """
+        self.event.set()
+
+    async def run(self):
+        """
+        Dispatch batches each time dispatcher is notified
+        """
+        self.notify()
+        while True:
+            await self.event.wait()
+            self.event.clear()
+            logger.opt(lazy=True).debug(
+                "Queue sizes {}", self.input_batch_queue.get_sizes
+            )
+            await self.fail_batches_of_models_with_errors()
+            self.dispatch()
+            await self.fail_expired_batches()
+
+    async def fail_batches_of_models_with_errors(self):
+        """
+        Send batches of models, that can not be started, to output queue with error
+        """
+        models_with_errors = self.model_instances_storage.get_models_with_errors(
             new_chance_delta=timedelta(seconds=30)
         )
         for model in models_with_errors:
-            source_ids = input_batch_queue.get_source_ids(model)
-            for source_id in source_ids:
-                try:
-                    batch = input_batch_queue.get_nowait(
-                        model=model, source_id=source_id
+            for source_id in self.input_batch_queue.get_source_ids(model):
+                while True:
+                    try:
+                        batch = self.input_batch_queue.get_nowait(
+                            model=model, source_id=source_id
+                        )
+                    except (QueueEmpty, TagDoesNotExists):
+                        logger.debug(f"Queue empty for {model=} {source_id=}")
+                        break
+                    response_batch = dm.ResponseBatch.from_minimal_batch_object(
+                        batch,
+                        error=str(ContainerExited(f"Cannot start model {model.name}")),
                     )
-                except (QueueEmpty, TagDoesNotExists):
-                    logger.debug(f"Queue empty for {model=} {source_id=}")
-                    logger.debug(input_batch_queue)
-                    continue
-                response_batch = dm.ResponseBatch.from_minimal_batch_object(
-                    batch,
-                    error=str(ContainerExited(f"Cannot start model {model.name}")),
-                )
-                await output_batch_queue.put(response_batch)
-
-        models_by_sources_ids: List[
-            Tuple[Optional[str], dm.ModelObject]
-        ] = model_instances_storage.get_running_models_with_source_ids()
-        tasks = []
-        for (source_id, model) in models_by_sources_ids:
-            try:
-                if not model.stateless:
-                    batch = input_batch_queue.get_nowait(
-                        model=model, source_id=source_id
-                    )
-                else:
-                    batch = input_batch_queue.get_nowait(model=model)
-            except (QueueEmpty, TagDoesNotExists):
-                continue
-            model_instance = model_instances_storage.get_next_running_instance(
-                model, source_id
+                    await self.output_batch_queue.put(response_batch)
+
+    async def fail_expired_batches(self):
+        """
+        Send batches with expired deadline to output queue with error
+        """
+        expired_batches, self.expired_batches = self.expired_batches, []
+        for batch in expired_batches:
+            response_batch = dm.ResponseBatch.from_minimal_batch_object(
+                batch,
+                error=str(DeadlineExceeded(f"Deadline of batch {batch.uid} exceeded")),
             )
-            if model_instance is None:
-                logger.warning(
-                    f"Model Instance Storage return None, for {model=} and {source_id=}"
-                )
-                await input_batch_queue.put(batch)
+            await self.output_batch_queue.put(response_batch)
+
+    def dispatch(self) -> int:
+        """
+        Send batches to all model instances with credit, while there are batches.
+        The queue with the earliest deadline of the next batch is served first.
+        Return number of sent batches
+        """
+        sent = 0
+        queues = []
+        for i, (source_id, model) in enumerate(
+            self.model_instances_storage.get_running_models_with_source_ids()
+        ):
+            key = self.get_deadline_key(model, source_id)
+            if key is not None:
+                queues.append((key, i, source_id, model))
+        heapq.heapify(queues)
+        while queues:
+            _, i, source_id, model = heapq.heappop(queues)
+            if not self.dispatch_one(model, source_id):
                 continue
-            model_instance.lock = True
-            logger.info(f"Selected {model_instance}")
-            tasks.append(
-                adapter_send_to_model(
-                    batch, model_instance, input_batch_queue, output_batch_queue
-                )
+            sent += 1
+            key = self.get_deadline_key(model, source_id)
+            if key is not None:
+                heapq.heappush(queues, (key, i, source_id, model))
+        return sent
+
+    def get_deadline_key(
+        self, model: dm.ModelObject, source_id: Optional[str]
+    ) -> Optional[Tuple[float, float]]:
+        """
+        Order of the queue for earliest deadline first,
+        (deadline, queued_at) of the next batch, None if the queue is empty
+        """
+        batch = self.input_batch_queue.peek_nowait(model, source_id)
+        if batch is None:
+            return None
+        deadline = batch.deadline.timestamp() if batch.deadline else math.inf
+        queued_at = batch.queued_at.timestamp() if batch.queued_at else math.inf
+        return (deadline, queued_at)
+
+    def dispatch_one(self, model: dm.ModelObject, source_id: Optional[str]) -> bool:
+        """
+        Send one batch of the model to model instance with credit.
+        Return True if the batch is sent
+        """
+        model_instance = self.model_instances_storage.get_next_not_locked_instance(
+            model, source_id
+        )
+        if model_instance is None:
+            return False
+        try:
+            batch = self.get_batch(model, source_id)
+        except (QueueEmpty, TagDoesNotExists):
+            return False
+        # Credit is taken before sending, so it is not given twice
+        model_instance.start_batch(batch)
+        logger.info(f"Selected {model_instance}")
+        task = asyncio.create_task(
+            adapter_send_to_model(
+                batch,
+                model_instance,
+                self.input_batch_queue,
+                self.output_batch_queue,
             )
-        if tasks:
-            for i in range(0, len(tasks), 4):
-                await asyncio.wait(tasks[i : i + 4])
-        else:
-            await asyncio.sleep(5)
+        )
+        self.sending_tasks.add(task)
+        task.add_done_callback(self.__on_sent)
+        return True
+
+    def get_batch(
+        self, model: dm.ModelObject, source_id: Optional[str]
+    ) -> dm.MinimalBatchObject:
+        """
+        Get the next not expired batch of the queue,
+        with coalescing it also contains following batches, that fit into batch size
+        and have inputs stacked in the same way
+        """
+        batches: List[dm.MinimalBatchObject] = []
+        while not batches:
+            if self.coalesce:
+                batches = self.input_batch_queue.get_many_nowait(
+                    model=model, source_id=source_id, max_size=model.batch_size
+                )
+            else:
+                batches = [
+                    self.input_batch_queue.get_nowait(model=model, source_id=source_id)
+                ]
+            batches = self.__drop_expired(batches)
+        if len(batches) == 1:
+            return batches[0]
+        logger.debug(f"Coalesce {len(batches)} batches of {model.name}")
+        return CoalescedBatch.from_batches(next(self.uid_generator), batches)
+
+    def __drop_expired(
+        self, batches: List[dm.MinimalBatchObject]
+    ) -> List[dm.MinimalBatchObject]:
+        alive = []
+        for batch in batches:
+            if batch.is_expired():
+                logger.warning(f"Batch {batch.uid} is expired before sending")
+                self.expired_batches.append(batch)
+            else:
+                alive.append(batch)
+        return alive
+
+    def __on_sent(self, task: asyncio.Task):
+        self.sending_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Batch is not sent: {task.exception()}")
+
+
+async def send_to_model(
+    input_batch_queue: InputBatchQueue,
+    output_batch_queue: OutputBatchQueue,
+    model_instances_storage: ModelInstancesStorage,
+    coalesce: bool = False,
+):
+    """
+    Get batch from input_batch_queue and send it to existing model_instance
+
+    Parameters
+    ----------
+    input_batch_queue:
+        Input batch queue, taged queue with batches
+    output_batch_queue:
+        Where send results
+    coalesce:
+        Merge queued batches of one queue up to batch size of the model
+    """
+    dispatcher = Dispatcher(
+        input_batch_queue,
+        output_batch_queue,
+        model_instances_storage,
+        coalesce=coalesce,
+    )
+    await dispatcher.run()
@@ -5,9 +5,14 @@ This module is responsible for transfer Batches from receiver to process and fro
 __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
+import math
+import heapq
 import datetime
+import itertools
+import collections
+from collections import OrderedDict
 from asyncio import Queue, QueueEmpty
-from typing import Optional, Dict, Tuple, List
+from typing import Optional, Dict, Tuple, List, Deque, Callable, NamedTuple
 
 from loguru import logger
 
@@ -16,20 +21,315 @@ from src.exceptions import TagDoesNotExists
 
 QueueSize = int
 
+# How many times batches of lower priority can be bypassed
+# by batches of higher priority, before one of them is served
+DEFAULT_STARVATION_LIMIT = 8
+
+# Number of requests, that source with weight 1 can send in one turn of round robin
+DRR_QUANTUM = 16
+
+# Max number of latency samples of processed batches, that are not analyzed yet
+LATENCY_SAMPLES_LIMIT = 100000
+
+
+class LatencySample(NamedTuple):
+    """
+    Latencies of requests of the processed batch in seconds
+    """
+
+    model: dm.ModelObject
+    queue_wait: float
+    latency: float
+    count: int
+
+
+class FairBatches:
+    """
+    Batches of one priority, split by source id. Sources are served
+    by deficit round robin: each turn source gets `quantum * weight` requests of credit
+    and its batches are got while credit is enough, so a source, that floods the model,
+    does not delay batches of other sources.
+    Batches of one source are got in order of (deadline, number of put)
+
+    Parameters
+    ----------
+    source_weight:
+        Function that returns weight of the source, 1 for all sources by default
+    quantum:
+        Number of requests, that source with weight 1 gets each turn
+    """
+
+    def __init__(
+        self,
+        source_weight: Optional[Callable[[Optional[str]], float]] = None,
+        quantum: int = DRR_QUANTUM,
+    ):
+        self.source_weight = source_weight or (lambda source_id: 1.0)
+        self.quantum = quantum
+        self.sources: Dict[
+            Optional[str], List[Tuple[float, int, dm.MinimalBatchObject]]
+        ] = {}
+        self.deficits: Dict[Optional[str], float] = {}
+        self.active: Deque[Optional[str]] = collections.deque()
+        # Credit is already given to the first active source in this turn
+        self.turn_started = False
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def push(self, deadline: float, number: int, item: dm.MinimalBatchObject):
+        """
+        Add batch to the heap of its source
+        """
+        heap = self.sources.get(item.source_id)
+        if heap is None:
+            heap = self.sources[item.source_id] = []
+            self.deficits[item.source_id] = 0.0
+            self.active.append(item.source_id)
+        heapq.heappush(heap, (deadline, number, item))
+        self.size += 1
+
+    def peek(self) -> dm.MinimalBatchObject:
+        """
+        Return the batch, that will be got next
+        """
+        return self.sources[self.__select_source()][0][2]
+
+    def pop(self) -> dm.MinimalBatchObject:
+        """
+        Remove the next batch and return it
+        """
+        source_id = self.__select_source()
+        heap = self.sources[source_id]
+        _, _, item = heapq.heappop(heap)
+        self.deficits[source_id] -= item.size
+        self.size -= 1
+        if not heap:
+            # Source without batches does not keep credit
+            del self.sources[source_id]
+            del self.deficits[source_id]
+            self.active.popleft()
+            self.turn_started = False
+        return item
+
+    def remove(self, item: dm.MinimalBatchObject) -> bool:
+        """
+        Remove the batch, return False if there is no such batch
+        """
+        heap = self.sources.get(item.source_id)
+        index = next(
+            (i for i, (_, _, batch) in enumerate(heap or []) if batch is item), None
+        )
+        if heap is None or index is None:
+            return False
+        heap[index] = heap[-1]
+        heap.pop()
+        heapq.heapify(heap)
+        self.size -= 1
+        if not heap:
+            if self.active[0] == item.source_id:
+                self.turn_started = False
+            self.active.remove(item.source_id)
+            del self.sources[item.source_id]
+            del self.deficits[item.source_id]
+        return True
+
+    def __select_source(self) -> Optional[str]:
+        while True:
+            source_id = self.active[0]
+            if self.deficits[source_id] >= self.sources[source_id][0][2].size:
+                return source_id
+            if self.turn_started:
+                self.active.rotate(-1)
+                self.turn_started = False
+                continue
+            self.deficits[source_id] += self.quantum * self.source_weight(source_id)
+            self.turn_started = True
+
+
+class PriorityBatchQueue(Queue):
+    """
+    Queue of batches of one model, batches with higher priority are got first,
+    batches with the same priority are shared between sources by `FairBatches`,
+    batches of one source are got in FIFO order,
+    or in order of deadlines if `earliest_deadline_first` is set
+    (batches without deadline are after batches with deadline).
+    To protect lower priorities from starvation,
+    priority, that was bypassed `starvation_limit` times in a row, is served next
+
+    Parameters
+    ----------
+    starvation_limit:
+        Max number of times, that non empty priority is bypassed
+    earliest_deadline_first:
+        Order batches of one priority by deadline,
+        it is not set for stateful models, that process batches of the source in order
+    source_weight:
+        Function that returns weight of the source for `FairBatches`
+    """
+
+    def __init__(
+        self,
+        starvation_limit: int = DEFAULT_STARVATION_LIMIT,
+        earliest_deadline_first: bool = False,
+        source_weight: Optional[Callable[[Optional[str]], float]] = None,
+        **kwargs,
+    ):
+        self.starvation_limit = starvation_limit
+        self.earliest_deadline_first = earliest_deadline_first
+        self.source_weight = source_weight
+        super().__init__(**kwargs)
+
+    def _init(self, maxsize):
+        # Named as in asyncio.Queue, that checks emptiness by `self._queue`,
+        # so empty priorities are always removed
+        self._queue: Dict[int, FairBatches] = {}
+        self._bypassed: Dict[int, int] = {}
+        self._size = 0
+        self._puts = itertools.count()
+
+    def qsize(self) -> int:
+        "Number of batches in the queue, not number of priorities"
+        return self._size
+
+    def empty(self) -> bool:
+        "Return True if the queue has no batches"
+        return self._size == 0
+
+    def full(self) -> bool:
+        "Return True if there are maxsize batches in the queue"
+        if self.maxsize <= 0:
+            return False
+        return self._size >= self.maxsize
+
+    def _put(self, item: dm.MinimalBatchObject):
+        deadline = math.inf
+        if self.earliest_deadline_first and item.deadline is not None:
+            deadline = item.deadline.timestamp()
+        level = self._queue.get(item.priority)
+        if level is None:
+            level = self._queue[item.priority] = FairBatches(self.source_weight)
+        level.push(deadline, next(self._puts), item)
+        self._bypassed.setdefault(item.priority, 0)
+        self._size += 1
+
+    def peek_nowait(self) -> Optional[dm.MinimalBatchObject]:
+        """
+        Return the batch, that will be got next, without removing it.
+        None if the queue is empty
+        """
+        if not self._queue:
+            return None
+        return self._queue[self.__select_priority()].peek()
+
+    def remove(self, item: dm.MinimalBatchObject) -> bool:
+        """
+        Remove the batch from the queue, return False if there is no such batch
+        """
+        level = self._queue.get(item.priority)
+        if level is None or not level.remove(item):
+            return False
+        if not level:
+            del self._queue[item.priority]
+            del self._bypassed[item.priority]
+        self._size -= 1
+        return True
+
+    def __select_priority(self) -> int:
+        priorities = sorted(self._queue, reverse=True)
+        for priority in priorities[1:]:
+            if self._bypassed[priority] >= self.starvation_limit:
+                return priority
+        return priorities[0]
+
+    def _get(self) -> dm.MinimalBatchObject:
+        selected = self.__select_priority()
+        for priority in self._queue:
+            if priority != selected:
+                self._bypassed[priority] += 1
+        self._bypassed[selected] = 0
+        level = self._queue[selected]
+        item = level.pop()
+        if not level:
+            del self._queue[selected]
+            del self._bypassed[selected]
+        self._size -= 1
+        return item
+
 
 class InputBatchQueue:
     """
-    Set of queues of modeled input batches, between receiver and process
+    Set of queues of modeled input batches, between receiver and process.
+    Each queue serves batches with higher priority first, see `PriorityBatchQueue`.
+    Number of requests per queue and per model, time of the oldest queued batch
+    of the model and source ids of stateful models are maintained on put and get,
+    so load analyzer and dispatcher query them in O(1)
+
+    Parameters
+    ----------
+    starvation_limit:
+        Max number of times, that batches of lower priority are bypassed
+    source_weights:
+        Weights of sources by prefix of source id, the longest matching prefix is used,
+        weight of other sources is 1. Batches of stateless model are shared
+        between sources in proportion to weights, see `FairBatches`
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        starvation_limit: int = DEFAULT_STARVATION_LIMIT,
+        source_weights: Optional[Dict[str, float]] = None,
+    ):
+        self.starvation_limit = starvation_limit
+        if any(weight <= 0 for weight in (source_weights or {}).values()):
+            raise ValueError("Weights of sources must be positive")
+        # Longer prefixes are checked first
+        self.source_weights = dict(
+            sorted(
+                (source_weights or {}).items(),
+                key=lambda prefix_weight: len(prefix_weight[0]),
+                reverse=True,
+            )
+        )
         self.queues: Dict[
-            str, Dict[Tuple[Optional[str], dm.ModelObject], (QueueSize, Queue)]
+            str, Dict[Tuple[Optional[str], dm.ModelObject], PriorityBatchQueue]
         ] = dict(stateless={}, stateful={})
+        self.__queue_sizes: Dict[Tuple[Optional[str], dm.ModelObject], QueueSize] = {}
+        self.__model_sizes: Dict[dm.ModelObject, QueueSize] = {}
+        # Queued batches of the model by uid in order of put, the first is the oldest
+        self.__queued_batches: Dict[
+            dm.ModelObject, OrderedDict[str, dm.MinimalBatchObject]
+        ] = {}
+        # Number of arrived requests by model, see add_arrival
+        self.__arrived: Dict[dm.ModelObject, int] = {}
+        # Source ids of queues of the stateful model, dict is used as ordered set
+        self.__source_ids: Dict[dm.ModelObject, Dict[Optional[str], None]] = {}
+        self.observers: List[Callable[[], None]] = []
 
     def __str__(self) -> str:
         return str(self.queues)
 
+    def add_observer(self, callback: Callable[[], None]):
+        """
+        Add callback, that is called after each put
+        """
+        self.observers.append(callback)
+
+    def __notify_observers(self):
+        for callback in self.observers:
+            callback()
+
+    def get_source_weight(self, source_id: Optional[str]) -> float:
+        """
+        Weight of the source by the longest matching prefix, 1 by default
+        """
+        if source_id is not None:
+            for prefix, weight in self.source_weights.items():
+                if source_id.startswith(prefix):
+                    return weight
+        return 1.0
+
     @staticmethod
     def __prepare_for_put(item: dm.MinimalBatchObject):
         if item.status == dm.Status.ERROR:
@@ -53,8 +353,9 @@ class InputBatchQueue:
         self.__prepare_for_put(item)
         source_id = self.__get_source_id(item)
         queue = self.__select_or_create_queue(item.model, source_id=source_id)
-        self.__increase_queue_size(item)
+        self.__on_put(item, source_id)
         await queue.put(item)
+        self.__notify_observers()
 
     def get_source_ids(self, model: dm.ModelObject) -> List[Optional[str]]:
         """
@@ -62,11 +363,7 @@ class InputBatchQueue:
         """
         if model.stateless:
             return [None]
-        try:
-
-            return [source_id for source_id, _ in self.queues["stateful"].keys()]
-        except StopIteration:
-            return []
+        return list(self.__source_ids.get(model, ()))
 
     def put_nowait(self, item: dm.MinimalBatchObject):
         """
@@ -81,8 +378,9 @@ class InputBatchQueue:
         self.__prepare_for_put(item)
         source_id = self.__get_source_id(item)
         queue = self.__select_or_create_queue(item.model, source_id=source_id)
-        self.__increase_queue_size(item)
+        self.__on_put(item, source_id)
         queue.put_nowait(item)
+        self.__notify_observers()
 
     @staticmethod
     def __get_source_id(item: dm.MinimalBatchObject) -> Optional[str]:
@@ -90,25 +388,25 @@ class InputBatchQueue:
             return item.source_id
         return None
 
-    def __increase_queue_size(self, batch: dm.MinimalBatchObject):
+    def __on_put(self, batch: dm.MinimalBatchObject, source_id: Optional[str]):
         """
-        Increase size of queue by batch.size
+        Increase sizes of queue and model by batch.size, remember time of the batch
         """
-        sub_queues = self.queues["stateless" if batch.model.stateless else "stateful"]
-        size, queue = sub_queues[(batch.source_id, batch.model)]
-        sub_queues[(batch.source_id, batch.model)] = (size + batch.size, queue)
+        self.__queue_sizes[(source_id, batch.model)] += batch.size
+        self.__model_sizes[batch.model] += batch.size
+        self.__queued_batches[batch.model][batch.uid] = batch
 
-    def __decrease_queue_size(self, batch: dm.MinimalBatchObject):
+    def __on_get(self, batch: dm.MinimalBatchObject, source_id: Optional[str]):
         """
-        Increase size of queue by batch.size
+        Decrease sizes of queue and model by batch.size, forget time of the batch
         """
-        sub_queues = self.queues["stateless" if batch.model.stateless else "stateful"]
-        size, queue = sub_queues[(batch.source_id, batch.model)]
-        sub_queues[(batch.source_id, batch.model)] = (size - batch.size, queue)
+        self.__queue_sizes[(source_id, batch.model)] -= batch.size
+        self.__model_sizes[batch.model] -= batch.size
+        self.__queued_batches[batch.model].pop(batch.uid, None)
 
     def __select_or_create_queue(
         self, model: dm.ModelObject, source_id: Optional[str] = None
-    ) -> Queue:
+    ) -> PriorityBatchQueue:
         queue = self.__select_queue(model, source_id)
         if queue is None:
             queue = self.__create_queue(model, source_id)
@@ -118,17 +416,26 @@ class InputBatchQueue:
         self,
         model: dm.ModelObject,
         source_id: Optional[str] = None,
-    ) -> Queue:
-        queue: Queue = Queue()
+    ) -> PriorityBatchQueue:
+        queue = PriorityBatchQueue(
+            starvation_limit=self.starvation_limit,
+            earliest_deadline_first=model.stateless,
+            source_weight=self.get_source_weight,
+        )
         sub_queue = self.queues["stateless" if model.stateless else "stateful"]
-        sub_queue[(source_id, model)] = (0, queue)
+        sub_queue[(source_id, model)] = queue
+        self.__queue_sizes[(source_id, model)] = 0
+        self.__model_sizes.setdefault(model, 0)
+        self.__queued_batches.setdefault(model, OrderedDict())
+        if not model.stateless:
+            self.__source_ids.setdefault(model, {})[source_id] = None
         return queue
 
     def __select_queue(
         self,
         model: dm.ModelObject,
         source_id: Optional[str] = None,
-    ) -> Optional[Queue]:
+    ) -> Optional[PriorityBatchQueue]:
         """
         Select queue by model
 
@@ -137,12 +444,9 @@ class InputBatchQueue:
         model:
             Tag of the queue
         """
-        try:
-            return self.queues["stateless" if model.stateless else "stateful"][
-                (source_id, model)
-            ][1]
-        except KeyError:
-            return None
+        return self.queues["stateless" if model.stateless else "stateful"].get(
+            (source_id, model)
+        )
 
     def __delete_queue(
         self,
@@ -155,6 +459,16 @@ class InputBatchQueue:
             ]
         except KeyError:
             return
+        del self.__queue_sizes[(source_id, model)]
+        source_ids = self.__source_ids.get(model)
+        if source_ids is not None:
+            source_ids.pop(source_id, None)
+            if source_ids:
+                # Other queues of the stateful model are left
+                return
+            del self.__source_ids[model]
+        del self.__model_sizes[model]
+        del self.__queued_batches[model]
 
     def get_nowait(
         self,
@@ -176,20 +490,85 @@ class InputBatchQueue:
             raise TagDoesNotExists(f"Tag {(source_id, model)} doesnot exists")
         try:
             batch = queue.get_nowait()
-            self.__decrease_queue_size(batch)
+            self.__on_get(batch, source_id)
         except QueueEmpty as exc:
             self.__delete_queue(model, source_id)
             raise exc
         return batch
 
+    def peek_nowait(
+        self,
+        model: dm.ModelObject,
+        source_id: Optional[str] = None,
+    ) -> Optional[dm.MinimalBatchObject]:
+        """
+        Return the batch of the queue, that will be got next, without removing it.
+        None if the queue is empty or does not exist
+        """
+        queue = self.__select_queue(model, source_id)
+        if queue is None:
+            return None
+        return queue.peek_nowait()
+
+    def get_many_nowait(
+        self,
+        model: dm.ModelObject,
+        source_id: Optional[str] = None,
+        max_size: int = 1,
+    ) -> List[dm.MinimalBatchObject]:
+        """
+        Get the next batch and following batches of the queue,
+        while total number of requests is not more than max_size
+        and inputs of the following batch are stacked with the same shape and dtype
+        as inputs of the first batch (or both are not stacked).
+        The first batch is always got, even if it is larger
+
+        Parameters
+        ----------
+        model:
+            model of the queue
+        source_id:
+            source id of the queue for stateful model
+        max_size:
+            Max number of requests in all batches
+        """
+        batches = [self.get_nowait(model, source_id)]
+        size = batches[0].size
+        queue = self.__select_queue(model, source_id)
+        while queue is not None:
+            batch = queue.peek_nowait()
+            if (
+                batch is None
+                or size + batch.size > max_size
+                or not self.__same_inputs_layout(batches[0], batch)
+            ):
+                break
+            batches.append(self.get_nowait(model, source_id))
+            size += batch.size
+        return batches
+
+    @staticmethod
+    def __same_inputs_layout(
+        first: dm.MinimalBatchObject, batch: dm.MinimalBatchObject
+    ) -> bool:
+        """
+        Inputs of both batches are not stacked,
+        or they are stacked with the same shape of the request input and dtype
+        """
+        if first.inputs is None or batch.inputs is None:
+            return first.inputs is None and batch.inputs is None
+        return (
+            first.inputs.shape[1:] == batch.inputs.shape[1:]
+            and first.inputs.dtype == batch.inputs.dtype
+        )
+
     def get_models(self, is_stateless: bool = True) -> List[dm.ModelObject]:
         """
         Return models in the queue
         """
-        source_id_models = list(
-            self.queues["stateless" if is_stateless else "stateful"].keys()
-        )
-        return list(map(lambda x: x[1], source_id_models))
+        return [
+            model for model in self.__model_sizes if model.stateless == is_stateless
+        ]
 
     def get_models_with_source_ids(
         self, is_stateless: bool = True
@@ -197,10 +576,7 @@ class InputBatchQueue:
         """
         Return keys, (source_id, model)
         """
-        source_id_models = list(
-            self.queues["stateless" if is_stateless else "stateful"].keys()
-        )
-        return source_id_models
+        return list(self.queues["stateless" if is_stateless else "stateful"])
 
     def get_num_requests_in_queue(
         self, model: dm.ModelObject, source_id: Optional[str] = None
@@ -208,19 +584,77 @@ class InputBatchQueue:
         """
         Return number of requests in queue, size of each batch in queue
         """
-        sub_queues = self.queues["stateless" if model.stateless else "stateful"]
-        return sub_queues[(source_id, model)][0]
+        return self.__queue_sizes[(source_id, model)]
+
+    def get_num_requests_of_model(self, model: dm.ModelObject) -> QueueSize:
+        """
+        Return number of requests in all queues of the model, 0 if there are no queues
+        """
+        return self.__model_sizes.get(model, 0)
+
+    def add_arrival(self, batch: dm.MinimalBatchObject):
+        """
+        Count requests of the new batch as arrived. Arrivals are counted
+        by admission controller before shedding, so rejected requests are counted too
+        """
+        self.__arrived[batch.model] = self.__arrived.get(batch.model, 0) + batch.size
+
+    def get_arrived_requests(self) -> Dict[dm.ModelObject, int]:
+        """
+        Return total number of requests of each model, that arrived to task manager,
+        including rejected requests, retried batches are not counted
+        """
+        return dict(self.__arrived)
+
+    def get_oldest_queued_at(
+        self, model: dm.ModelObject
+    ) -> Optional[datetime.datetime]:
+        """
+        Return time, when the oldest queued batch of the model was put,
+        None if there are no batches of the model
+        """
+        queued_batches = self.__queued_batches.get(model)
+        if not queued_batches:
+            return None
+        return next(iter(queued_batches.values())).queued_at
+
+    def get_queued_batches(self, model: dm.ModelObject) -> List[dm.MinimalBatchObject]:
+        """
+        Return queued batches of the model in order of put
+        """
+        return list(self.__queued_batches.get(model, {}).values())
+
+    def remove(self, batch: dm.MinimalBatchObject) -> bool:
+        """
+        Remove queued batch, for example to shed load,
+        return False if the batch is not queued
+        """
+        source_id = self.__get_source_id(batch)
+        queue = self.__select_queue(batch.model, source_id)
+        if queue is None or not queue.remove(batch):
+            return False
+        self.__on_get(batch, source_id)
+        return True
+
+    def get_age(
+        self, model: dm.ModelObject, now: Optional[datetime.datetime] = None
+    ) -> float:
+        """
+        Return how long (in seconds) the oldest queued batch of the model waits,
+        0 if there are no batches of the model
+        """
+        oldest = self.get_oldest_queued_at(model)
+        if oldest is None:
+            return 0.0
+        return ((now or datetime.datetime.now()) - oldest).total_seconds()
 
     def get_sizes(self) -> Dict[str, Dict[dm.ModelObject, int]]:
         """
-        Return number of request in input batch queue
+        Return number of requests of each model in input batch queue
         """
-        result: Dict[str, Dict[dm.ModelObject, int]] = {}
-        for sub_queue_name in self.queues:
-            sub_queue = self.queues[sub_queue_name]
-            result[sub_queue_name] = {}
-            for source_id, model in sub_queue:
-                result[sub_queue_name][model] = sub_queue[(source_id, model)][0]
+        result: Dict[str, Dict[dm.ModelObject, int]] = dict(stateless={}, stateful={})
+        for model, size in self.__model_sizes.items():
+            result["stateless" if model.stateless else "stateful"][model] = size
         return result
 
 
@@ -233,6 +667,9 @@ class OutputBatchQueue(Queue):
         super().__init__(*args, **kwargs)
         self.batches_time_processing = {}
         self.error_batches = []
+        self.latency_samples: Deque[LatencySample] = collections.deque(
+            maxlen=LATENCY_SAMPLES_LIMIT
+        )
 
     async def put(
         self,
@@ -255,12 +692,13 @@ class OutputBatchQueue(Queue):
                 item.processed_at = datetime.datetime.now()
 
         logger.debug(f"Response status {item.status}, {item}")
+        processing_start = item.get_processing_start()
         if (
             item.status == dm.Status.PROCESSED
             and not item.processed_at is None
-            and not item.started_at is None
+            and not processing_start is None
         ):
-            processed_time = item.processed_at - item.started_at
+            processed_time = item.processed_at - processing_start
 
             if isinstance(processed_time, datetime.timedelta):
                 processed_time_float = processed_time.total_seconds()
@@ -271,7 +709,29 @@ class OutputBatchQueue(Queue):
                 "processing_time": processed_time_float,
                 "count": item.size,
             }
+            self.__add_latency_sample(item)
         await super().put(item)
         logger.info(
             f"Batch {item.uid} put into the output queue with size {self.qsize()}"
         )
+
+    def __add_latency_sample(self, item: dm.ResponseBatch):
+        """
+        Save time of the batch in the input queue and from its creation until processing
+        """
+        times = (item.queued_at, item.started_at, item.processed_at)
+        if item.size == 0 or not all(
+            isinstance(time_, datetime.datetime) for time_ in times
+        ):
+            return
+        queue_wait = (item.started_at - item.queued_at).total_seconds()
+        created_at = item.created_at or item.queued_at
+        latency = (item.processed_at - created_at).total_seconds()
+        self.latency_samples.append(
+            LatencySample(
+                model=item.model,
+                queue_wait=max(queue_wait, 0.0),
+                latency=max(latency, 0.0),
+                count=item.size,
+            )
+        )
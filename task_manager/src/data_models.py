@@ -6,8 +6,9 @@ __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
 import os
-from dataclasses import dataclass
-from typing import List, Optional, Generic, TypeVar, Union
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Generic, TypeVar, Union, Literal
 
 from pydantic import BaseModel, Field
 
@@ -19,6 +20,8 @@ from shared_modules.data_objects import (
     MiniResponseBatch,
     Status,
     ResponseBatch,
+    Rejection,
+    BatchStatistics,
     RequestInfo,
     ResponseInfo,
     ZMQConfig,
@@ -49,6 +52,88 @@ class StatefulChecker(BaseConfig):
     keep_model: int
 
 
+class PredictiveConfig(BaseConfig):
+    """
+    Config for `PredictiveStatelessChecker`
+
+    Parameters
+    ----------
+    enabled:
+        If false, instances are started only by the current load
+    alpha:
+        Smoothing factor of the level (EWMA) of arrival rate
+    beta:
+        Smoothing factor of the trend of arrival rate
+    gamma:
+        Smoothing factor of seasonal components of arrival rate
+    season_length:
+        Length of the season in ticks of load analyzer, 0 disables seasonality
+    horizon:
+        Number of ticks of load analyzer, for which load is forecasted,
+        should cover the time of start of the model instance
+    target_utilization:
+        Part of time, that instances are expected to be busy with forecasted load
+    """
+
+    enabled: bool = False
+    alpha: float = 0.3
+    beta: float = 0.1
+    gamma: float = 0.2
+    season_length: int = 0
+    horizon: int = 10
+    target_utilization: float = 0.8
+
+
+class LatencyConfig(BaseConfig):
+    """
+    Config for `LatencyPercentileChecker`
+
+    Parameters
+    ----------
+    enabled:
+        If false, latencies are not analyzed
+    quantile:
+        Quantile of latencies, that is compared with targets, for example 0.95
+    queue_wait_targets:
+        Target of the quantile of time in the input queue (in seconds) by model name
+    default_queue_wait_target:
+        Target of queue wait of models, that are not in queue_wait_targets
+    latency_targets:
+        Target of the quantile of time from creation of the batch until it is processed
+        (in seconds) by model name
+    default_latency_target:
+        Target of latency of models, that are not in latency_targets
+    decrease_ratio:
+        Instance of the model is stopped, when quantiles are lower than
+        decrease_ratio * target
+    window_size:
+        Number of ticks of load analyzer, whose latencies are analyzed
+    min_samples:
+        Min number of requests in the window to make triggers
+    relative_accuracy:
+        Relative accuracy of quantiles
+    """
+
+    enabled: bool = False
+    quantile: float = 0.95
+    queue_wait_targets: Dict[str, float] = {}
+    default_queue_wait_target: Optional[float] = None
+    latency_targets: Dict[str, float] = {}
+    default_latency_target: Optional[float] = None
+    decrease_ratio: float = 0.3
+    window_size: int = 10
+    min_samples: int = 20
+    relative_accuracy: float = 0.01
+
+    def get_queue_wait_target(self, model_name: str) -> Optional[float]:
+        "Target of queue wait of the model, None if it is not set"
+        return self.queue_wait_targets.get(model_name, self.default_queue_wait_target)
+
+    def get_latency_target(self, model_name: str) -> Optional[float]:
+        "Target of latency of the model, None if it is not set"
+        return self.latency_targets.get(model_name, self.default_latency_target)
+
+
 class LoadAnalyzerConfig(BaseConfig):
     """
     Configuration for load analyzer
@@ -58,6 +143,8 @@ class LoadAnalyzerConfig(BaseConfig):
     trigger_pipeline: TriggerPipelineConfig
     running_mean: RunningMeanConfig
     stateful_checker: StatefulChecker
+    predictive: PredictiveConfig = PredictiveConfig()
+    latency: LatencyConfig = LatencyConfig()
 
 
 class DockerConfig(BaseModel):
@@ -90,15 +177,59 @@ class HealthCheckerConfig(BaseConfig):
 class Config(BaseModel):
     """
     Config of task manager
+
+    Parameters
+    ----------
+    zmq_statistics_address:
+        Address of zeromq PUB socket for statistics of processed batches,
+        statistics are not published if it is not set
+    starvation_limit:
+        Max number of times in a row, that queued batches of lower priority
+        are bypassed by batches of higher priority of the same model
+    selection_policy:
+        Policy of selection of model instance of stateless model,
+        see `src.selection_policies`
+    max_in_flight:
+        Max number of batches, that are sent to one model instance
+        and not processed yet
+    coalesce_batches:
+        Merge small queued batches of one model (and one source for stateful model)
+        up to batch size of the model before sending
+    source_weights:
+        Weights of sources by prefix of source id ("<topic>:<source_id>"),
+        batches of stateless models are shared between sources in proportion to weights
+    queue_limits:
+        Max number of queued requests by model name, see `src.admission`
+    default_queue_limit:
+        Max number of queued requests of models, that are not in queue_limits,
+        not limited if it is not set
+    shedding_policy:
+        What is rejected, when queue of the model is full
     """
 
     zmq_output_address: str
     zmq_input_address: str
+    zmq_statistics_address: Optional[str] = None
     gpu_all: List[int]
     health_check: HealthCheckerConfig
     load_analyzer: LoadAnalyzerConfig
     models: ModelsRunnerConfig
     max_running_instances: int = 10
+    starvation_limit: int = 8
+    selection_policy: Literal[
+        "round_robin",
+        "join_shortest_queue",
+        "least_outstanding_work",
+        "power_of_two_choices",
+    ] = "round_robin"
+    max_in_flight: int = 2
+    coalesce_batches: bool = True
+    source_weights: Dict[str, float] = {}
+    queue_limits: Dict[str, int] = {}
+    default_queue_limit: Optional[int] = None
+    shedding_policy: Literal["reject_newest", "reject_oldest", "priority"] = (
+        "reject_newest"
+    )
     cloud_client: Union[DockerConfig, KubeConfig] = Field(
         choose_function=lambda x: (
             x["branch_name"] == "DockerConfig"
@@ -111,10 +242,30 @@ class Config(BaseModel):
     )
 
 
+# Weight of the last observation in the moving average of service time
+SERVICE_TIME_ALPHA = 0.2
+
+
 @dataclass
 class ModelInstance:
     """
     Store connection to the model
+
+    Parameters
+    ----------
+    lock:
+        Model instance does not accept new batches, for example it will be stopped
+    in_flight_batches:
+        Batches, that are sent to the model instance and not processed yet,
+        by uid in order of sending
+    max_in_flight:
+        Size of the credit window, max number of in flight batches.
+        Next batch waits in the socket of the model, while the current one is processed
+    service_time:
+        Exponential moving average of processing time of one request (in seconds),
+        None until the first batch is processed
+    last_finished_at:
+        Time, when the last batch was processed
     """
 
     model: ModelObject
@@ -126,11 +277,78 @@ class ModelInstance:
     running: bool
     name: str
     num_gpu: Optional[int] = None
-    current_processing_batch: Optional[MinimalBatchObject] = None
+    in_flight_batches: Dict[str, MinimalBatchObject] = field(default_factory=dict)
+    max_in_flight: int = 1
+    service_time: Optional[float] = None
+    last_finished_at: Optional[datetime] = None
 
     def __hash__(self):
         return hash(self.name)
 
+    @property
+    def current_processing_batch(self) -> Optional[MinimalBatchObject]:
+        "The oldest in flight batch, it is being processed by the model"
+        return next(iter(self.in_flight_batches.values()), None)
+
+    @property
+    def outstanding_batches(self) -> int:
+        "Number of in flight batches"
+        return len(self.in_flight_batches)
+
+    @property
+    def outstanding_requests(self) -> int:
+        "Number of requests in in flight batches"
+        return sum(batch.size for batch in self.in_flight_batches.values())
+
+    @property
+    def has_credit(self) -> bool:
+        "Model instance can accept one more batch"
+        return not self.lock and len(self.in_flight_batches) < self.max_in_flight
+
+    def start_batch(self, batch: MinimalBatchObject):
+        """
+        Register batch, that is sent to the model instance
+        """
+        self.in_flight_batches[batch.uid] = batch
+
+    def finish_batch(
+        self, uid: Optional[str] = None, processing_time: Optional[float] = None
+    ) -> Optional[MinimalBatchObject]:
+        """
+        Register that in flight batch is processed or failed, return the batch
+
+        Parameters
+        ----------
+        uid:
+            Uid of the batch, the oldest in flight batch by default
+        processing_time:
+            Time of processing of the batch in seconds, if it is processed
+        """
+        if uid is None:
+            uid = next(iter(self.in_flight_batches), None)
+        batch = self.in_flight_batches.pop(uid, None) if uid is not None else None
+        if batch is None:
+            return None
+        if processing_time is not None:
+            self.last_finished_at = datetime.now()
+            if batch.size > 0:
+                self.__update_service_time(processing_time / batch.size)
+        return batch
+
+    def finish_all_batches(self) -> List[MinimalBatchObject]:
+        """
+        Remove all in flight batches and return them, for example if the model failed
+        """
+        batches = list(self.in_flight_batches.values())
+        self.in_flight_batches.clear()
+        return batches
+
+    def __update_service_time(self, request_time: float):
+        if self.service_time is None:
+            self.service_time = request_time
+        else:
+            self.service_time += SERVICE_TIME_ALPHA * (request_time - self.service_time)
+
 
 RequestBatch = MinimalBatchObject
 T = TypeVar("T")  # pylint: disable=C0103
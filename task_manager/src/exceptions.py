@@ -11,6 +11,18 @@ class TagDoesNotExists(Exception):
     pass
 
 
+class DeadlineExceeded(Exception):
+    """
+    Rise when deadline of the batch is passed before it is sent to the model
+    """
+
+
+class QueueLimitExceeded(Exception):
+    """
+    Rise when batch is rejected, because queue of the model is full
+    """
+
+
 class CloudClientErrors(Exception):
     def __init__(self, message):
         self.message = message
@@ -14,7 +14,7 @@ from .checker import BaseHealthChecker, Status
 
 class ConnectionChecker(BaseHealthChecker):
     def check(self, model_instance: dm.ModelInstance) -> Status:
-        if not model_instance.lock:
+        if not model_instance.lock and not model_instance.in_flight_batches:
             return Status(model_instance=model_instance, is_running=True, reason=None)
 
         if self.config is None:
@@ -65,7 +65,9 @@ class FatalError(HealthCheckError):
 
 class RetriableError(HealthCheckError):
     """
-    We can to retry a task.
+    We can to retry a task. In flight batches are returned into input queue,
+    so credit of the model instance is released, but its lock is kept:
+    locked model instance may be stopped by decrease trigger
     """
 
     async def process(
@@ -74,6 +76,4 @@ class RetriableError(HealthCheckError):
         model_instance: dm.ModelInstance,
         alert_manager: "BaseAlertManager",
     ):
-        model_instance.lock = False
-        model_instance.current_processing_batch = None
         await alert_manager.retry_task(model_instance, self)
@@ -2,3 +2,5 @@ from .checker import Checker
 from .enough_resources_checker import EnoughResourcesChecker
 from .stateful_checker import StatefulChecker
 from .running_mean_stateless_checker import RunningMeanStatelessChecker
+from .predictive_stateless_checker import PredictiveStatelessChecker
+from .latency_percentile_checker import LatencyPercentileChecker
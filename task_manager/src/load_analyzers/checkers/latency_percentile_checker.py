@@ -0,0 +1,156 @@
+"""
+Concrete checker, that analyze quantiles of queue wait and latency of requests
+make Increase trigger if quantile is higher than target,
+and make Decrease Trigger if quantiles are much lower than targets
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import collections
+from typing import Deque, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from src.load_analyzers.triggers import Trigger
+from src.load_analyzers.quantiles import QuantileSketch
+import src.data_models as dm
+from .checker import Checker
+
+# Quantiles, that are logged and returned by get_quantiles
+REPORTED_QUANTILES = (0.5, 0.95, 0.99)
+
+# Sketches of queue wait and latency of requests processed during one tick
+TickSketches = Tuple[QuantileSketch, QuantileSketch]
+
+
+class LatencyPercentileChecker(Checker):
+    """
+    Keep sketches of queue wait and latency of requests of each stateless model
+    for the last `window_size` ticks. Make increase trigger if the quantile of
+    queue wait or latency is higher than the target of the model, and decrease trigger
+    if all quantiles are lower than `decrease_ratio` * target and the model has
+    more than one instance. Window of the model is cleared after the trigger,
+    so the next decision is made by latencies after scaling
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.config is None:
+            raise ValueError("Config parameter must be set")
+        self.latency = self.config.load_analyzer.latency
+        self.windows: Dict[dm.ModelObject, Deque[TickSketches]] = {}
+
+    def new_sketch(self) -> QuantileSketch:
+        "Empty sketch with configured accuracy"
+        return QuantileSketch(self.latency.relative_accuracy)
+
+    def update_sketches(self):
+        """
+        Move latencies of processed batches from output queue into sketches of the tick
+        """
+        samples = self.output_batch_queue.latency_samples
+        tick: Dict[dm.ModelObject, TickSketches] = {}
+        while samples:
+            sample = samples.popleft()
+            if not sample.model.stateless:
+                continue
+            if sample.model not in tick:
+                tick[sample.model] = (self.new_sketch(), self.new_sketch())
+            queue_wait, latency = tick[sample.model]
+            queue_wait.add(sample.queue_wait, sample.count)
+            latency.add(sample.latency, sample.count)
+
+        for model in set(self.windows) | set(tick):
+            if model not in self.windows:
+                self.windows[model] = collections.deque(maxlen=self.latency.window_size)
+            self.windows[model].append(
+                tick.get(model, (self.new_sketch(), self.new_sketch()))
+            )
+
+    def get_sketches(
+        self, model: dm.ModelObject
+    ) -> Optional[Tuple[QuantileSketch, QuantileSketch]]:
+        """
+        Sketches of queue wait and latency of the model in the window
+        """
+        window = self.windows.get(model)
+        if not window:
+            return None
+        accuracy = self.latency.relative_accuracy
+        return (
+            QuantileSketch.merged((sketches[0] for sketches in window), accuracy),
+            QuantileSketch.merged((sketches[1] for sketches in window), accuracy),
+        )
+
+    def get_quantiles(self, model: dm.ModelObject) -> Dict[str, Dict[float, float]]:
+        """
+        p50, p95 and p99 of queue wait and latency of the model in the window (seconds)
+        """
+        sketches = self.get_sketches(model)
+        if sketches is None or sketches[0].count == 0:
+            return {}
+        return {
+            name: {q: sketch.quantile(q) for q in REPORTED_QUANTILES}
+            for name, sketch in zip(("queue_wait", "latency"), sketches)
+        }
+
+    def get_ratios(self, model: dm.ModelObject) -> List[float]:
+        """
+        Ratios of quantiles of queue wait and latency to their targets,
+        empty if targets are not set or there are not enough requests
+        """
+        sketches = self.get_sketches(model)
+        if sketches is None or sketches[0].count < self.latency.min_samples:
+            return []
+        targets = (
+            self.latency.get_queue_wait_target(model.name),
+            self.latency.get_latency_target(model.name),
+        )
+        return [
+            sketch.quantile(self.latency.quantile) / target
+            for sketch, target in zip(sketches, targets)
+            if target
+        ]
+
+    def make_triggers(self) -> List[Trigger]:
+        if not self.latency.enabled:
+            return []
+        self.update_sketches()
+
+        triggers: List[Trigger] = []
+        for model in list(self.windows):
+            logger.opt(lazy=True).debug(
+                "Latency quantiles of {} = {}",
+                lambda: model.name,
+                lambda: self.get_quantiles(model),
+            )
+            ratios = self.get_ratios(model)
+            if not ratios:
+                continue
+            running = [
+                model_instance
+                for model_instance in self.model_instances_storage.get_model_instances(
+                    model
+                )
+                if not model_instance.lock
+            ]
+            idle = self.model_instances_storage.get_not_locked_model_instances(model)
+            if max(ratios) > 1:
+                logger.debug(f"Make increase trigger, because {ratios=} > 1")
+                triggers += [self.make_increase_trigger(model)]
+            elif (
+                max(ratios) < self.latency.decrease_ratio and len(running) > 1 and idle
+            ):
+                logger.debug(
+                    f"Make decrease trigger, because {ratios=} < "
+                    f"{self.latency.decrease_ratio}"
+                )
+                model_instance = idle[0]
+                model_instance.lock = True
+                triggers += [self.make_decrease_trigger(model_instance=model_instance)]
+            else:
+                continue
+            self.windows[model].clear()
+        logger.debug(f"Triggers after latency_percentile_checker = {triggers}")
+        return triggers
@@ -0,0 +1,136 @@
+"""
+Concrete checker, that forecasts arrival rate of requests
+and make Increase trigger before the load comes
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from src.load_analyzers.triggers import Trigger
+from src.load_analyzers.forecasting import HoltWinters
+import src.data_models as dm
+from .checker import Checker
+
+
+class PredictiveStatelessChecker(Checker):
+    """
+    Keep time series of arrival rate of requests of each stateless model,
+    forecast it with Holt-Winters model for `horizon` ticks
+    and make increase triggers for instances, that forecasted peak needs in addition
+    to running ones, as many as there is capacity for them.
+    Needed number of instances is forecasted rate * service time of the request
+    divided by target utilization. Decrease is left to other checkers
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.config is None:
+            raise ValueError("Config parameter must be set")
+        self.predictive = self.config.load_analyzer.predictive
+        self.forecasters: Dict[dm.ModelObject, HoltWinters] = {}
+        self.arrived: Dict[dm.ModelObject, int] = {}
+        self.last_tick: Optional[float] = None
+
+    def update_forecasters(self, now: Optional[float] = None):
+        """
+        Add arrival rate of each model since the last tick to its time series
+        """
+        if now is None:
+            now = time.monotonic()
+        arrived = self.input_batch_queue.get_arrived_requests()
+        if self.last_tick is not None and now > self.last_tick:
+            elapsed = now - self.last_tick
+            for model, total in arrived.items():
+                if not model.stateless:
+                    continue
+                if model not in self.forecasters:
+                    self.forecasters[model] = HoltWinters(
+                        alpha=self.predictive.alpha,
+                        beta=self.predictive.beta,
+                        gamma=self.predictive.gamma,
+                        season_length=self.predictive.season_length,
+                    )
+                rate = (total - self.arrived.get(model, 0)) / elapsed
+                self.forecasters[model].update(rate)
+        self.arrived = arrived
+        self.last_tick = now
+
+    def forecast_peak_rate(self, model: dm.ModelObject) -> Optional[float]:
+        """
+        The highest forecasted arrival rate (requests per second) within horizon
+        """
+        forecaster = self.forecasters.get(model)
+        if forecaster is None or forecaster.level is None:
+            return None
+        steps = range(1, self.predictive.horizon + 1)
+        return max(max(forecaster.forecast(step) for step in steps), 0.0)
+
+    def estimate_needed_instances(self, model: dm.ModelObject) -> Optional[int]:
+        """
+        Number of instances, that are needed for forecasted load,
+        None if there is no forecast or service time of the model is unknown
+        """
+        peak_rate = self.forecast_peak_rate(model)
+        model_instances = self.model_instances_storage.get_model_instances(model)
+        service_times = [
+            model_instance.service_time
+            for model_instance in model_instances
+            if model_instance.service_time is not None
+        ]
+        if peak_rate is None or not service_times:
+            return None
+        service_time = sum(service_times) / len(service_times)
+        return math.ceil(
+            peak_rate * service_time / self.predictive.target_utilization
+        )
+
+    def get_capacity(self) -> Tuple[int, Dict[dm.ModelObject, int]]:
+        """
+        Number of instances, that can be started, and number of instances
+        of each model, that can be started, limited by `max_model_percent`
+        """
+        max_instances = self.config.max_running_instances
+        max_model_percent = self.config.load_analyzer.trigger_pipeline.max_model_percent
+        number_by_models = (
+            self.model_instances_storage.get_number_of_running_instancse()
+        )
+        max_model_instances = int(max_instances * max_model_percent / 100)
+        return (
+            max_instances - sum(number_by_models.values()),
+            {
+                model: max_model_instances - number_by_models.get(model, 0)
+                for model in self.forecasters
+            },
+        )
+
+    def make_triggers(self) -> List[Trigger]:
+        if not self.predictive.enabled:
+            return []
+        self.update_forecasters()
+
+        capacity, model_capacities = self.get_capacity()
+        triggers: List[Trigger] = []
+        for model in self.forecasters:
+            model_instances = self.model_instances_storage.get_model_instances(model)
+            running = [
+                model_instance
+                for model_instance in model_instances
+                if not model_instance.lock
+            ]
+            needed = self.estimate_needed_instances(model)
+            logger.debug(f"Forecasted {needed=} instances of {model}, {len(running)=}")
+            if needed is None or not running:
+                continue
+            number = min(needed - len(running), capacity, model_capacities[model])
+            if number <= 0:
+                continue
+            capacity -= number
+            triggers += [self.make_increase_trigger(model) for _ in range(number)]
+        logger.debug(f"Triggers after predictive_stateless_checker = {triggers}")
+        return triggers
@@ -44,6 +44,8 @@ class RunningMeanStatelessChecker(Checker):
                 continue
             processing_time = batches_time_processing[response_batch]["processing_time"]
             count = batches_time_processing[response_batch]["count"]
+            if count == 0:
+                continue
             if response_batch.model not in self.processing_times:
                 self.processing_times[response_batch.model] = collections.deque(
                     maxlen=self.window_size
@@ -0,0 +1,85 @@
+"""
+This module is responsible for forecasting of time series of load
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+from typing import List, Optional
+
+
+class HoltWinters:
+    """
+    Additive Holt-Winters model: level is exponential moving average of observations,
+    trend is exponential moving average of changes of the level,
+    seasonal components are exponential moving averages of deviations from the level
+    at the same position of the season.
+    Without trend and seasonality (beta=0, season_length=0) it is EWMA
+
+    Parameters
+    ----------
+    alpha:
+        Smoothing factor of the level
+    beta:
+        Smoothing factor of the trend
+    gamma:
+        Smoothing factor of seasonal components
+    season_length:
+        Number of observations in the season, 0 disables seasonality
+    """
+
+    def __init__(
+        self,
+        alpha: float,
+        beta: float = 0.0,
+        gamma: float = 0.0,
+        season_length: int = 0,
+    ):
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.season_length = season_length
+        self.level: Optional[float] = None
+        self.trend = 0.0
+        self.seasonals: List[float] = [0.0] * season_length
+        self.observations = 0
+
+    def update(self, value: float):
+        """
+        Add the next observation
+        """
+        seasonal = self.__get_seasonal(self.observations)
+        if self.level is None:
+            self.level = value - seasonal
+        else:
+            previous_level = self.level
+            self.level = self.alpha * (value - seasonal) + (1 - self.alpha) * (
+                self.level + self.trend
+            )
+            self.trend = (
+                self.beta * (self.level - previous_level) + (1 - self.beta) * self.trend
+            )
+        if self.season_length:
+            index = self.observations % self.season_length
+            self.seasonals[index] = (
+                self.gamma * (value - self.level) + (1 - self.gamma) * seasonal
+            )
+        self.observations += 1
+
+    def forecast(self, steps: int = 1) -> Optional[float]:
+        """
+        Forecast of the observation after `steps` steps,
+        None if there are no observations
+        """
+        if self.level is None:
+            return None
+        return (
+            self.level
+            + steps * self.trend
+            + self.__get_seasonal(self.observations + steps - 1)
+        )
+
+    def __get_seasonal(self, index: int) -> float:
+        if not self.season_length:
+            return 0.0
+        return self.seasonals[index % self.season_length]
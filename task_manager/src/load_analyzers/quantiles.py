@@ -0,0 +1,88 @@
+"""
+This module is responsible for streaming estimation of quantiles of latencies
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import math
+from typing import Dict, Iterable, Optional
+
+
+class QuantileSketch:
+    """
+    Compact sketch of distribution of non negative values (DDSketch).
+    Values are counted in buckets with logarithmic bounds, so any quantile
+    is estimated with bounded relative error and memory is logarithmic
+    in the range of values. Sketches are merged by summing counts of buckets
+
+    Parameters
+    ----------
+    relative_accuracy:
+        Max relative error of estimated quantiles
+    min_value:
+        Values not more than min_value are counted as zero
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-6):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("Relative accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float, count: int = 1):
+        """
+        Count value `count` times
+        """
+        if value <= self.min_value:
+            self.zero_count += count
+        else:
+            index = math.ceil(math.log(value) / self.log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+
+    def merge(self, other: "QuantileSketch"):
+        """
+        Add values of other sketch of the same accuracy
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("Sketches of different accuracy can not be merged")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate q-quantile (0 <= q <= 1), None if the sketch is empty
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return 2 * self.gamma**index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    @classmethod
+    def merged(
+        cls, sketches: Iterable["QuantileSketch"], relative_accuracy: float = 0.01
+    ) -> "QuantileSketch":
+        """
+        New sketch of values of all sketches
+        """
+        result = cls(relative_accuracy)
+        for sketch in sketches:
+            result.merge(sketch)
+        return result
@@ -10,6 +10,8 @@ from src.load_analyzers.checkers import (
     StatefulChecker,
     RunningMeanStatelessChecker,
     EnoughResourcesChecker,
+    PredictiveStatelessChecker,
+    LatencyPercentileChecker,
 )
 
 
@@ -18,4 +20,10 @@ class RunningMeanLoadAnalyzer(BaseLoadAnalyzer):
     Load analyzer based on running mean of request per model
     """
 
-    checkers = [EnoughResourcesChecker, StatefulChecker, RunningMeanStatelessChecker]
+    checkers = [
+        EnoughResourcesChecker,
+        StatefulChecker,
+        RunningMeanStatelessChecker,
+        PredictiveStatelessChecker,
+        LatencyPercentileChecker,
+    ]
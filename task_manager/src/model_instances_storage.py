@@ -7,30 +7,61 @@ __email__ = "a.chertkov@eora.ru"
 
 from datetime import datetime, timedelta
 from collections import defaultdict
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Callable
 
 from loguru import logger
 
 import src.data_models as dm
 from src.receiver_streams_combiner import ReceiverStreamsCombiner
+from src.selection_policies import SelectionPolicy, RoundRobinPolicy
 
 
 class ModelInstancesStorage:
     """
-    This class is store model instance, and process round robin select over it
+    This class is store model instance, and select model instance for the next batch
+
+    Parameters
+    ----------
+    receiver_streams_combiner:
+        Combiner of responses of model instances
+    selection_policy:
+        Policy of selection of model instances of stateless models,
+        round robin by default
+    max_in_flight:
+        Size of the credit window of each model instance,
+        max number of batches, that are sent and not processed yet
     """
 
-    def __init__(self, receiver_streams_combiner: ReceiverStreamsCombiner):
+    def __init__(
+        self,
+        receiver_streams_combiner: ReceiverStreamsCombiner,
+        selection_policy: Optional[SelectionPolicy] = None,
+        max_in_flight: int = 1,
+    ):
         self.errors: Dict[dm.ModelObject, datetime] = {}
         self.model_instances: Dict[
             dm.ModelObject, List[dm.ModelInstance]
         ] = defaultdict(list)
-        self.indexes: Dict[dm.ModelObject, int] = defaultdict(int)
+        self.selection_policy = selection_policy or RoundRobinPolicy()
+        self.max_in_flight = max_in_flight
         self.receiver_streams_combiner = receiver_streams_combiner
+        self.observers: List[Callable[[], None]] = []
+
+    def add_observer(self, callback: Callable[[], None]):
+        """
+        Add callback, that is called when model instance is added or removed
+        """
+        self.observers.append(callback)
+
+    def __notify_observers(self):
+        for callback in self.observers:
+            callback()
 
     def add_model_instance(self, model_instance: dm.ModelInstance):
+        model_instance.max_in_flight = self.max_in_flight
         self.model_instances[model_instance.model].append(model_instance)
         self.receiver_streams_combiner.add_listener(model_instance.receiver)
+        self.__notify_observers()
 
     async def remove_model_instance(self, model_instance: dm.ModelInstance):
         logger.debug(f"Try to remove model_instance {model_instance}")
@@ -42,6 +73,7 @@ class ModelInstancesStorage:
             del self.model_instances[model_instance.model]
         model_instance.sender.close()
         await self.receiver_streams_combiner.remove_listener(model_instance.receiver)
+        self.__notify_observers()
 
     def get_model_instance(
         self, model: dm.ModelObject, source_id: Optional[str] = None
@@ -101,10 +133,12 @@ class ModelInstancesStorage:
         self, model: dm.ModelObject
     ) -> List[dm.ModelInstance]:
         """
-        Get model instances where lock=False
+        Get model instances where lock=False and there are no in flight batches
         """
         model_instances = self.get_model_instances(model)
-        not_locked = list(filter(lambda mi: not mi.lock, model_instances))
+        not_locked = list(
+            filter(lambda mi: not mi.lock and not mi.in_flight_batches, model_instances)
+        )
         return not_locked
 
     def get_all_model_instances(self) -> List[dm.ModelInstance]:
@@ -129,12 +163,23 @@ class ModelInstancesStorage:
             return None
 
         # For stateless models
-        index = self.indexes[model]
-        self.indexes[model] = (index + 1) % len(self.model_instances[model])
-        model_instance = self.model_instances[model][index]
-        if model_instance.lock:
-            return None
-        return model_instance
+        return self.selection_policy(model, model_instances)
+
+    def get_next_not_locked_instance(
+        self, model: dm.ModelObject, source_id: Optional[str] = None
+    ) -> Optional[dm.ModelInstance]:
+        """
+        Return model instance, that can accept a batch now,
+        None if all are locked or have no credits.
+        Model instance of stateless model is selected by the selection policy
+        """
+        if not model.stateless:
+            model_instance = self.get_model_instance(model, source_id)
+            if model_instance is None or not model_instance.has_credit:
+                return None
+            return model_instance
+
+        return self.selection_policy(model, self.model_instances.get(model, []))
 
     def get_errors_time(self, model: dm.ModelObject) -> datetime:
         """
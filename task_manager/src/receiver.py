@@ -11,7 +11,7 @@ import zmq.asyncio  # type: ignore
 from loguru import logger
 
 import src.data_models as dm
-from src.batch_queue import InputBatchQueue
+from src.admission import AdmissionController
 
 ctx = zmq.asyncio.Context()
 
@@ -31,7 +31,7 @@ def create_socket(config: dm.Config) -> zmq.asyncio.Socket:
     return sock
 
 
-async def receive(sock: zmq.asyncio.Socket, input_batch_queue: InputBatchQueue):
+async def receive(sock: zmq.asyncio.Socket, admission_controller: AdmissionController):
     """
     Build an async iterable object. Infinite stream of RequestObject
 
@@ -39,8 +39,10 @@ async def receive(sock: zmq.asyncio.Socket, input_batch_queue: InputBatchQueue):
     ----------
     sock:
         Socket is source of request_objects
+    admission_controller:
+        Admission controller of the input queue for received batches
     """
     while True:
         batch = await sock.recv_pyobj()
         if isinstance(batch, dm.MinimalBatchObject):
-            await input_batch_queue.put(batch)
+            await admission_controller.put(batch)
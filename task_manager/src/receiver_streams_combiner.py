@@ -6,18 +6,24 @@ __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
 import asyncio
-from typing import Union, Dict, Optional, Tuple, List, Awaitable
+from datetime import datetime
+from typing import Dict, Optional, List, Callable
 
+import zmq  # type: ignore
+import zmq.asyncio  # type: ignore
 from loguru import logger
 
 import src.data_models as dm
 from src.batch_queue import OutputBatchQueue
+from src.batch_processing.coalescing import split_response_batch
 from src.utils.data_transfers.receiver import BaseReceiver
 
 
 class ReceiverStreamsCombiner:
     """
-    Combine receiver streams and put result into output_batch_queue
+    Combine receiver streams and put result into output_batch_queue.
+    Sockets of all receivers are polled by one poller,
+    each ready socket is drained on wakeup
 
     Parameters
     ----------
@@ -27,29 +33,105 @@ class ReceiverStreamsCombiner:
 
     def __init__(self, output_batch_queue: OutputBatchQueue):
         self.output_batch_queue = output_batch_queue
-        self.tasks: Dict[
-            BaseReceiver, Awaitable[Tuple[BaseReceiver, dm.ResponseBatch]]
-        ] = {}
+        self.poller = zmq.asyncio.Poller()
+        self.receivers: Dict[zmq.asyncio.Socket, BaseReceiver] = {}
+        self.receivers_changed = asyncio.Event()
         self.running = True
         self.receivers_to_delete: List[BaseReceiver] = []
+        self.observers: List[Callable[[], None]] = []
+
+    def add_observer(self, callback: Callable[[], None]):
+        """
+        Add callback, that is called when model instance is released after response
+        """
+        self.observers.append(callback)
 
     def add_listener(self, receiver: BaseReceiver) -> None:
         """
-        Add receiver listener to sourcers
+        Add receiver listener to sourcers, its socket is polled from the next wakeup
         """
         logger.debug("Add listener")
+        sock = receiver.get_socket()
+        if sock is None:
+            return
+        self.receivers[sock] = receiver
+        self.poller.register(sock, zmq.POLLIN)
+        self.receivers_changed.set()
+
+    @staticmethod
+    def restore_mapping(
+        batch: dm.ResponseBatch, request_batch: Optional[dm.RequestBatch]
+    ):
+        """
+        Attach inline mapping of the request batch to the response batch,
+        the mapping is not sent to the model
+        """
+        if (
+            batch.mapping is None
+            and request_batch is not None
+            and request_batch.uid == batch.uid
+        ):
+            batch.mapping = request_batch.mapping
 
-        self.tasks[receiver] = asyncio.create_task(
-            self.__converter_function(receiver, receiver.receive())
-        )
+    @staticmethod
+    def restore_timestamps(
+        batch: dm.ResponseBatch, request_batch: Optional[dm.RequestBatch]
+    ):
+        """
+        Take times of creation, queueing and start of the batch from the request batch,
+        if the model does not return them, they are needed for latency of the batch
+        """
+        if request_batch is None or request_batch.uid != batch.uid:
+            return
+        for name in ("created_at", "queued_at", "started_at"):
+            if getattr(batch, name) is None:
+                setattr(batch, name, getattr(request_batch, name))
+
+    @staticmethod
+    def restore_size(
+        batch: dm.ResponseBatch, request_batch: Optional[dm.RequestBatch]
+    ):
+        """
+        Take size of the batch from the request batch,
+        if the model does not return it (older model images)
+        """
+        if (
+            batch.size == 0
+            and request_batch is not None
+            and request_batch.uid == batch.uid
+        ):
+            batch.size = request_batch.size
 
     @staticmethod
-    async def __converter_function(
-        receiver: BaseReceiver,
-        future: Awaitable[dm.ResponseBatch],
-    ) -> Tuple[BaseReceiver, dm.ResponseBatch]:
-        batch = await future
-        return (receiver, batch)
+    def get_processing_start(
+        request_batch: Optional[dm.RequestBatch], model_instance: dm.ModelInstance
+    ) -> Optional[datetime]:
+        """
+        Time when the model started processing of the batch.
+        Batch waits in the socket of the model until the previous batch is processed,
+        so processing starts when it is sent or when the previous batch is finished
+        """
+        if request_batch is None or request_batch.started_at is None:
+            return None
+        started_at = request_batch.started_at
+        if (
+            model_instance.last_finished_at is not None
+            and model_instance.last_finished_at > started_at
+        ):
+            started_at = model_instance.last_finished_at
+        return started_at
+
+    @classmethod
+    def get_processing_time(
+        cls, request_batch: Optional[dm.RequestBatch], model_instance: dm.ModelInstance
+    ) -> Optional[float]:
+        """
+        Time in seconds from the start of processing of the batch until now
+        """
+        started_at = cls.get_processing_start(request_batch, model_instance)
+        if started_at is None:
+            return None
+        return (datetime.now() - started_at).total_seconds()
 
     async def remove_listener(self, receiver: BaseReceiver):
         """
@@ -57,6 +139,7 @@ class ReceiverStreamsCombiner:
         """
         logger.debug("Try to remove listener")
         self.receivers_to_delete.append(receiver)
+        self.receivers_changed.set()
         logger.debug("Listener is removed")
 
     def stop(self):
@@ -65,35 +148,74 @@ class ReceiverStreamsCombiner:
         """
         logger.warning("Receiver stream combiner will be stoped")
         self.running = False
+        self.receivers_changed.set()
 
     async def converter(self):
         """
         Main method, receive dm.ResponseBatch, and put it to output_batch_queue
         """
         while self.running:
-            await asyncio.sleep(0.1)
-            tasks_to_process = self.tasks.values()
-            if not tasks_to_process:
+            self.__delete_receivers()
+            self.receivers_changed.clear()
+            if not self.receivers:
+                await self.receivers_changed.wait()
                 continue
-            done, _ = await asyncio.wait(
-                tasks_to_process, return_when=asyncio.FIRST_COMPLETED
+            for sock in await self.__poll():
+                await self.__drain(self.receivers[sock])
+
+    async def __poll(self) -> List[zmq.asyncio.Socket]:
+        """
+        Wait until some sockets are ready or receivers are changed,
+        return ready sockets
+        """
+        poll = asyncio.ensure_future(self.poller.poll())
+        changed = asyncio.ensure_future(self.receivers_changed.wait())
+        await asyncio.wait({poll, changed}, return_when=asyncio.FIRST_COMPLETED)
+        changed.cancel()
+        if not poll.done():
+            poll.cancel()
+            return []
+        return [sock for sock, _ in poll.result() if sock in self.receivers]
+
+    async def __drain(self, receiver: BaseReceiver):
+        """
+        Process all responses, that are already received by the socket
+        """
+        while True:
+            batch = await receiver.receive_nowait()
+            if batch is None:
+                return
+            await self.process(receiver, batch)
+
+    async def process(self, receiver: BaseReceiver, batch: dm.ResponseBatch):
+        """
+        Release in flight batch of the model instance and put responses into output queue
+        """
+        model_instance = receiver.get_model_instance()
+        request_batch = model_instance.in_flight_batches.get(batch.uid)
+        self.restore_mapping(batch, request_batch)
+        self.restore_timestamps(batch, request_batch)
+        self.restore_size(batch, request_batch)
+        if request_batch is not None and request_batch.uid == batch.uid:
+            batch.processing_started_at = self.get_processing_start(
+                request_batch, model_instance
             )
-            for task in done:
-                result = task.result()
-
-                receiver, batch = result
-                if batch is not None:
-                    await self.output_batch_queue.put(batch)
-                    model_instance = receiver.get_model_instance()
-                    model_instance.lock = False
-                    model_instance.current_processing_batch = None
-
-                if receiver in self.receivers_to_delete:
-                    logger.debug("Remove listener")
-                    self.tasks.pop(receiver)
-                    receiver.close()
-
-                if receiver in self.tasks:
-                    self.tasks[receiver] = asyncio.create_task(
-                        self.__converter_function(receiver, receiver.receive())
-                    )
+        processing_time = self.get_processing_time(request_batch, model_instance)
+        model_instance.finish_batch(batch.uid, processing_time)
+        if request_batch is None:
+            response_batches = [batch]
+        else:
+            response_batches = split_response_batch(batch, request_batch)
+        for response_batch in response_batches:
+            await self.output_batch_queue.put(response_batch)
+        for callback in self.observers:
+            callback()
+
+    def __delete_receivers(self):
+        for receiver in self.receivers_to_delete:
+            logger.debug("Remove listener")
+            sock = receiver.get_socket()
+            if sock is not None and self.receivers.pop(sock, None) is not None:
+                self.poller.unregister(sock)
+            receiver.close()
+        self.receivers_to_delete.clear()
@@ -0,0 +1,27 @@
+"""
+This package is responsible for selection of model instance of stateless model,
+that will process the next batch
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+from .selection_policy import SelectionPolicy
+from .round_robin_policy import RoundRobinPolicy
+from .join_shortest_queue_policy import JoinShortestQueuePolicy
+from .least_outstanding_work_policy import LeastOutstandingWorkPolicy
+from .power_of_two_choices_policy import PowerOfTwoChoicesPolicy
+
+SELECTION_POLICIES = {
+    "round_robin": RoundRobinPolicy,
+    "join_shortest_queue": JoinShortestQueuePolicy,
+    "least_outstanding_work": LeastOutstandingWorkPolicy,
+    "power_of_two_choices": PowerOfTwoChoicesPolicy,
+}
+
+
+def make_selection_policy(name: str) -> SelectionPolicy:
+    """
+    Create selection policy by name from config
+    """
+    return SELECTION_POLICIES[name]()
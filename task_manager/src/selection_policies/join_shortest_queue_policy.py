@@ -0,0 +1,29 @@
+"""
+Join shortest queue selection policy
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+from typing import List
+
+import src.data_models as dm
+from .selection_policy import SelectionPolicy
+
+
+class JoinShortestQueuePolicy(SelectionPolicy):
+    """
+    Select model instance with the least number of in flight batches,
+    ties are broken by the least recently used model instance
+    """
+
+    def select(
+        self, model: dm.ModelObject, model_instances: List[dm.ModelInstance]
+    ) -> dm.ModelInstance:
+        return min(
+            self.get_available(model_instances),
+            key=lambda model_instance: (
+                model_instance.outstanding_batches,
+                self.last_sent(model_instance),
+            ),
+        )
@@ -0,0 +1,30 @@
+"""
+Least outstanding work selection policy
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+from typing import List
+
+import src.data_models as dm
+from .selection_policy import SelectionPolicy
+
+
+class LeastOutstandingWorkPolicy(SelectionPolicy):
+    """
+    Select model instance, that will finish outstanding requests first,
+    outstanding requests are weighted by observed service time of the model instance
+    """
+
+    def select(
+        self, model: dm.ModelObject, model_instances: List[dm.ModelInstance]
+    ) -> dm.ModelInstance:
+        default_service_time = self.mean_service_time(model_instances)
+        return min(
+            self.get_available(model_instances),
+            key=lambda model_instance: (
+                self.estimate_work(model_instance, default_service_time),
+                self.last_sent(model_instance),
+            ),
+        )
@@ -0,0 +1,43 @@
+"""
+Power of two choices selection policy
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import random
+from typing import List, Optional
+
+import src.data_models as dm
+from .selection_policy import SelectionPolicy
+
+
+class PowerOfTwoChoicesPolicy(SelectionPolicy):
+    """
+    Sample two model instances with credit and select one with less outstanding work,
+    weighted by observed service time.
+    It does not compare all model instances, so it scales to many instances
+    and does not send all batches to one instance with stale statistics
+
+    Parameters
+    ----------
+    seed:
+        Seed of random generator
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.random = random.Random(seed)
+
+    def select(
+        self, model: dm.ModelObject, model_instances: List[dm.ModelInstance]
+    ) -> dm.ModelInstance:
+        available = self.get_available(model_instances)
+        if len(available) == 1:
+            return available[0]
+        default_service_time = self.mean_service_time(model_instances)
+        return min(
+            self.random.sample(available, 2),
+            key=lambda model_instance: self.estimate_work(
+                model_instance, default_service_time
+            ),
+        )
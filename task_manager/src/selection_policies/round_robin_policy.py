@@ -0,0 +1,35 @@
+"""
+Round robin selection policy
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+from collections import defaultdict
+from typing import List, Dict
+
+import src.data_models as dm
+from .selection_policy import SelectionPolicy
+
+
+class RoundRobinPolicy(SelectionPolicy):
+    """
+    Select model instances in turn, model instances without credit are skipped,
+    and busy model instances are skipped while there are idle ones
+    """
+
+    def __init__(self):
+        self.indexes: Dict[dm.ModelObject, int] = defaultdict(int)
+
+    def select(
+        self, model: dm.ModelObject, model_instances: List[dm.ModelInstance]
+    ) -> dm.ModelInstance:
+        available = self.get_available(model_instances)
+        number_of_instances = len(model_instances)
+        index = self.indexes[model]
+        for shift in range(number_of_instances):
+            model_instance = model_instances[(index + shift) % number_of_instances]
+            if model_instance in available:
+                self.indexes[model] = (index + shift + 1) % number_of_instances
+                return model_instance
+        raise ValueError(f"There are no model instances with credit of {model.name}")
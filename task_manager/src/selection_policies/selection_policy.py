@@ -0,0 +1,98 @@
+"""
+Base selection policy class
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import src.data_models as dm
+
+
+class SelectionPolicy(ABC):
+    """
+    Base class of policy, that selects model instance for the next batch.
+    Policy is called only if there is at least one model instance with credit
+    (not locked and with free place in the credit window),
+    and it always returns one of them. If some of them are idle
+    (without in flight batches), one of idle model instances is returned
+    """
+
+    def __call__(
+        self, model: dm.ModelObject, model_instances: List[dm.ModelInstance]
+    ) -> Optional[dm.ModelInstance]:
+        if not self.get_available(model_instances):
+            return None
+        return self.select(model, model_instances)
+
+    @abstractmethod
+    def select(
+        self, model: dm.ModelObject, model_instances: List[dm.ModelInstance]
+    ) -> dm.ModelInstance:
+        """
+        Select model instance of the model with credit
+
+        Parameters
+        ----------
+        model:
+            Model of the batch
+        model_instances:
+            All model instances of the model, at least one of them has credit,
+            model instance is selected from `get_available`
+        """
+
+    @staticmethod
+    def get_available(
+        model_instances: List[dm.ModelInstance],
+    ) -> List[dm.ModelInstance]:
+        """
+        Model instances, that can accept a batch now,
+        only idle ones if there are idle model instances
+        """
+        available = [
+            model_instance
+            for model_instance in model_instances
+            if model_instance.has_credit
+        ]
+        idle = [
+            model_instance
+            for model_instance in available
+            if model_instance.outstanding_batches == 0
+        ]
+        return idle or available
+
+    @staticmethod
+    def estimate_work(
+        model_instance: dm.ModelInstance, default_service_time: float
+    ) -> float:
+        """
+        Estimated time (in seconds) until model instance processes
+        outstanding requests and one more request
+        """
+        service_time = model_instance.service_time
+        if service_time is None:
+            service_time = default_service_time
+        return (model_instance.outstanding_requests + 1) * service_time
+
+    @staticmethod
+    def mean_service_time(model_instances: List[dm.ModelInstance]) -> float:
+        """
+        Mean of observed service times, it is used for not observed model instances
+        """
+        service_times = [
+            model_instance.service_time
+            for model_instance in model_instances
+            if model_instance.service_time is not None
+        ]
+        if not service_times:
+            return 0.0
+        return sum(service_times) / len(service_times)
+
+    @staticmethod
+    def last_sent(model_instance: dm.ModelInstance) -> float:
+        """
+        Time of the last sent batch, used to break ties between model instances
+        """
+        return model_instance.sender.get_time_of_last_sent_batch()
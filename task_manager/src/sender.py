@@ -5,6 +5,7 @@ This module is responsible for sending ResponseBatch
 __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
+from typing import Optional
 
 import zmq  # type: ignore
 import zmq.asyncio  # type: ignore
@@ -32,7 +33,28 @@ def create_socket(config: dm.Config) -> zmq.asyncio.Socket:
     return sock
 
 
-async def send(sock: zmq.asyncio.Socket, output_batch_queue: OutputBatchQueue):
+def create_statistics_socket(config: dm.Config) -> Optional[zmq.asyncio.Socket]:
+    """
+    Create PUB socket for batch statistics, None if statistics are disabled
+
+    Parameters
+    ----------
+    config:
+        Config object, required field is a zmq_statistics_address
+    """
+    if config.zmq_statistics_address is None:
+        return None
+    sock = ctx.socket(zmq.PUB)
+    sock.bind(config.zmq_statistics_address)
+    logger.info(f"Publish batch statistics on {config.zmq_statistics_address}")
+    return sock
+
+
+async def send(
+    sock: zmq.asyncio.Socket,
+    output_batch_queue: OutputBatchQueue,
+    statistics_sock: Optional[zmq.asyncio.Socket] = None,
+):
     """
     Sending to TaskManager batch
 
@@ -40,9 +62,16 @@ async def send(sock: zmq.asyncio.Socket, output_batch_queue: OutputBatchQueue):
     ----------
     sock:
         Socket is destination of batches
+    statistics_sock:
+        Socket is destination of statistics of processed batches
     """
     while True:
         batch = await output_batch_queue.get()
         logger.debug(f"Try to sent result batch {batch.uid=}")
         await sock.send_pyobj(batch)
         logger.debug(f"Batch {batch.uid=} sent")
+        if statistics_sock is None:
+            continue
+        statistics = dm.BatchStatistics.from_response_batch(batch)
+        if statistics is not None:
+            await statistics_sock.send_pyobj(statistics)
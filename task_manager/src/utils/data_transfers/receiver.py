@@ -10,9 +10,10 @@ from typing import Optional
 
 import zmq  # type: ignore
 import zmq.asyncio  # type: ignore
-from loguru import logger
 
+from shared_modules import tensor_codec
 from shared_modules.data_objects import ResponseBatch, ZMQConfig
+from src.utils.data_transfers import serialization
 
 
 class BaseReceiver:
@@ -23,6 +24,12 @@ class BaseReceiver:
     async def receive(self):
         pass
 
+    async def receive_nowait(self):
+        pass
+
+    def get_socket(self) -> Optional[zmq.asyncio.Socket]:
+        return None
+
     def close(self):
         pass
 
@@ -51,16 +58,46 @@ class Receiver(BaseReceiver):
         self.zmq_socket.setsockopt(zmq.RCVHWM, config.rcvhwm)
         self.zmq_socket.setsockopt(zmq.RCVTIMEO, config.rcvtimeo)
         self.zmq_socket.connect(open_address)
+        self.off_loop_threshold = config.off_loop_threshold
 
     async def receive(self) -> Optional[ResponseBatch]:
         try:
             if not self.zmq_socket.closed:
-                batch = await self.zmq_socket.recv_pyobj()
+                frames = await self.zmq_socket.recv_multipart(copy=False)
+                batch = await self.decode(frames)
                 self.last_received_batch = time.time()
                 return batch
             return None
         except zmq.Again:
             return None
 
+    async def receive_nowait(self) -> Optional[ResponseBatch]:
+        """
+        Return response batch, that is already received, None if there is no one
+        """
+        if self.zmq_socket.closed:
+            return None
+        try:
+            frames = await self.zmq_socket.recv_multipart(zmq.NOBLOCK, copy=False)
+        except zmq.Again:
+            return None
+        batch = await self.decode(frames)
+        self.last_received_batch = time.time()
+        return batch
+
+    async def decode(self, frames) -> ResponseBatch:
+        """
+        Decode response batch, large batches are decoded in the thread pool
+        """
+        return await serialization.run_off_loop(
+            serialization.frames_size(frames),
+            self.off_loop_threshold,
+            tensor_codec.decode,
+            frames,
+        )
+
+    def get_socket(self) -> Optional[zmq.asyncio.Socket]:
+        return self.zmq_socket
+
     def close(self):
         self.zmq_socket.close()
@@ -6,10 +6,11 @@ __author__ = "Andrey Chertkov"
 __email__ = "a.chertkov@eora.ru"
 
 import time
-from loguru import logger
 
 import zmq.asyncio  # type: ignore
 
+from src.utils.data_transfers import serialization
+
 
 class BaseSender:
     def __init__(self):
@@ -35,10 +36,19 @@ class Sender(BaseSender):
         self.zmq_socket.setsockopt(zmq.SNDHWM, config.sndhwm)
         self.zmq_socket.setsockopt(zmq.SNDTIMEO, config.sndtimeo)
         self.zmq_socket.connect(open_address)
+        self.zero_copy = config.zero_copy
+        self.off_loop_threshold = config.off_loop_threshold
         self.last_sent_batch = time.time()
 
     async def send(self, data):
-        await self.zmq_socket.send_pyobj(data)
+        frames = await serialization.run_off_loop(
+            serialization.tensors_size(data),
+            self.off_loop_threshold,
+            serialization.encode,
+            data,
+            self.zero_copy,
+        )
+        await self.zmq_socket.send_multipart(frames, copy=False)
         self.last_sent_batch = time.time()
 
     def close(self):
@@ -0,0 +1,83 @@
+"""
+This module is responsible for encoding and decoding of batches of model instances
+outside of the event loop.
+
+Large batches are encoded and decoded in a dedicated thread pool, so the event loop
+(load analyzer, health checker, dispatcher) is not blocked by pickling.
+Tensors are not pickled with `tensor_codec`, they are sent as raw frames with `copy=False`,
+libzmq sends them without holding the GIL
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import asyncio
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np  # type: ignore
+
+from shared_modules import tensor_codec
+from shared_modules.tensor_codec import Frame
+
+# Number of threads, that encode and decode batches
+SERIALIZATION_WORKERS = 2
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Thread pool for serialization, it is created on the first call
+    """
+    global _executor  # pylint: disable=W0603
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=SERIALIZATION_WORKERS, thread_name_prefix="serialization"
+        )
+    return _executor
+
+
+def encode(data: Any, zero_copy: bool = True) -> List[Frame]:
+    """
+    Encode batch into frames, tensors are separate frames if zero_copy is set,
+    otherwise the batch is one pickled frame, as it is sent by `send_pyobj`
+    """
+    if zero_copy:
+        return tensor_codec.encode(data)
+    return [pickle.dumps(data, protocol=tensor_codec.PICKLE_PROTOCOL)]
+
+
+def tensors_size(data: Any) -> int:
+    """
+    Size in bytes of tensors of the batch
+    """
+    size = 0
+    inputs = getattr(data, "inputs", None)
+    if isinstance(inputs, np.ndarray):
+        size += inputs.nbytes
+    for request_info in getattr(data, "requests_info", None) or []:
+        if isinstance(request_info.input, np.ndarray):
+            size += request_info.input.nbytes
+    return size
+
+
+def frames_size(frames: Sequence[Frame]) -> int:
+    """
+    Size in bytes of received frames
+    """
+    return sum(
+        memoryview(getattr(frame, "buffer", frame)).nbytes for frame in frames
+    )
+
+
+async def run_off_loop(size: int, threshold: int, function: Callable, *args) -> Any:
+    """
+    Call function in the thread pool if size is at least threshold,
+    otherwise call it in the event loop, thread switch is more expensive for small batches
+    """
+    if size < threshold:
+        return function(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), function, *args)
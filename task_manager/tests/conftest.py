@@ -0,0 +1,70 @@
+"""
+Factories of models, batches and model instances shared by tests
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+from typing import Optional
+
+import numpy as np  # type: ignore
+
+import src.data_models as dm
+from src.utils.data_transfers.sender import BaseSender
+from src.utils.data_transfers.receiver import BaseReceiver
+
+stub_model = dm.ModelObject(
+    "stub",
+    "registry.visionhub.ru/models/stub:v3",
+    stateless=True,
+    batch_size=128,
+)
+
+
+def make_batch(
+    uid: str,
+    size: int = 1,
+    model: dm.ModelObject = stub_model,
+    input_: Optional[np.ndarray] = None,
+    **kwargs,
+) -> dm.MinimalBatchObject:
+    """
+    Batch of `size` requests, input of the request `i` is a 2x2 array filled with `i`,
+    or `input_` if it is set. Parameters of the request are uid of the batch and `i`
+    """
+    return dm.MinimalBatchObject(
+        uid=uid,
+        requests_info=[
+            dm.RequestInfo(
+                input=np.full((2, 2), i) if input_ is None else input_,
+                parameters={"uid": uid, "i": i},
+            )
+            for i in range(size)
+        ],
+        model=model,
+        status=dm.Status.CREATED,
+        **kwargs,
+    )
+
+
+def make_model_instance(
+    name: str = "",
+    model: dm.ModelObject = stub_model,
+    sender: Optional[BaseSender] = None,
+    receiver: Optional[BaseReceiver] = None,
+    **kwargs,
+) -> dm.ModelInstance:
+    """
+    Running unlocked model instance, base sender and receiver are used if not set
+    """
+    model_instance_kwargs = dict(
+        source_id=None, lock=False, running=True, hostname="test"
+    )
+    model_instance_kwargs.update(kwargs)
+    return dm.ModelInstance(
+        model=model,
+        name=name,
+        sender=BaseSender() if sender is None else sender,
+        receiver=BaseReceiver() if receiver is None else receiver,
+        **model_instance_kwargs,
+    )
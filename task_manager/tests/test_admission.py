@@ -0,0 +1,99 @@
+"""
+Tests for admission control of the input queue
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import pytest
+
+import src.data_models as dm
+from src.admission import AdmissionController
+from src.batch_queue import InputBatchQueue, OutputBatchQueue
+from tests.conftest import stub_model, make_batch
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_admission_controller(policy):
+    return AdmissionController(
+        InputBatchQueue(),
+        OutputBatchQueue(),
+        queue_limits={"stub": 4},
+        policy=policy,
+    )
+
+
+def get_rejected(admission_controller):
+    rejected = []
+    while not admission_controller.output_batch_queue.empty():
+        response_batch = admission_controller.output_batch_queue.get_nowait()
+        assert response_batch.error is not None
+        rejected.append((response_batch.uid, response_batch.rejection))
+    return rejected
+
+
+def get_queued(admission_controller):
+    return [
+        batch.uid
+        for batch in admission_controller.input_batch_queue.get_queued_batches(
+            stub_model
+        )
+    ]
+
+
+async def test_reject_newest():
+    admission_controller = make_admission_controller("reject_newest")
+    for uid in ["1", "2", "3"]:
+        await admission_controller.put(make_batch(uid, size=2))
+
+    assert get_queued(admission_controller) == ["1", "2"]
+    assert get_rejected(admission_controller) == [("3", dm.Rejection.QUEUE_FULL)]
+
+
+async def test_reject_oldest():
+    admission_controller = make_admission_controller("reject_oldest")
+    for uid in ["1", "2", "3"]:
+        await admission_controller.put(make_batch(uid, size=2))
+    await admission_controller.put(make_batch("too_large", size=5))
+
+    assert get_queued(admission_controller) == ["2", "3"]
+    assert admission_controller.input_batch_queue.get_nowait(stub_model).uid == "2"
+    assert get_rejected(admission_controller) == [
+        ("1", dm.Rejection.SHED),
+        ("too_large", dm.Rejection.QUEUE_FULL),
+    ]
+
+
+async def test_shed_by_priority():
+    admission_controller = make_admission_controller("priority")
+    await admission_controller.put(make_batch("low_old", size=1, priority=0))
+    await admission_controller.put(make_batch("low_new", size=1, priority=0))
+    await admission_controller.put(make_batch("high", size=2, priority=1))
+    await admission_controller.put(make_batch("low_rejected", size=1, priority=0))
+    await admission_controller.put(make_batch("higher", size=1, priority=2))
+
+    assert get_queued(admission_controller) == ["low_old", "high", "higher"]
+    assert get_rejected(admission_controller) == [
+        ("low_rejected", dm.Rejection.QUEUE_FULL),
+        ("low_new", dm.Rejection.SHED),
+    ]
+
+
+async def test_inputs_of_rejected_batches_are_dropped():
+    """
+    Test that rejected and shed batches do not keep their inputs
+    """
+    admission_controller = make_admission_controller("reject_oldest")
+    batches = [make_batch(str(i), size=2) for i in range(3)]
+    for batch in batches:
+        await admission_controller.put(batch)
+
+    assert get_rejected(admission_controller) == [("0", dm.Rejection.SHED)]
+    assert batches[0].requests_info[0].input is None
+    assert batches[1].requests_info[0].input is not None
+
+
+async def test_unknown_policy():
+    with pytest.raises(ValueError):
+        make_admission_controller("reject_all")
@@ -40,12 +40,11 @@ model_instance = dm.ModelInstance(
     hostname="",
     source_id="",
     running=True,
-    current_processing_batch=None,
 )
 
 
 async def test_send():
-    model_instance.current_processing_batch = batch
+    model_instance.start_batch(batch)
     input_queue, output_queue = InputBatchQueue(), OutputBatchQueue()
     alert_manager = AlertManager(input_queue, output_queue)
     error = ContainerExited("ContainerExited")
@@ -55,10 +54,30 @@ async def test_send():
 
 
 async def test_retry():
-    model_instance.current_processing_batch = batch
+    model_instance.start_batch(batch)
     input_queue, output_queue = InputBatchQueue(), OutputBatchQueue()
     alert_manager = AlertManager(input_queue, output_queue)
     error = ContainerDoesNotExists("ContainerDoesNotExists")
     await alert_manager.retry_task(model_instance, error)
     input_batch = input_queue.get_nowait(model, source_id=None)
     assert input_batch == batch
+    assert model_instance.current_processing_batch is None
+
+
+async def test_retriable_error_keeps_lock():
+    """
+    Test that retry releases credit, but does not unlock model instance,
+    that is locked by decrease trigger
+    """
+    model_instance.start_batch(batch)
+    model_instance.lock = True
+    input_queue, output_queue = InputBatchQueue(), OutputBatchQueue()
+    alert_manager = AlertManager(input_queue, output_queue)
+    error = ContainerDoesNotExists("ContainerDoesNotExists")
+    try:
+        await error.process(None, model_instance, alert_manager)
+        assert model_instance.lock
+        assert model_instance.outstanding_batches == 0
+        assert input_queue.get_nowait(model, source_id=None) == batch
+    finally:
+        model_instance.lock = False
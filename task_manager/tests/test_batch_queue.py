@@ -12,7 +12,7 @@ import numpy as np  # type: ignore
 
 import src.data_models as dm
 from src.exceptions import TagDoesNotExists
-from src.batch_queue import InputBatchQueue, OutputBatchQueue
+from src.batch_queue import InputBatchQueue, OutputBatchQueue, PriorityBatchQueue
 
 pytestmark = pytest.mark.asyncio
 
@@ -153,3 +153,159 @@ async def test_stateful_models():
 
     with pytest.raises(asyncio.QueueEmpty):
         input_batch_queue.get_nowait(stub_stateful, source_id="test")
+
+
+async def test_priorities():
+    """
+    Test that batches with higher priority are got first,
+    but lower priority is served after starvation_limit bypasses
+    """
+    input_batch_queue = InputBatchQueue(starvation_limit=2)
+    items = [
+        dm.MinimalBatchObject(
+            uid=str(i),
+            requests_info=[dm.RequestInfo(input=np.array(range(10)), parameters={})],
+            model=stub_model,
+            status=dm.Status.CREATED,
+            priority=priority,
+        )
+        for i, priority in enumerate([0, 0, 1, 1, 1, 1, 1])
+    ]
+    for item in items:
+        await input_batch_queue.put(item)
+    assert input_batch_queue.get_num_requests_in_queue(stub_model) == 7
+
+    uids = [input_batch_queue.get_nowait(stub_model).uid for _ in items]
+
+    assert uids == ["2", "3", "0", "4", "5", "1", "6"]
+    assert input_batch_queue.get_num_requests_in_queue(stub_model) == 0
+    with pytest.raises(asyncio.QueueEmpty):
+        input_batch_queue.get_nowait(stub_model)
+
+
+async def test_priority_queue_size():
+    """
+    Test that size of the priority queue is number of batches, not priorities
+    """
+    queue = PriorityBatchQueue(maxsize=3)
+    assert queue.empty()
+    for i in range(3):
+        await queue.put(
+            dm.MinimalBatchObject(
+                uid=str(i),
+                requests_info=[],
+                model=stub_model,
+                status=dm.Status.CREATED,
+                priority=1,
+            )
+        )
+
+    assert queue.qsize() == 3
+    assert not queue.empty()
+    assert queue.full()
+    queue.get_nowait()
+    assert queue.qsize() == 2
+    assert not queue.full()
+
+
+async def test_aggregate_statistics():
+    """
+    Test that sizes, source ids and the oldest batch are maintained on put and get
+    """
+    input_batch_queue = InputBatchQueue()
+
+    def make_item(uid, model, source_id=None, size=1):
+        return dm.MinimalBatchObject(
+            uid=uid,
+            requests_info=[
+                dm.RequestInfo(input=np.array(range(10)), parameters={})
+                for _ in range(size)
+            ],
+            model=model,
+            status=dm.Status.CREATED,
+            source_id=source_id,
+        )
+
+    await input_batch_queue.put(make_item("1", stub_stateful, "a", size=2))
+    second = make_item("2", stub_stateful, "b", size=3)
+    await input_batch_queue.put(second)
+    await input_batch_queue.put(make_item("3", stub_model, size=4))
+
+    assert input_batch_queue.get_source_ids(stub_stateful) == ["a", "b"]
+    assert input_batch_queue.get_source_ids(stub_model) == [None]
+    assert input_batch_queue.get_num_requests_of_model(stub_stateful) == 5
+    assert input_batch_queue.get_num_requests_in_queue(stub_stateful, "b") == 3
+    assert input_batch_queue.get_sizes() == dict(
+        stateless={stub_model: 4}, stateful={stub_stateful: 5}
+    )
+    assert input_batch_queue.get_models(is_stateless=False) == [stub_stateful]
+    oldest = input_batch_queue.get_oldest_queued_at(stub_stateful)
+    assert oldest is not None
+    assert input_batch_queue.get_age(stub_stateful) >= 0
+
+    first = input_batch_queue.get_nowait(stub_stateful, source_id="a")
+    assert first.uid == "1"
+    assert input_batch_queue.get_num_requests_of_model(stub_stateful) == 3
+    assert input_batch_queue.get_oldest_queued_at(stub_stateful) == second.queued_at
+    with pytest.raises(asyncio.QueueEmpty):
+        input_batch_queue.get_nowait(stub_stateful, source_id="a")
+    assert input_batch_queue.get_source_ids(stub_stateful) == ["b"]
+
+    input_batch_queue.get_nowait(stub_stateful, source_id="b")
+    with pytest.raises(asyncio.QueueEmpty):
+        input_batch_queue.get_nowait(stub_stateful, source_id="b")
+    assert input_batch_queue.get_source_ids(stub_stateful) == []
+    assert input_batch_queue.get_num_requests_of_model(stub_stateful) == 0
+    assert input_batch_queue.get_oldest_queued_at(stub_stateful) is None
+    assert input_batch_queue.get_age(stub_stateful) == 0
+    assert input_batch_queue.get_models(is_stateless=False) == []
+
+
+def make_source_batch(uid, source_id, size=16):
+    return dm.MinimalBatchObject(
+        uid=uid,
+        requests_info=[
+            dm.RequestInfo(input=np.array(range(10)), parameters={})
+            for _ in range(size)
+        ],
+        model=stub_model,
+        status=dm.Status.CREATED,
+        source_id=source_id,
+    )
+
+
+async def test_fair_queuing():
+    """
+    Test that source, that floods the model, does not delay batches of other sources
+    """
+    input_batch_queue = InputBatchQueue()
+    for i in range(4):
+        await input_batch_queue.put(make_source_batch(f"a{i}", "topic:a"))
+    for i in range(2):
+        await input_batch_queue.put(make_source_batch(f"b{i}", "topic:b"))
+
+    uids = [input_batch_queue.get_nowait(stub_model).uid for _ in range(6)]
+
+    assert uids == ["a0", "b0", "a1", "b1", "a2", "a3"]
+
+
+async def test_weighted_fair_queuing():
+    """
+    Test that batches are shared between sources in proportion to weights
+    by the longest matching prefix
+    """
+    input_batch_queue = InputBatchQueue(
+        source_weights={"topic:": 0.5, "topic:b": 2}
+    )
+    assert input_batch_queue.get_source_weight("topic:b_user") == 2
+    assert input_batch_queue.get_source_weight("topic:a") == 0.5
+    assert input_batch_queue.get_source_weight(None) == 1
+    for i in range(4):
+        await input_batch_queue.put(make_source_batch(f"a{i}", "topic:a", size=8))
+        await input_batch_queue.put(make_source_batch(f"b{i}", "topic:b", size=8))
+
+    uids = [input_batch_queue.get_nowait(stub_model).uid for _ in range(8)]
+
+    assert uids == ["a0", "b0", "b1", "b2", "b3", "a1", "a2", "a3"]
+    with pytest.raises(ValueError):
+        InputBatchQueue(source_weights={"topic:": 0})
@@ -0,0 +1,108 @@
+"""
+Tests for coalescing of queued batches
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import pytest
+import numpy as np  # type: ignore
+
+import src.data_models as dm
+from src.batch_queue import InputBatchQueue
+from src.batch_processing.coalescing import (
+    CoalescedBatch,
+    split_response_batch,
+    uncoalesce,
+)
+from tests.conftest import stub_model, make_batch
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_get_many_nowait():
+    """
+    Test that batches are got while they fit into max size
+    """
+    input_batch_queue = InputBatchQueue()
+    for uid, size in [("1", 1), ("2", 2), ("3", 2), ("4", 1)]:
+        await input_batch_queue.put(make_batch(uid, size))
+
+    first = input_batch_queue.get_many_nowait(stub_model, max_size=4)
+    second = input_batch_queue.get_many_nowait(stub_model, max_size=4)
+
+    assert [batch.uid for batch in first] == ["1", "2"]
+    assert [batch.uid for batch in second] == ["3", "4"]
+    assert input_batch_queue.get_num_requests_in_queue(stub_model) == 0
+
+
+async def test_get_many_nowait_stops_at_other_inputs_layout():
+    """
+    Test that following batch is not got with the first one,
+    if its inputs are not stacked in the same way
+    """
+    input_batch_queue = InputBatchQueue()
+    batches = [
+        make_batch("1", 1).stack_inputs(),
+        make_batch("2", 1, input_=np.zeros((3, 3))).stack_inputs(),
+        make_batch("3", 1, input_=np.zeros((3, 3))).stack_inputs(),
+        make_batch("4", 1, input_=np.zeros((3, 3), dtype=np.uint8)).stack_inputs(),
+        make_batch("5", 1),
+    ]
+    for batch in batches:
+        await input_batch_queue.put(batch)
+
+    uids = []
+    while input_batch_queue.get_num_requests_in_queue(stub_model):
+        got = input_batch_queue.get_many_nowait(stub_model, max_size=4)
+        uids.append([batch.uid for batch in got])
+        coalesced = CoalescedBatch.from_batches("coalesced", got)
+        assert (coalesced.inputs is not None) == (got[0].inputs is not None)
+
+    assert uids == [["1"], ["2", "3"], ["4"], ["5"]]
+
+
+@pytest.mark.parametrize("stacked", [[True, True], [True, False], [False, False]])
+async def test_coalesce_and_split(stacked):
+    """
+    Test that coalesced batch contains all inputs in order
+    and response is split into responses of original batches
+    """
+    batches = [
+        make_batch(uid, size).stack_inputs() if stack else make_batch(uid, size)
+        for uid, size, stack in [("1", 1, stacked[0]), ("2", 2, stacked[1])]
+    ]
+
+    coalesced = CoalescedBatch.from_batches("coalesced", batches)
+    batch_for_model = coalesced.for_model()
+
+    assert uncoalesce(coalesced) == batches
+    assert type(batch_for_model) is dm.MinimalBatchObject
+    assert batch_for_model.size == 3
+    assert (batch_for_model.inputs is not None) == all(stacked)
+    assert [input_[0, 0] for input_ in batch_for_model.get_inputs()] == [0, 0, 1]
+    assert [info.parameters["uid"] for info in batch_for_model.requests_info] == [
+        "1",
+        "2",
+        "2",
+    ]
+
+    mini_batches = [
+        dm.MiniResponseBatch(
+            [dm.ResponseInfo(output={"i": i}, parameters={}, picture=None)]
+        )
+        for i in range(3)
+    ]
+    response_batch = dm.ResponseBatch.from_minimal_batch_object(
+        batch_for_model, mini_batches=mini_batches
+    )
+    response_batch.status = dm.Status.PROCESSED
+
+    responses = split_response_batch(response_batch, coalesced)
+
+    assert [response.uid for response in responses] == ["1", "2"]
+    assert [response.size for response in responses] == [1, 2]
+    assert responses[0].mini_batches == mini_batches[:1]
+    assert responses[1].mini_batches == mini_batches[1:]
+    assert all(response.status == dm.Status.PROCESSED for response in responses)
+    assert split_response_batch(response_batch, batch_for_model) == [response_batch]
@@ -0,0 +1,168 @@
+"""
+Tests for LatencyPercentileChecker and QuantileSketch
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import src.data_models as dm
+from src.load_analyzers.checkers import LatencyPercentileChecker
+from src.load_analyzers.quantiles import QuantileSketch
+from src.batch_queue import InputBatchQueue, OutputBatchQueue
+from src.model_instances_storage import ModelInstancesStorage
+from src.receiver_streams_combiner import ReceiverStreamsCombiner
+from src.load_analyzers.triggers import IncreaseTrigger, DecreaseTrigger
+from tests.conftest import stub_model, make_model_instance
+
+pytestmark = pytest.mark.asyncio
+
+config = dm.Config(
+    zmq_input_address="",
+    zmq_output_address="",
+    cloud_client=dm.DockerConfig(
+        registry="registry.visionhub.ru",
+        login=os.environ.get("DOCKER_LOGIN", ""),
+        password=os.environ.get("DOCKER_PASSWORD", ""),
+        network=os.environ.get("DOCKER_NETWORK", ""),
+    ),
+    gpu_all=[1],
+    load_analyzer=dm.LoadAnalyzerConfig(
+        sleep_time=0.1,
+        trigger_pipeline=dm.TriggerPipelineConfig(max_model_percent=60),
+        running_mean=dm.RunningMeanConfig(
+            min_threshold=50, max_threshold=100, window_size=10
+        ),
+        stateful_checker=dm.StatefulChecker(keep_model=10),
+        latency=dm.LatencyConfig(
+            enabled=True,
+            quantile=0.95,
+            queue_wait_targets={"stub": 1.0},
+            min_samples=10,
+        ),
+    ),
+    health_check=dm.HealthCheckerConfig(connection_idle_timeout=10),
+    models=dm.ModelsRunnerConfig(
+        ports=dm.PortConfig(
+            sender_open_addr=5566,
+            receiver_open_addr=4531,
+        ),
+        zmq_config=dm.ZMQConfig(sndhwm=123, rcvhwm=121, sndtimeo=123, rcvtimeo=123),
+    ),
+)
+
+
+def make_response_batch(uid: str, queue_wait: float) -> dm.ResponseBatch:
+    queued_at = datetime.now()
+    started_at = queued_at + timedelta(seconds=queue_wait)
+    return dm.ResponseBatch(
+        uid=uid,
+        model=stub_model,
+        size=1,
+        status=dm.Status.PROCESSED,
+        queued_at=queued_at,
+        started_at=started_at,
+        processed_at=started_at + timedelta(seconds=0.1),
+        mini_batches=[],
+    )
+
+
+def make_checker(number_of_instances: int):
+    input_batch_queue = InputBatchQueue()
+    output_batch_queue = OutputBatchQueue()
+    receiver_streams_combiner = ReceiverStreamsCombiner(output_batch_queue)
+    model_instances_storage = ModelInstancesStorage(receiver_streams_combiner)
+    for index in range(number_of_instances):
+        model_instances_storage.add_model_instance(make_model_instance(str(index)))
+    checker = LatencyPercentileChecker(
+        model_instances_storage, input_batch_queue, output_batch_queue, config=config
+    )
+    return checker, output_batch_queue
+
+
+async def test_sketch_quantiles():
+    """
+    Quantiles are estimated with relative accuracy
+    """
+    values = [random.expovariate(1) for _ in range(10000)]
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    values.sort()
+    for q in (0.5, 0.95, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.011)
+    assert len(sketch.buckets) < 1000
+
+
+async def test_sketch_merge():
+    """
+    Merged sketch is the same as sketch of all values
+    """
+    first, second, both = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for value in range(100):
+        (first if value % 2 else second).add(value)
+        both.add(value)
+    merged = QuantileSketch.merged([first, second])
+    assert merged.count == both.count == 100
+    assert merged.quantile(0.9) == both.quantile(0.9)
+    assert QuantileSketch().quantile(0.5) is None
+    with pytest.raises(ValueError):
+        first.merge(QuantileSketch(relative_accuracy=0.05))
+
+
+async def test_increase_on_queue_wait():
+    """
+    Quantile of queue wait higher than target makes increase trigger
+    """
+    checker, output_batch_queue = make_checker(1)
+    for index in range(20):
+        await output_batch_queue.put(make_response_batch(str(index), 2.0))
+    triggers = checker.make_triggers()
+    assert len(triggers) == 1
+    assert isinstance(triggers[0], IncreaseTrigger)
+    assert triggers[0].model == stub_model
+    # window is cleared after the trigger
+    assert checker.make_triggers() == []
+
+
+async def test_quantiles():
+    """
+    p50, p95 and p99 of queue wait and latency are reported
+    """
+    checker, output_batch_queue = make_checker(1)
+    for index in range(100):
+        await output_batch_queue.put(make_response_batch(str(index), index / 100))
+    checker.update_sketches()
+    quantiles = checker.get_quantiles(stub_model)
+    assert quantiles["queue_wait"][0.5] == pytest.approx(0.5, rel=0.05)
+    assert quantiles["queue_wait"][0.99] == pytest.approx(0.99, rel=0.05)
+    assert quantiles["latency"][0.5] == pytest.approx(0.6, rel=0.05)
+
+
+async def test_decrease_on_low_queue_wait():
+    """
+    Quantile of queue wait much lower than target makes decrease trigger
+    """
+    checker, output_batch_queue = make_checker(2)
+    for index in range(20):
+        await output_batch_queue.put(make_response_batch(str(index), 0.01))
+    triggers = checker.make_triggers()
+    assert len(triggers) == 1
+    assert isinstance(triggers[0], DecreaseTrigger)
+    assert triggers[0].model_instance.lock
+
+
+async def test_not_enough_samples():
+    """
+    No triggers until there are min_samples requests in the window
+    """
+    checker, output_batch_queue = make_checker(1)
+    for index in range(5):
+        await output_batch_queue.put(make_response_batch(str(index), 2.0))
+    assert checker.make_triggers() == []
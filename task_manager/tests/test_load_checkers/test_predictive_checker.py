@@ -0,0 +1,173 @@
+"""
+Tests for PredictiveStatelessChecker and HoltWinters forecaster
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import os
+
+import pytest
+
+import src.data_models as dm
+from src.load_analyzers.checkers import PredictiveStatelessChecker
+from src.load_analyzers.forecasting import HoltWinters
+from src.admission import AdmissionController
+from src.batch_queue import InputBatchQueue, OutputBatchQueue
+from src.model_instances_storage import ModelInstancesStorage
+from src.receiver_streams_combiner import ReceiverStreamsCombiner
+from src.load_analyzers.triggers import IncreaseTrigger
+from tests.conftest import stub_model, make_batch, make_model_instance
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_config(enabled: bool = True) -> dm.Config:
+    return dm.Config(
+        zmq_input_address="",
+        zmq_output_address="",
+        cloud_client=dm.DockerConfig(
+            registry="registry.visionhub.ru",
+            login=os.environ.get("DOCKER_LOGIN", ""),
+            password=os.environ.get("DOCKER_PASSWORD", ""),
+            network=os.environ.get("DOCKER_NETWORK", ""),
+        ),
+        gpu_all=[1],
+        load_analyzer=dm.LoadAnalyzerConfig(
+            sleep_time=0.1,
+            trigger_pipeline=dm.TriggerPipelineConfig(max_model_percent=60),
+            running_mean=dm.RunningMeanConfig(
+                min_threshold=50, max_threshold=100, window_size=10
+            ),
+            stateful_checker=dm.StatefulChecker(keep_model=10),
+            predictive=dm.PredictiveConfig(
+                enabled=enabled, alpha=0.5, beta=0.5, horizon=3
+            ),
+        ),
+        health_check=dm.HealthCheckerConfig(connection_idle_timeout=10),
+        models=dm.ModelsRunnerConfig(
+            ports=dm.PortConfig(
+                sender_open_addr=5566,
+                receiver_open_addr=4531,
+            ),
+            zmq_config=dm.ZMQConfig(sndhwm=123, rcvhwm=121, sndtimeo=123, rcvtimeo=123),
+        ),
+    )
+
+
+async def test_ewma_forecast():
+    """
+    Without trend and seasonality forecast is exponential moving average
+    """
+    forecaster = HoltWinters(alpha=0.5)
+    assert forecaster.forecast() is None
+    for value in [10, 20]:
+        forecaster.update(value)
+    assert forecaster.forecast() == pytest.approx(15)
+    assert forecaster.forecast(5) == pytest.approx(15)
+
+
+async def test_trend_forecast():
+    """
+    Linear growth is extrapolated
+    """
+    forecaster = HoltWinters(alpha=0.9, beta=0.9)
+    for value in range(0, 100, 10):
+        forecaster.update(value)
+    assert forecaster.forecast(1) == pytest.approx(100, rel=0.05)
+    assert forecaster.forecast(3) == pytest.approx(120, rel=0.05)
+
+
+async def test_seasonal_forecast():
+    """
+    Repeating pattern is forecasted at the same position of the season
+    """
+    forecaster = HoltWinters(alpha=0.1, gamma=0.9, season_length=4)
+    for _ in range(20):
+        for value in [0, 0, 0, 100]:
+            forecaster.update(value)
+    assert forecaster.forecast(1) < 40
+    assert forecaster.forecast(4) > 60
+
+
+def make_checker(service_time: float, enabled: bool = True, queue_limit: int = 1000):
+    input_batch_queue = InputBatchQueue()
+    output_batch_queue = OutputBatchQueue()
+    admission_controller = AdmissionController(
+        input_batch_queue, output_batch_queue, default_queue_limit=queue_limit
+    )
+    receiver_streams_combiner = ReceiverStreamsCombiner(output_batch_queue)
+    model_instances_storage = ModelInstancesStorage(receiver_streams_combiner)
+    model_instances_storage.add_model_instance(make_model_instance("stub-1", service_time=service_time))
+    checker = PredictiveStatelessChecker(
+        model_instances_storage,
+        input_batch_queue,
+        output_batch_queue,
+        config=make_config(enabled=enabled),
+    )
+    return checker, admission_controller
+
+
+async def test_increase_before_load():
+    """
+    Growing arrival rate makes increase trigger,
+    while the running instance can still process the current load
+    """
+    checker, admission_controller = make_checker(0.1)
+
+    checker.update_forecasters(now=0.0)
+    for tick, size in enumerate([2, 4, 6], start=1):
+        await admission_controller.put(make_batch(str(tick), size))
+        checker.update_forecasters(now=float(tick))
+    # Rate is 6 req/s, one instance is busy for 60% of time, but rate grows
+    assert checker.estimate_needed_instances(stub_model) == 1 + 1
+
+    checker.last_tick = None
+    triggers = checker.make_triggers()
+    assert len(triggers) == 1
+    assert isinstance(triggers[0], IncreaseTrigger)
+    assert triggers[0].model == stub_model
+
+
+async def test_rejected_requests_are_forecasted():
+    """
+    Requests, that are rejected by admission control, are counted as arrived
+    """
+    checker, admission_controller = make_checker(0.1, queue_limit=5)
+
+    checker.update_forecasters(now=0.0)
+    for tick in range(1, 4):
+        await admission_controller.put(make_batch(str(tick), 5))
+        checker.update_forecasters(now=float(tick))
+
+    assert checker.input_batch_queue.get_num_requests_of_model(stub_model) == 5
+    assert checker.forecast_peak_rate(stub_model) == pytest.approx(5)
+
+
+async def test_several_triggers_within_capacity():
+    """
+    Number of increase triggers is the number of missing instances,
+    limited by max_model_percent of max_running_instances
+    """
+    checker, admission_controller = make_checker(0.1)
+
+    checker.update_forecasters(now=0.0)
+    await admission_controller.put(make_batch("1", 100))
+    checker.update_forecasters(now=1.0)
+    # 100 req/s * 0.1 s / 0.8 = 13 instances, but only 6 of 10 are allowed
+    assert checker.estimate_needed_instances(stub_model) == 13
+
+    checker.last_tick = None
+    triggers = checker.make_triggers()
+    assert len(triggers) == 6 - 1
+    assert all(trigger.model == stub_model for trigger in triggers)
+
+
+async def test_disabled():
+    """
+    Disabled checker makes no triggers
+    """
+    checker, admission_controller = make_checker(1.0, enabled=False)
+    await admission_controller.put(make_batch("1", 100))
+    assert checker.make_triggers() == []
+    assert checker.make_triggers() == []
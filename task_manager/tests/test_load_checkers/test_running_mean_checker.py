@@ -115,10 +115,6 @@ async def test_low_load():
         )
     )
 
-    request_info1 = dm.RequestInfo(
-        input=np.array(range(10)),
-        parameters={},
-    )
     response_info1 = dm.ResponseInfo(
         output=np.array(range(10)),
         picture=np.array(range(10)),
@@ -126,7 +122,7 @@ async def test_low_load():
     )
     response1 = dm.ResponseBatch(
         uid="1",
-        requests_info=[request_info1],
+        size=1,
         model=stub_model,
         mini_batches=[dm.MiniResponseBatch([response_info1])],
         status=dm.Status.PROCESSED,
@@ -134,10 +130,6 @@ async def test_low_load():
         started_at=9,
     )
 
-    request_info2 = dm.RequestInfo(
-        input=np.array(range(10)),
-        parameters={},
-    )
     response_info2 = dm.ResponseInfo(
         output=np.array(range(10)),
         picture=np.array(range(10)),
@@ -145,7 +137,7 @@ async def test_low_load():
     )
     response2 = dm.ResponseBatch(
         uid="2",
-        requests_info=[request_info2],
+        size=1,
         model=stub_model,
         mini_batches=[dm.MiniResponseBatch([response_info2])],
         status=dm.Status.PROCESSED,
@@ -228,10 +220,6 @@ async def test_high_load():
         model_instances_storage, input_batch_queue, output_batch_queue, stub_config
     )
 
-    request_info1 = dm.RequestInfo(
-        input=np.array(range(10)),
-        parameters={},
-    )
     response_info1 = dm.ResponseInfo(
         output=np.array(range(10)),
         picture=np.array(range(10)),
@@ -239,7 +227,7 @@ async def test_high_load():
     )
     response1 = dm.ResponseBatch(
         uid="1",
-        requests_info=[request_info1],
+        size=1,
         model=stub_model,
         mini_batches=[dm.MiniResponseBatch([response_info1])],
         status=dm.Status.PROCESSED,
@@ -247,10 +235,6 @@ async def test_high_load():
         started_at=9,
     )
 
-    request_info2 = dm.RequestInfo(
-        input=np.array(range(10)),
-        parameters={},
-    )
     response_info2 = dm.ResponseInfo(
         output=np.array(range(10)),
         picture=np.array(range(10)),
@@ -258,7 +242,7 @@ async def test_high_load():
     )
     response2 = dm.ResponseBatch(
         uid="2",
-        requests_info=[request_info2],
+        size=1,
         model=stub_model,
         mini_batches=[dm.MiniResponseBatch([response_info2])],
         status=dm.Status.PROCESSED,
@@ -333,3 +317,28 @@ async def test_high_load():
     triggers = checker.make_triggers()
     assert len(triggers) == 1
     assert isinstance(triggers[0], IncreaseTrigger)
+
+
+async def test_response_without_size():
+    """
+    Test that processed response of zero size is not used for mean processing time
+    """
+    input_batch_queue = InputBatchQueue()
+    output_batch_queue = OutputBatchQueue()
+    receiver_streams_combiner = ReceiverStreamsCombiner(output_batch_queue)
+    model_instances_storage = ModelInstancesStorage(receiver_streams_combiner)
+    checker = RunningMeanStatelessChecker(
+        model_instances_storage, input_batch_queue, output_batch_queue, stub_config
+    )
+    response = dm.ResponseBatch(
+        uid="1",
+        model=stub_model,
+        mini_batches=[],
+        status=dm.Status.PROCESSED,
+        processed_at=10,
+        started_at=9,
+    )
+    await output_batch_queue.put(response)
+
+    checker.calculate_means()
+    assert checker.means == {}
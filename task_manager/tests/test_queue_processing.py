@@ -0,0 +1,164 @@
+"""
+Tests for dispatcher of batches to model instances
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import src.data_models as dm
+from src.batch_queue import InputBatchQueue, OutputBatchQueue
+from src.utils.data_transfers.sender import BaseSender
+from src.model_instances_storage import ModelInstancesStorage
+from src.receiver_streams_combiner import ReceiverStreamsCombiner
+from src.batch_processing.queue_processing import Dispatcher
+from tests.conftest import stub_model, make_batch, make_model_instance
+
+pytestmark = pytest.mark.asyncio
+
+
+class RecordingSender(BaseSender):
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    async def send(self, data):
+        self.sent.append(data.uid)
+
+
+def make_dispatcher(max_in_flight=1, coalesce=False):
+    input_batch_queue = InputBatchQueue()
+    output_batch_queue = OutputBatchQueue()
+    receiver_streams_combiner = ReceiverStreamsCombiner(output_batch_queue)
+    model_instances_storage = ModelInstancesStorage(
+        receiver_streams_combiner, max_in_flight=max_in_flight
+    )
+    return Dispatcher(
+        input_batch_queue,
+        output_batch_queue,
+        model_instances_storage,
+        coalesce=coalesce,
+    )
+
+
+async def test_dispatch_on_events():
+    """
+    Test that batches are sent as soon as they are put
+    or model instance is released, without waiting for a timer
+    """
+    dispatcher = make_dispatcher()
+    input_batch_queue = dispatcher.input_batch_queue
+    model_instances_storage = dispatcher.model_instances_storage
+    receiver_streams_combiner = model_instances_storage.receiver_streams_combiner
+    dispatcher_task = asyncio.create_task(dispatcher.run())
+    first = make_model_instance("first", sender=RecordingSender())
+    second = make_model_instance("second", sender=RecordingSender())
+    model_instances_storage.add_model_instance(first)
+    model_instances_storage.add_model_instance(second)
+
+    for uid in ["1", "2", "3"]:
+        await input_batch_queue.put(make_batch(uid))
+    await asyncio.sleep(0.01)
+
+    assert first.sender.sent + second.sender.sent == ["1", "2"]
+    assert not first.has_credit and not second.has_credit
+    assert input_batch_queue.get_num_requests_in_queue(stub_model) == 1
+
+    first.finish_batch("1")
+    for callback in receiver_streams_combiner.observers:
+        callback()
+    await asyncio.sleep(0.01)
+
+    assert first.sender.sent == ["1", "3"]
+    assert input_batch_queue.get_num_requests_in_queue(stub_model) == 0
+    dispatcher_task.cancel()
+
+
+async def test_credit_window():
+    """
+    Test that model instance gets max_in_flight batches
+    and the next one after the first batch is processed
+    """
+    dispatcher = make_dispatcher(max_in_flight=2)
+    model_instance = make_model_instance("first", sender=RecordingSender())
+    dispatcher.model_instances_storage.add_model_instance(model_instance)
+    for uid in ["1", "2", "3"]:
+        await dispatcher.input_batch_queue.put(make_batch(uid))
+
+    assert dispatcher.dispatch() == 2
+    await asyncio.sleep(0)
+    assert model_instance.sender.sent == ["1", "2"]
+    assert model_instance.current_processing_batch.uid == "1"
+    assert dispatcher.dispatch() == 0
+
+    model_instance.finish_batch("1", processing_time=1.0)
+    assert dispatcher.dispatch() == 1
+    await asyncio.sleep(0)
+    assert model_instance.sender.sent == ["1", "2", "3"]
+    assert list(model_instance.in_flight_batches) == ["2", "3"]
+
+
+async def test_coalesce():
+    """
+    Test that queued batches are sent to the model as one batch
+    """
+    dispatcher = make_dispatcher(coalesce=True)
+    model_instance = make_model_instance("first", sender=RecordingSender())
+    dispatcher.model_instances_storage.add_model_instance(model_instance)
+    for uid in ["1", "2", "3"]:
+        await dispatcher.input_batch_queue.put(make_batch(uid))
+
+    assert dispatcher.dispatch() == 1
+    await asyncio.sleep(0)
+
+    assert len(model_instance.sender.sent) == 1
+    coalesced = model_instance.current_processing_batch
+    assert coalesced.uid == model_instance.sender.sent[0]
+    assert [batch.uid for batch in coalesced.batches] == ["1", "2", "3"]
+    assert dispatcher.input_batch_queue.get_num_requests_in_queue(stub_model) == 0
+
+
+async def test_earliest_deadline_first():
+    """
+    Test that queues and batches are served in order of deadlines,
+    and expired batches are failed without sending
+    """
+    other_model = dm.ModelObject(
+        "other",
+        "registry.visionhub.ru/models/other:v3",
+        stateless=True,
+        batch_size=128,
+    )
+    dispatcher = make_dispatcher(max_in_flight=10)
+    model_instance = make_model_instance("first", sender=RecordingSender())
+    other_instance = make_model_instance(
+        "other", model=other_model, sender=RecordingSender()
+    )
+    dispatcher.model_instances_storage.add_model_instance(model_instance)
+    dispatcher.model_instances_storage.add_model_instance(other_instance)
+    sent = model_instance.sender.sent = other_instance.sender.sent = []
+    now = datetime.now()
+    for batch in [
+        make_batch("late"),
+        make_batch("expired", deadline=now - timedelta(seconds=1)),
+        make_batch("second", deadline=now + timedelta(seconds=20)),
+        make_batch("first", model=other_model, deadline=now + timedelta(seconds=10)),
+        make_batch("third", model=other_model),
+    ]:
+        await dispatcher.input_batch_queue.put(batch)
+
+    assert dispatcher.dispatch() == 4
+    await asyncio.sleep(0)
+    assert [batch.uid for batch in dispatcher.expired_batches] == ["expired"]
+    # Queue with expired batch is served first, then the earliest deadline,
+    # batches without deadline are served in order of put
+    assert sent == ["second", "first", "late", "third"]
+
+    await dispatcher.fail_expired_batches()
+    response_batch = dispatcher.output_batch_queue.get_nowait()
+    assert response_batch.uid == "expired"
+    assert response_batch.error is not None
@@ -0,0 +1,171 @@
+"""
+Tests for combining of response streams of model instances
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import asyncio
+import itertools
+from datetime import datetime, timedelta
+
+import pytest
+import zmq  # type: ignore
+import zmq.asyncio  # type: ignore
+
+import src.data_models as dm
+from shared_modules import tensor_codec
+from src.batch_queue import OutputBatchQueue
+from src.utils.data_transfers.receiver import Receiver
+from src.receiver_streams_combiner import ReceiverStreamsCombiner
+from tests.conftest import stub_model, make_batch, make_model_instance
+
+pytestmark = pytest.mark.asyncio
+
+zmq_config = dm.ZMQConfig(sndhwm=1000, rcvhwm=1000, sndtimeo=123, rcvtimeo=3)
+
+addresses = (f"inproc://test_combiner_{i}" for i in itertools.count())
+
+
+def make_receiving_instance(context, name):
+    address = next(addresses)
+    push = context.socket(zmq.PUSH)
+    push.bind(address)
+    receiver = Receiver(address, context, zmq_config)
+    model_instance = make_model_instance(name, receiver=receiver, max_in_flight=100)
+    receiver.set_model_instance(model_instance)
+    return model_instance, push
+
+
+async def send_response(push, uid):
+    response = dm.ResponseBatch(uid=uid, model=stub_model, status=dm.Status.PROCESSED)
+    await push.send_multipart(tensor_codec.encode(response))
+
+
+async def receive_uids(output_batch_queue, count):
+    uids = []
+    for _ in range(count):
+        batch = await asyncio.wait_for(output_batch_queue.get(), timeout=1)
+        uids.append(batch.uid)
+    return uids
+
+
+async def test_receive_from_all_instances():
+    """
+    Test that responses of all sockets are received in order of each socket,
+    and receivers added after start of the converter are polled too
+    """
+    context = zmq.asyncio.Context()
+    output_batch_queue = OutputBatchQueue()
+    combiner = ReceiverStreamsCombiner(output_batch_queue)
+    released = []
+    combiner.add_observer(lambda: released.append(True))
+    converter = asyncio.create_task(combiner.converter())
+    await asyncio.sleep(0)
+
+    instances = [make_receiving_instance(context, f"stub_{i}") for i in range(3)]
+    for model_instance, push in instances:
+        combiner.add_listener(model_instance.receiver)
+        for j in range(5):
+            model_instance.start_batch(make_batch(f"{model_instance.name}_{j}"))
+            await send_response(push, f"{model_instance.name}_{j}")
+
+    uids = await receive_uids(output_batch_queue, 15)
+    for model_instance, _ in instances:
+        assert [uid for uid in uids if uid.startswith(model_instance.name)] == [
+            f"{model_instance.name}_{j}" for j in range(5)
+        ]
+        assert model_instance.outstanding_batches == 0
+    assert len(released) == 15
+
+    combiner.stop()
+    await asyncio.wait_for(converter, timeout=1)
+    context.destroy(linger=0)
+
+
+async def test_remove_listener():
+    """
+    Test that socket of removed receiver is not polled and closed
+    """
+    context = zmq.asyncio.Context()
+    output_batch_queue = OutputBatchQueue()
+    combiner = ReceiverStreamsCombiner(output_batch_queue)
+    converter = asyncio.create_task(combiner.converter())
+
+    removed, removed_push = make_receiving_instance(context, "removed")
+    kept, kept_push = make_receiving_instance(context, "kept")
+    combiner.add_listener(removed.receiver)
+    combiner.add_listener(kept.receiver)
+    await combiner.remove_listener(removed.receiver)
+
+    await send_response(kept_push, "kept_0")
+    assert await receive_uids(output_batch_queue, 1) == ["kept_0"]
+    assert removed.receiver.get_socket().closed
+    assert list(combiner.receivers.values()) == [kept.receiver]
+
+    combiner.stop()
+    await asyncio.wait_for(converter, timeout=1)
+    context.destroy(linger=0)
+
+
+async def test_restore_size_of_response_without_size():
+    """
+    Test that size of the response pickled by older model images without size
+    is taken from the batch in flight
+    """
+    context = zmq.asyncio.Context()
+    try:
+        output_batch_queue = OutputBatchQueue()
+        combiner = ReceiverStreamsCombiner(output_batch_queue)
+        converter = asyncio.create_task(combiner.converter())
+        model_instance, push = make_receiving_instance(context, "stub")
+        combiner.add_listener(model_instance.receiver)
+        model_instance.start_batch(make_batch("old", size=3))
+
+        response = dm.ResponseBatch(
+            uid="old", model=stub_model, status=dm.Status.PROCESSED
+        )
+        del response.__dict__["size"]
+        await push.send_multipart(tensor_codec.encode(response))
+
+        batch = await asyncio.wait_for(output_batch_queue.get(), timeout=1)
+        assert batch.size == 3
+        combiner.stop()
+        await asyncio.wait_for(converter, timeout=1)
+    finally:
+        context.destroy(linger=0)
+
+
+async def test_processing_starts_after_previous_batch():
+    """
+    Test that processing time of the batch, that waited in the socket of the model,
+    is counted from the finish of the previous batch
+    """
+    output_batch_queue = OutputBatchQueue()
+    combiner = ReceiverStreamsCombiner(output_batch_queue)
+    model_instance = make_model_instance("stub", max_in_flight=2)
+    model_instance.receiver.set_model_instance(model_instance)
+    sent_at = datetime.now() - timedelta(seconds=10)
+    for uid in ["first", "second"]:
+        model_instance.start_batch(make_batch(uid, started_at=sent_at))
+
+    await combiner.process(
+        model_instance.receiver,
+        dm.ResponseBatch(uid="first", model=stub_model, mini_batches=[]),
+    )
+    await combiner.process(
+        model_instance.receiver,
+        dm.ResponseBatch(uid="second", model=stub_model, mini_batches=[]),
+    )
+
+    output_batch_queue.get_nowait()
+    second = output_batch_queue.get_nowait()
+    assert second.started_at == sent_at
+    assert second.processing_started_at > sent_at + timedelta(seconds=9)
+    processing_time = output_batch_queue.batches_time_processing[second][
+        "processing_time"
+    ]
+    assert processing_time < 1
+    statistics = dm.BatchStatistics.from_response_batch(second)
+    assert statistics.processing_time < 1
+    assert statistics.queue_time == 0
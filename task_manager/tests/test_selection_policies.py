@@ -0,0 +1,132 @@
+"""
+Tests for selection policies of model instances
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import pytest
+
+from src.selection_policies import (
+    RoundRobinPolicy,
+    JoinShortestQueuePolicy,
+    LeastOutstandingWorkPolicy,
+    PowerOfTwoChoicesPolicy,
+)
+from tests.conftest import stub_model, make_batch, make_model_instance
+
+
+def make_loaded_instance(name, outstanding_requests=0, **kwargs):
+    model_instance = make_model_instance(name, max_in_flight=2, **kwargs)
+    if outstanding_requests:
+        model_instance.start_batch(
+            make_batch(f"{name}_outstanding", size=outstanding_requests)
+        )
+    return model_instance
+
+
+@pytest.mark.parametrize(
+    "policy",
+    [
+        RoundRobinPolicy(),
+        JoinShortestQueuePolicy(),
+        LeastOutstandingWorkPolicy(),
+        PowerOfTwoChoicesPolicy(seed=0),
+    ],
+)
+def test_idle_instance_is_selected(policy):
+    """
+    Test that policy returns model instance with credit if it exists and None otherwise
+    """
+    model_instances = [
+        make_loaded_instance("1", lock=True),
+        make_loaded_instance("2", lock=True),
+        make_loaded_instance("3"),
+    ]
+
+    for _ in range(10):
+        assert policy(stub_model, model_instances).name == "3"
+
+    model_instances[2].lock = True
+    assert policy(stub_model, model_instances) is None
+
+
+@pytest.mark.parametrize(
+    "policy",
+    [
+        RoundRobinPolicy(),
+        JoinShortestQueuePolicy(),
+        LeastOutstandingWorkPolicy(),
+        PowerOfTwoChoicesPolicy(seed=0),
+    ],
+)
+def test_idle_instance_is_preferred_to_busy_with_credit(policy):
+    """
+    Test that policy returns idle model instance,
+    while other model instances are busy but still have credit
+    """
+    model_instances = [
+        make_loaded_instance("busy1", outstanding_requests=1, service_time=0.001),
+        make_loaded_instance("busy2", outstanding_requests=1, service_time=0.001),
+        make_loaded_instance("idle", service_time=10.0),
+    ]
+    assert all(model_instance.has_credit for model_instance in model_instances)
+
+    for _ in range(20):
+        assert policy(stub_model, model_instances).name == "idle"
+
+
+def test_round_robin_skips_locked():
+    """
+    Test that round robin does not stop on locked model instance
+    """
+    policy = RoundRobinPolicy()
+    model_instances = [
+        make_loaded_instance("1"),
+        make_loaded_instance("2", lock=True),
+        make_loaded_instance("3"),
+    ]
+
+    names = [policy(stub_model, model_instances).name for _ in range(4)]
+
+    assert names == ["1", "3", "1", "3"]
+
+
+def test_least_outstanding_work():
+    """
+    Test that outstanding requests are weighted by service time
+    """
+    policy = LeastOutstandingWorkPolicy()
+    slow = make_loaded_instance("slow", outstanding_requests=2, service_time=1.0)
+    fast = make_loaded_instance("fast", outstanding_requests=8, service_time=0.1)
+
+    assert policy(stub_model, [slow, fast]) is fast
+    assert JoinShortestQueuePolicy()(stub_model, [slow, fast]) is slow
+
+
+def test_power_of_two_choices():
+    """
+    Test that the better of two instances is always selected
+    """
+    policy = PowerOfTwoChoicesPolicy(seed=0)
+    slow = make_loaded_instance("slow", service_time=1.0)
+    fast = make_loaded_instance("fast", service_time=0.1)
+
+    assert all(policy(stub_model, [slow, fast]) is fast for _ in range(10))
+
+
+def test_service_time():
+    """
+    Test that service time is a moving average of processing time of one request
+    """
+    model_instance = make_loaded_instance("1")
+    batch = make_batch("1", size=4)
+
+    model_instance.start_batch(batch)
+    assert model_instance.outstanding_requests == 4
+    assert model_instance.finish_batch("1", processing_time=2.0) is batch
+    assert model_instance.outstanding_requests == 0
+    assert model_instance.service_time == 0.5
+    model_instance.start_batch(batch)
+    model_instance.finish_batch("1", processing_time=4.0)
+    assert model_instance.service_time == pytest.approx(0.6)
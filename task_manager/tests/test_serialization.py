@@ -0,0 +1,93 @@
+"""
+Tests for off loop serialization of batches of model instances
+"""
+
+__author__ = "Andrey Chertkov"
+__email__ = "a.chertkov@eora.ru"
+
+import asyncio
+import threading
+
+import pytest
+import numpy as np  # type: ignore
+import zmq  # type: ignore
+import zmq.asyncio  # type: ignore
+
+import src.data_models as dm
+from src.utils.data_transfers import serialization
+from src.utils.data_transfers.sender import Sender
+from src.utils.data_transfers.receiver import Receiver
+from tests.conftest import make_batch
+
+pytestmark = pytest.mark.asyncio
+
+
+def current_thread_name():
+    return threading.current_thread().name
+
+
+async def test_run_off_loop():
+    """
+    Test that only large batches are serialized outside of the event loop
+    """
+    loop_thread = current_thread_name()
+    assert await serialization.run_off_loop(10, 100, current_thread_name) == loop_thread
+    thread = await serialization.run_off_loop(100, 100, current_thread_name)
+    assert thread != loop_thread
+    assert thread.startswith("serialization")
+
+
+async def test_tensors_size():
+    batch = make_batch("uid", size=2, input_=np.ones(100, dtype=np.uint8))
+    assert serialization.tensors_size(batch) == 200
+    assert serialization.tensors_size(batch.stack_inputs()) == 200
+    frames = serialization.encode(batch)
+    assert serialization.frames_size(frames) >= 200
+
+
+@pytest.mark.parametrize("zero_copy", [True, False])
+async def test_pickle_protocol(zero_copy):
+    """
+    Test that header is readable by models on python 3.7 (pickle protocol 4)
+    """
+    batch = make_batch("uid", size=2, input_=np.ones(2048, dtype=np.uint8))
+    header = serialization.encode(batch, zero_copy=zero_copy)[0]
+    assert header[0:1] == b"\x80"
+    assert header[1] <= 4
+
+
+@pytest.mark.parametrize("zero_copy", [True, False])
+@pytest.mark.parametrize("input_size", [10, 1 << 16])
+async def test_send_receive(zero_copy, input_size):
+    """
+    Test that batches are the same after sending, whether they are serialized
+    in the event loop or in the thread pool
+    """
+    config = dm.ZMQConfig(
+        sndhwm=10,
+        rcvhwm=10,
+        sndtimeo=1000,
+        rcvtimeo=1000,
+        zero_copy=zero_copy,
+        off_loop_threshold=1024,
+    )
+    context = zmq.asyncio.Context()
+    address = f"inproc://test_serialization_{zero_copy}_{input_size}"
+    pull = context.socket(zmq.PULL)
+    pull.bind(address)
+    push = context.socket(zmq.PUSH)
+    push.bind(address + "_response")
+    sender = Sender(address, context, config)
+    receiver = Receiver(address + "_response", context, config)
+
+    batch = make_batch("uid", size=2, input_=np.ones(input_size, dtype=np.uint8))
+    try:
+        await sender.send(batch)
+        frames = await asyncio.wait_for(pull.recv_multipart(copy=False), timeout=1)
+        await push.send_multipart(frames, copy=False)
+        received = await asyncio.wait_for(receiver.receive(), timeout=1)
+    finally:
+        context.destroy(linger=0)
+    assert received.uid == batch.uid
+    for request_info, received_info in zip(batch.requests_info, received.requests_info):
+        assert np.array_equal(request_info.input, received_info.input)
@@ -39,9 +39,18 @@ async def receive_input(
 
         context = zmq.asyncio.Context.instance()
 
-        requests_object = await bridge_utils.input_to_requests_object(
-            request_model, config.model_storage_address, topic="zmq", ctx=context
-        )
+        try:
+            requests_object = await bridge_utils.input_to_requests_object(
+                request_model,
+                config.model_storage_address,
+                topic="zmq",
+                ctx=context,
+                min_priority=config.min_priority,
+                max_priority=config.max_priority,
+            )
+        except ValueError as exc:
+            logger.exception(exc)
+            continue
         for request_object in requests_object:
             await output_socket.send_pyobj(request_object)
 
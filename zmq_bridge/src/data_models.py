@@ -24,6 +24,13 @@ from shared_modules.data_objects import (
 class Config(BaseModel):
     """
     Config object
+
+    Parameters
+    ----------
+    min_priority:
+        Lower bound of priority of requests
+    max_priority:
+        Upper bound of priority of requests
     """
 
     batch_manager_address: str
@@ -31,3 +38,5 @@ class Config(BaseModel):
     model_storage_address: str
     listen_address: str
     send_address: str
+    min_priority: int = 0
+    max_priority: int = 10